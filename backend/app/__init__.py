@@ -4,6 +4,11 @@ from datetime import timedelta
 from app.config import config
 from app.extensions import init_extensions, db
 from app.blueprints import register_blueprints
+from app.repositories import node_metadata_cache
+from app.utils.last_seen import last_seen
+from app.utils.dedup import dedup_window
+from app.services.recent_readings import recent_readings
+from app.services.rollup_compactor import create_compactor
 
 def create_app(config_name='default'):
     """Factory para crear la aplicación Flask"""
@@ -22,6 +27,24 @@ def create_app(config_name='default'):
     # Inicializar extensiones
     init_extensions(app)
     
+    # Configurar cachés en memoria
+    node_metadata_cache.configure(
+        maxsize=app.config.get('NODE_CACHE_SIZE'),
+        ttl=app.config.get('NODE_CACHE_TTL'),
+        miss_ttl=app.config.get('NODE_CACHE_MISS_TTL')
+    )
+    dedup_window.configure(per_node=app.config.get('INGEST_DEDUP_WINDOW'))
+    recent_readings.configure(
+        hours=app.config.get('RECENT_READINGS_HOURS'),
+        max_points=app.config.get('RECENT_READINGS_MAX_POINTS'),
+        sync_interval=app.config.get('RECENT_READINGS_SYNC_INTERVAL'),
+        max_nodes=app.config.get('RECENT_READINGS_MAX_NODES'),
+        settle=app.config.get('RECENT_READINGS_SETTLE')
+    )
+    
+    # Escritura diferida de la última conexión de los nodos
+    last_seen.init_app(app)
+    
     # Registrar blueprints
     register_blueprints(app)
     
@@ -29,4 +52,11 @@ def create_app(config_name='default'):
     with app.app_context():
         db.create_all()
     
+    # Compactador de rollups en el proceso web (opcional; el gateway de ingesta ya lo inicia)
+    if app.config.get('ROLLUP_COMPACT_IN_WEB'):
+        compactor = create_compactor(app)
+        if compactor:
+            compactor.start()
+            app.extensions['rollup_compactor'] = compactor
+    
     return app
\ No newline at end of file
@@ -1,7 +1,11 @@
 # backend/app/blueprints/iot.py
-from flask import Blueprint, request, jsonify
+import json
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required
 from app.services import MeasurementService
-from app.utils.decorators import validate_json
+from app.utils.decorators import validate_json, admin_required
+from app.utils.validators import validate_measurement, format_validation_errors
+from app.utils.metrics import metrics
 
 iot_bp = Blueprint('iot', __name__)
 
@@ -10,5 +14,44 @@ iot_bp = Blueprint('iot', __name__)
 def receive_measurement():
     """Endpoint para recibir mediciones desde IoT (HTTP)"""
     data = request.get_json()
+    errors = validate_measurement(data)
+    if errors:
+        return jsonify({'error': format_validation_errors(errors), 'errors': errors}), 400
     result, status = MeasurementService.save_measurement(data)
-    return jsonify(result), status
\ No newline at end of file
+    return jsonify(result), status
+
+@iot_bp.route('/measurements/batch', methods=['POST'])
+def receive_measurements_batch():
+    """Recibe un lote de mediciones (arreglo JSON o NDJSON) desde gateways IoT"""
+    if request.mimetype in ('application/x-ndjson', 'application/ndjson'):
+        try:
+            items = [
+                json.loads(line)
+                for line in request.get_data(as_text=True).splitlines()
+                if line.strip()
+            ]
+        except json.JSONDecodeError as e:
+            return jsonify({'error': f'NDJSON inválido: {e}'}), 400
+    elif request.is_json:
+        items = request.get_json(silent=True)
+        if not isinstance(items, list):
+            return jsonify({'error': 'Se esperaba un arreglo JSON de mediciones'}), 400
+    else:
+        return jsonify({'error': 'Content-Type debe ser application/json o application/x-ndjson'}), 400
+    
+    if not items:
+        return jsonify({'error': 'El lote está vacío'}), 400
+    
+    max_batch = current_app.config.get('INGEST_HTTP_MAX_BATCH', 5000)
+    if len(items) > max_batch:
+        return jsonify({'error': f'El lote supera el máximo de {max_batch} mediciones'}), 413
+    
+    result, status = MeasurementService.save_measurements_batch(items)
+    return jsonify(result), status
+
+@iot_bp.route('/metrics', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_ingest_metrics():
+    """Métricas de ingesta (latencia de escritura, tamaño de lotes, etc.)"""
+    return jsonify(metrics.snapshot()), 200
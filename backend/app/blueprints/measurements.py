@@ -1,7 +1,8 @@
 # backend/app/blueprints/measurements.py
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.services import MeasurementService
+from app.services import MeasurementService, QueryService
+from app.utils.series_format import SERIES_FORMATS, series_response, dumps
 
 measurements_bp = Blueprint('measurements', __name__)
 
@@ -17,5 +18,47 @@ def get_dashboard(node_id):
 def get_historical(node_id):
     """CU4: Ver detalles históricos"""
     period = request.args.get('period', 'day')  # day, week, month
-    result, status = MeasurementService.get_historical(node_id, period)
-    return jsonify(result), status
+    fmt = request.args.get('format', 'rows')  # rows, columnar, binary
+    if fmt not in SERIES_FORMATS:
+        return jsonify({'error': f'Formato inválido: {fmt}'}), 400
+    result, status = MeasurementService.get_historical(
+        node_id, period,
+        resolution=request.args.get('resolution'),  # raw: mediciones crudas paginadas
+        cursor=request.args.get('cursor'),
+        limit=request.args.get('limit', type=int),
+        max_points=request.args.get('max_points', type=int),  # serie reducida (p. ej. ancho del gráfico)
+        method=request.args.get('method', 'lttb')  # lttb, minmax
+    )
+    if status != 200:
+        return jsonify(result), status
+    return series_response(result, fmt)
+
+@measurements_bp.route('/historical/<int:node_id>/export', methods=['GET'])
+@jwt_required()
+def export_historical(node_id):
+    """Exporta todas las mediciones crudas del período (NDJSON en streaming)"""
+    period = request.args.get('period', 'day')
+    result, status = MeasurementService.export_historical(node_id, period)
+    if status != 200:
+        return jsonify(result), status
+    return Response(stream_with_context(result), mimetype='application/x-ndjson')
+
+@measurements_bp.route('/query', methods=['GET'])
+@jwt_required()
+def query_series():
+    """Serie agregada por intervalo de varios nodos en un rango arbitrario
+
+    ?start=2026-01-01T00:00:00&end=...&node_ids=1,2&variables=temperatura,co2&bucket=15m&aggs=avg,max,p95
+    Los percentiles solo dentro de la retención de mediciones crudas (400 si start es anterior).
+    """
+    result, status = QueryService.query_series(
+        start=request.args.get('start'),
+        end=request.args.get('end'),
+        node_ids=request.args.getlist('node_ids'),
+        variables=request.args.getlist('variables'),
+        bucket=request.args.get('bucket', '1h'),
+        aggs=request.args.getlist('aggs')
+    )
+    if status != 200:
+        return jsonify(result), status
+    return Response(dumps(result), mimetype='application/json')
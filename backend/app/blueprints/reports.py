@@ -51,4 +51,18 @@ def get_all_reports():
         return jsonify({'error': 'Acceso denegado'}), 403
     
     result, status = ReportService.get_all_reports()
-    return jsonify(result), status
\ No newline at end of file
+    return jsonify(result), status
+
+@reports_bp.route('/fleet-statistics', methods=['GET'])
+@jwt_required()
+def get_fleet_statistics():
+    """Estadísticas y alertas de todos los nodos en un período (solo admin)"""
+    claims = get_jwt()
+    if claims.get('rol') != 'administrador':
+        return jsonify({'error': 'Acceso denegado'}), 403
+    
+    node_ids = [int(n) for n in request.args.get('node_ids', '').split(',') if n.strip().isdigit()]
+    result, status = ReportService.get_fleet_statistics(
+        request.args.get('fecha_inicio'), request.args.get('fecha_fin'), node_ids or None
+    )
+    return jsonify(result), status
@@ -25,6 +25,101 @@ class Config:
     MQTT_USERNAME = os.getenv('MQTT_USERNAME', '')
     MQTT_PASSWORD = os.getenv('MQTT_PASSWORD', '')
     MQTT_TOPIC = 'environmental/measurements'
+    # Sufijo de tópico para tramas binarias (también se detectan por byte mágico)
+    MQTT_BINARY_TOPIC_SUFFIX = os.getenv('MQTT_BINARY_TOPIC_SUFFIX', '/bin')
+    # Tópico por nodo ('+' es el nodo_id, el payload puede omitirlo) y versión de protocolo (3.1.1 o 5)
+    MQTT_NODE_TOPIC = os.getenv('MQTT_NODE_TOPIC', 'environmental/+/measurements')
+    MQTT_PROTOCOL = os.getenv('MQTT_PROTOCOL', '3.1.1')
+    # Grupo de suscripción compartida ($share/<grupo>/...) para repartir la carga entre instancias
+    # (el broker reparte los mensajes de un mismo nodo: el orden solo se conserva por instancia)
+    MQTT_SHARED_GROUP = os.getenv('MQTT_SHARED_GROUP', '')
+    # Reparto fijo de nodos entre instancias (nodo_id % MQTT_INSTANCE_COUNT == MQTT_INSTANCE_INDEX)
+    # con suscripciones explícitas por nodo; conserva el orden por nodo. Tiene prioridad sobre el grupo
+    MQTT_INSTANCE_COUNT = int(os.getenv('MQTT_INSTANCE_COUNT', 1))
+    MQTT_INSTANCE_INDEX = int(os.getenv('MQTT_INSTANCE_INDEX', 0))
+    # Segundos entre actualizaciones de las suscripciones por nodo (nodos nuevos)
+    MQTT_SUBSCRIPTION_REFRESH = float(os.getenv('MQTT_SUBSCRIPTION_REFRESH', 60))
+    
+    # Ingesta por lotes (tamaño máximo y segundos máximos antes de escribir)
+    INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', 100))
+    INGEST_BATCH_INTERVAL = float(os.getenv('INGEST_BATCH_INTERVAL', 1.0))
+    
+    # Cola y workers de ingesta (política de desbordamiento: spill, drop_oldest, block). spill
+    # sin spool configurado se comporta como drop_oldest; block detiene el callback de paho
+    # (keepalive incluido) hasta INGEST_QUEUE_BLOCK_TIMEOUT segundos: solo con carga acotada
+    INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', 4))
+    INGEST_QUEUE_SIZE = int(os.getenv('INGEST_QUEUE_SIZE', 10000))
+    INGEST_QUEUE_POLICY = os.getenv('INGEST_QUEUE_POLICY', 'spill')
+    INGEST_QUEUE_BLOCK_TIMEOUT = float(os.getenv('INGEST_QUEUE_BLOCK_TIMEOUT', 5.0))
+    
+    # Spool en disco (segmentos, cuota, fsync cada N registros y mediciones/s al reprocesar)
+    INGEST_SPOOL_DIR = os.getenv('INGEST_SPOOL_DIR', 'spool')
+    INGEST_SPOOL_SEGMENT_MB = int(os.getenv('INGEST_SPOOL_SEGMENT_MB', 8))
+    INGEST_SPOOL_QUOTA_MB = int(os.getenv('INGEST_SPOOL_QUOTA_MB', 512))
+    INGEST_SPOOL_FSYNC_EVERY = int(os.getenv('INGEST_SPOOL_FSYNC_EVERY', 100))
+    INGEST_SPOOL_REPLAY_RATE = float(os.getenv('INGEST_SPOOL_REPLAY_RATE', 500))
+    
+    # Caché de metadatos de nodos/sensores usada en la ingesta. Se invalida solo en el proceso
+    # que modifica el nodo: en los demás (gateway, otros workers) los cambios tardan hasta
+    # NODE_CACHE_TTL segundos. Los nodos inexistentes se recuerdan NODE_CACHE_MISS_TTL segundos
+    NODE_CACHE_SIZE = int(os.getenv('NODE_CACHE_SIZE', 10000))
+    NODE_CACHE_TTL = float(os.getenv('NODE_CACHE_TTL', 30))
+    NODE_CACHE_MISS_TTL = float(os.getenv('NODE_CACHE_MISS_TTL', 5))
+    
+    # Segundos entre escrituras diferidas de nodos.ultima_conexion (0 = escritura inmediata)
+    LAST_SEEN_FLUSH_INTERVAL = float(os.getenv('LAST_SEEN_FLUSH_INTERVAL', 5))
+    
+    # Payloads multi-muestra: máximo de muestras por mensaje y ventana de aceptación
+    # (segundos hacia atrás para muestras atrasadas y hacia adelante por desfase de reloj)
+    INGEST_MAX_SAMPLES = int(os.getenv('INGEST_MAX_SAMPLES', 500))
+    INGEST_LATE_WINDOW = int(os.getenv('INGEST_LATE_WINDOW', 7 * 24 * 3600))
+    INGEST_FUTURE_SKEW = int(os.getenv('INGEST_FUTURE_SKEW', 300))
+    
+    # Claves de mensaje (seq/msg_id) recordadas por nodo para descartar duplicados
+    INGEST_DEDUP_WINDOW = int(os.getenv('INGEST_DEDUP_WINDOW', 1024))
+    
+    # Máximo de mediciones por petición en /api/iot/measurements/batch
+    INGEST_HTTP_MAX_BATCH = int(os.getenv('INGEST_HTTP_MAX_BATCH', 5000))
+    
+    # Lecturas recientes en memoria para el dashboard: horas por nodo (0 = deshabilitado),
+    # máximo de lecturas por nodo, segundos mínimos entre lecturas de la base (solo se lee
+    # cuando cambia la última conexión del nodo), nodos en memoria y segundos hasta dar por
+    # confirmadas las transacciones de una lectura
+    RECENT_READINGS_HOURS = float(os.getenv('RECENT_READINGS_HOURS', 24))
+    RECENT_READINGS_MAX_POINTS = int(os.getenv('RECENT_READINGS_MAX_POINTS', 20000))
+    RECENT_READINGS_SYNC_INTERVAL = float(os.getenv('RECENT_READINGS_SYNC_INTERVAL', 5))
+    RECENT_READINGS_MAX_NODES = int(os.getenv('RECENT_READINGS_MAX_NODES', 1000))
+    RECENT_READINGS_SETTLE = float(os.getenv('RECENT_READINGS_SETTLE', 10))
+    
+    # Retención de mediciones crudas: particiones por 'month' o 'week' (MySQL/PostgreSQL),
+    # particiones creadas por adelantado y borrado por lotes (filas por lote, segundos entre lotes)
+    MEASUREMENT_RETENTION_DAYS = int(os.getenv('MEASUREMENT_RETENTION_DAYS', 90))
+    MEASUREMENT_PARTITION_INTERVAL = os.getenv('MEASUREMENT_PARTITION_INTERVAL', 'month')
+    MEASUREMENT_PARTITIONS_AHEAD = int(os.getenv('MEASUREMENT_PARTITIONS_AHEAD', 3))
+    RETENTION_DELETE_BATCH = int(os.getenv('RETENTION_DELETE_BATCH', 5000))
+    RETENTION_DELETE_PAUSE = float(os.getenv('RETENTION_DELETE_PAUSE', 0.1))
+    
+    # Retención por niveles 'nivel:días' (raw, 1m, 5m, 1h, 1d; 0 = sin límite). Sin 'raw' se usa
+    # MEASUREMENT_RETENTION_DAYS. RETENTION_NODE_TIERS: JSON {"nodo_id": "raw:7,5m:90"} por nodo
+    RETENTION_TIERS = os.getenv('RETENTION_TIERS', '1m:90,5m:365,1h:730,1d:0')
+    RETENTION_NODE_TIERS = os.getenv('RETENTION_NODE_TIERS', '')
+    # Puntos máximos por serie en /historical (elige el nivel de rollup según el rango)
+    HISTORICAL_MAX_POINTS = int(os.getenv('HISTORICAL_MAX_POINTS', 1000))
+    # Filas máximas por página de mediciones crudas (cursor) y por lote de la exportación
+    HISTORICAL_PAGE_LIMIT = int(os.getenv('HISTORICAL_PAGE_LIMIT', 5000))
+    # Puntos máximos que se leen para reducir una serie con max_points (LTTB / mín-máx)
+    HISTORICAL_DOWNSAMPLE_SOURCE_POINTS = int(os.getenv('HISTORICAL_DOWNSAMPLE_SOURCE_POINTS', 100000))
+    # /api/measurements/query: nodos por consulta y puntos (nodos x intervalos) por respuesta
+    QUERY_MAX_NODES = int(os.getenv('QUERY_MAX_NODES', 100))
+    QUERY_MAX_POINTS = int(os.getenv('QUERY_MAX_POINTS', 100000))
+    
+    # Compactador de rollups (minuto/5 min/hora/día): segundos entre pasadas (0 = deshabilitado)
+    # y minutos pendientes por pasada
+    ROLLUP_COMPACT_INTERVAL = float(os.getenv('ROLLUP_COMPACT_INTERVAL', 30))
+    ROLLUP_COMPACT_BATCH = int(os.getenv('ROLLUP_COMPACT_BATCH', 5000))
+    # Compactador también en la aplicación web (create_app); lo inician además el gateway de
+    # ingesta y MQTTService. Sin ninguno de ellos: scripts/rebuild_rollups.py --watch o cron
+    ROLLUP_COMPACT_IN_WEB = os.getenv('ROLLUP_COMPACT_IN_WEB', 'false').lower() == 'true'
     
     # AWS
     AWS_REGION = os.getenv('AWS_REGION', 'us-east-1')
@@ -50,6 +145,7 @@ class TestingConfig(Config):
     """Configuración de testing"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    LAST_SEEN_FLUSH_INTERVAL = 0
 
 # Diccionario de configuraciones
 config = {
@@ -0,0 +1,4 @@
+# backend/app/ingest/__init__.py
+from app.ingest.gateway import IngestGateway, AsyncMQTTClient
+
+__all__ = ['IngestGateway', 'AsyncMQTTClient']
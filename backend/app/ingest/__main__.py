@@ -0,0 +1,15 @@
+# backend/app/ingest/__main__.py
+# Gateway de ingesta independiente del servidor web:
+#   python -m app.ingest
+import os
+import asyncio
+from app import create_app
+from app.ingest.gateway import IngestGateway
+
+def main():
+    config_name = os.getenv('FLASK_ENV', 'development')
+    app = create_app(config_name)
+    asyncio.run(IngestGateway(app).run())
+
+if __name__ == '__main__':
+    main()
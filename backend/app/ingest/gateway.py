@@ -0,0 +1,295 @@
+# backend/app/ingest/gateway.py
+import time
+import signal
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import paho.mqtt.client as mqtt
+from app.services.ingest_queue import make_message
+from app.services.ingest_workers import decode_message, save_or_spool
+from app.services.mqtt_service import create_mqtt_client
+from app.services.spool import SpoolReplayer, create_spool
+from app.services.rollup_compactor import create_compactor
+from app.services.measurement_service import MeasurementService
+from app.repositories import NodeRepository
+from app.utils.last_seen import last_seen
+from app.utils.metrics import metrics
+from app.utils.topics import NodeSubscriptions, TopicRouter
+
+class AsyncMQTTClient:
+    """Integra el socket de un cliente paho al event loop de asyncio (sin thread de red)"""
+
+    def __init__(self, loop, client):
+        self.loop = loop
+        self.client = client
+        self._misc = None
+        client.on_socket_open = self._on_socket_open
+        client.on_socket_close = self._on_socket_close
+        client.on_socket_register_write = self._on_socket_register_write
+        client.on_socket_unregister_write = self._on_socket_unregister_write
+
+    def _on_socket_open(self, client, userdata, sock):
+        self.loop.add_reader(sock, client.loop_read)
+        self._misc = self.loop.create_task(self._misc_loop())
+
+    def _on_socket_close(self, client, userdata, sock):
+        self.loop.remove_reader(sock)
+        if self._misc:
+            self._misc.cancel()
+            self._misc = None
+
+    def _on_socket_register_write(self, client, userdata, sock):
+        self.loop.add_writer(sock, client.loop_write)
+
+    def _on_socket_unregister_write(self, client, userdata, sock):
+        self.loop.remove_writer(sock)
+
+    async def _misc_loop(self):
+        """Keepalive y reintentos de paho (lo que haría loop_forever)"""
+        while self.client.loop_misc() == mqtt.MQTT_ERR_SUCCESS:
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                break
+
+class IngestGateway:
+    """Proceso de ingesta independiente: MQTT asíncrono, decodificación y escritura por lotes
+
+    El loop de asyncio recibe y decodifica; los lotes se escriben con la ruta existente
+    (MeasurementService.save_batch, mismos modelos y reglas de alertas) en un pool de
+    threads, cada uno con su conexión del pool de SQLAlchemy. Los mensajes se reparten
+    por nodo en particiones con un consumidor cada una, que escribe un lote a la vez:
+    el orden por nodo se conserva. Con varias instancias, solo el reparto fijo por nodo
+    (MQTT_INSTANCE_COUNT) lo conserva entre ellas; MQTT_SHARED_GROUP no.
+    """
+
+    def __init__(self, app, stats_interval=30):
+        self.app = app
+        self.stats_interval = stats_interval
+        self.batch_size = app.config.get('INGEST_BATCH_SIZE', 100)
+        self.batch_interval = app.config.get('INGEST_BATCH_INTERVAL', 1.0)
+        self.writers = app.config.get('INGEST_WORKERS', 4)
+        self.binary_suffix = app.config.get('MQTT_BINARY_TOPIC_SUFFIX', '/bin')
+        self.max_samples = app.config.get('INGEST_MAX_SAMPLES', 500)
+        self.router = TopicRouter.from_config(app.config)
+        self.node_subscriptions = NodeSubscriptions(self.router) if self.router.partitioned else None
+        self.spool = create_spool(app)
+        self.replayer = None
+        self.compactor = create_compactor(app)
+        self.client = None
+        self.loop = None
+        self.queues = []
+        self.executor = None
+        self._stopping = None
+        self._writing = 0
+
+    async def run(self):
+        """Ejecuta el gateway hasta recibir SIGINT/SIGTERM"""
+        self.loop = asyncio.get_running_loop()
+        capacity = self.app.config.get('INGEST_QUEUE_SIZE', 10000)
+        self.queues = [asyncio.Queue(maxsize=max(1, capacity // self.writers)) for _ in range(self.writers)]
+        self.executor = ThreadPoolExecutor(max_workers=self.writers, thread_name_prefix='ingest-writer')
+        self._stopping = asyncio.Event()
+        metrics.set_gauge('ingest.queue_capacity', capacity)
+        metrics.set_gauge('ingest.workers', self.writers)
+
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            self.loop.add_signal_handler(sig, self._stopping.set)
+
+        if self.spool:
+            self.replayer = SpoolReplayer(
+                self.app,
+                self.spool,
+                MeasurementService.save_batch,
+                self._decode,
+                batch_size=self.batch_size,
+                max_rate=self.app.config.get('INGEST_SPOOL_REPLAY_RATE', 500)
+            )
+            self.replayer.start()
+        if self.compactor:
+            self.compactor.start()
+
+        self._create_client()
+        await self._connect()
+        consumers = [asyncio.create_task(self._consume(q)) for q in self.queues]
+        reporter = asyncio.create_task(self._report())
+        refresher = asyncio.create_task(self._refresh_loop()) if self.node_subscriptions else None
+
+        await self._stopping.wait()
+        print("Deteniendo gateway de ingesta...")
+        self.client.disconnect()
+        reporter.cancel()
+        if refresher:
+            refresher.cancel()
+        await asyncio.gather(*consumers)
+        await self.shutdown()
+
+    def stop(self):
+        """Solicita la detención ordenada del gateway"""
+        if self._stopping:
+            self._stopping.set()
+
+    async def shutdown(self):
+        """Cierra el pool de escritura, el spool y los threads auxiliares"""
+        self.executor.shutdown(wait=True)
+        if self.replayer:
+            self.replayer.stop()
+        if self.compactor:
+            self.compactor.stop()
+        if self.spool:
+            self.spool.close()
+        last_seen.stop()
+
+    def _create_client(self):
+        self.client = create_mqtt_client(self.app.config)
+        self.client.on_connect = self.on_connect
+        self.client.on_message = self.on_message
+        self.client.on_disconnect = self.on_disconnect
+        AsyncMQTTClient(self.loop, self.client)
+
+    async def _connect(self, reconnect=False):
+        """Conecta (o reconecta) al broker con espera exponencial entre intentos"""
+        delay = 1
+        while not self._stopping.is_set():
+            try:
+                if reconnect:
+                    self.client.reconnect()
+                else:
+                    self.client.connect(
+                        self.app.config['MQTT_BROKER_URL'],
+                        self.app.config['MQTT_BROKER_PORT'],
+                        60
+                    )
+                return
+            except Exception as e:
+                print(f"Error conectando a MQTT: {e}. Reintento en {delay}s")
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                delay = min(delay * 2, 60)
+                reconnect = False
+
+    def on_connect(self, client, userdata, flags, rc, properties=None):
+        """Callback cuando se conecta al broker"""
+        if rc == 0:
+            print("Gateway conectado al broker MQTT")
+            topics = self.router.subscriptions()
+            if topics:
+                client.subscribe([(t, 0) for t in topics])
+                print(f"Suscrito a: {', '.join(topics)}")
+            # Con reparto por instancia, tópicos explícitos de los nodos propios
+            if self.node_subscriptions:
+                self.node_subscriptions.reset()
+                self.loop.create_task(self._refresh_subscriptions())
+        else:
+            print(f"Falló conexión MQTT con código: {rc}")
+
+    def on_disconnect(self, client, userdata, rc, properties=None):
+        """Callback cuando se desconecta; reconecta si no fue solicitado"""
+        if rc != 0 and not self._stopping.is_set():
+            print(f"Desconexión inesperada. Código: {rc}")
+            self.loop.create_task(self._connect(reconnect=True))
+
+    def on_message(self, client, userdata, msg):
+        """Callback en el event loop: solo encola el mensaje crudo"""
+        message = make_message(msg.topic, msg.payload)
+        metrics.inc('ingest.messages_received')
+        shard = self.router.shard(message.topic, message.payload, len(self.queues))
+        try:
+            self.queues[shard].put_nowait(message)
+        except asyncio.QueueFull:
+            metrics.inc('ingest.queue_full')
+            if self.spool:
+                self.spool.append_raw(message.topic, message.payload, message.received_at)
+                metrics.inc('ingest.queue_spilled')
+            else:
+                metrics.inc('ingest.queue_dropped')
+
+    def _decode(self, message):
+        return decode_message(message, self.binary_suffix, self.max_samples,
+                              node_id=self.router.node_id(message.topic))
+
+    async def _consume(self, queue):
+        """Decodifica los mensajes de una partición y escribe sus lotes de a uno (en orden)"""
+        batch = []
+        deadline = self.loop.time() + self.batch_interval
+
+        while not (self._stopping.is_set() and queue.empty()):
+            try:
+                message = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                try:
+                    timeout = max(deadline - self.loop.time(), 0.001)
+                    message = await asyncio.wait_for(queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    message = None
+
+            if message is not None:
+                batch.extend(self._decode(message))
+
+            if len(batch) >= self.batch_size or (batch and self.loop.time() >= deadline):
+                await self._write(batch)
+                batch = []
+            if self.loop.time() >= deadline:
+                deadline = self.loop.time() + self.batch_interval
+                metrics.set_gauge('ingest.queue_depth', self._queue_depth())
+
+        if batch:
+            await self._write(batch)
+
+    async def _write(self, batch):
+        """Escribe un lote en el pool de threads; la partición espera a que termine"""
+        self._writing += 1
+        try:
+            await self.loop.run_in_executor(self.executor, self._write_batch, batch)
+        finally:
+            self._writing -= 1
+
+    def _queue_depth(self):
+        return sum(q.qsize() for q in self.queues)
+
+    def _write_batch(self, batch):
+        """Escribe un lote en un thread del pool dentro de su propio contexto de aplicación"""
+        start = time.perf_counter()
+        with self.app.app_context():
+            try:
+                save_or_spool(batch, self.spool)
+            except Exception as e:
+                metrics.inc('ingest.flush_errors')
+                print(f"Error guardando lote de mediciones: {e}")
+            finally:
+                metrics.observe('ingest.flush_latency_ms', (time.perf_counter() - start) * 1000)
+                metrics.observe('ingest.batch_size', len(batch))
+                metrics.inc('ingest.flushes')
+
+    async def _refresh_loop(self):
+        """Suscribe periódicamente los tópicos de los nodos nuevos de esta instancia"""
+        interval = self.app.config.get('MQTT_SUBSCRIPTION_REFRESH', 60)
+        while True:
+            await asyncio.sleep(interval)
+            await self._refresh_subscriptions()
+
+    async def _refresh_subscriptions(self):
+        try:
+            node_ids = await self.loop.run_in_executor(self.executor, self._node_ids)
+        except Exception as e:
+            print(f"Error actualizando suscripciones por nodo: {e}")
+            return
+        for chunk in self.node_subscriptions.pending(node_ids):
+            self.client.subscribe([(t, 0) for t in chunk])
+            print(f"Suscrito a {len(chunk)} tópicos de nodos")
+
+    def _node_ids(self):
+        with self.app.app_context():
+            return NodeRepository.find_ids()
+
+    async def _report(self):
+        """Imprime periódicamente el rendimiento del gateway"""
+        last_count = metrics.get_counter('ingest.messages_received')
+        while True:
+            await asyncio.sleep(self.stats_interval)
+            count = metrics.get_counter('ingest.messages_received')
+            print(f"Ingesta: {(count - last_count) / self.stats_interval:.1f} msg/s | "
+                  f"cola {self._queue_depth()} | lotes en curso {self._writing} | "
+                  f"spool {self.spool.size_bytes if self.spool else 0} bytes")
+            last_count = count
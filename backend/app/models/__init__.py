@@ -6,6 +6,10 @@ from app.models.measurement import Measurement
 from app.models.alert import Alert
 from app.models.report import Report
 from app.models.ia_model import IAModel
+from app.models.rollup import MinuteRollup, FiveMinuteRollup, HourRollup, DayRollup, RollupPending
 
-__all__ = ['User', 'Node', 'Sensor', 'Measurement', 'Alert', 'Report', 'IAModel']
+__all__ = [
+    'User', 'Node', 'Sensor', 'Measurement', 'Alert', 'Report', 'IAModel',
+    'MinuteRollup', 'FiveMinuteRollup', 'HourRollup', 'DayRollup', 'RollupPending'
+]
 
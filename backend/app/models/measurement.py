@@ -11,10 +11,13 @@ class Measurement(db.Model):
     temperatura = db.Column(db.Float, nullable=False)
     humedad = db.Column(db.Float, nullable=False)
     co2 = db.Column(db.Float, nullable=False)
+    # Clave de idempotencia enviada por el nodo (seq o hash de msg_id)
+    secuencia = db.Column(db.BigInteger, nullable=True)
     
     # Índice compuesto para consultas frecuentes
     __table_args__ = (
         db.Index('idx_nodo_fecha', 'nodo_id', 'fecha_hora'),
+        db.UniqueConstraint('nodo_id', 'secuencia', name='uq_nodo_secuencia'),
     )
     
     def to_dict(self):
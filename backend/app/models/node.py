@@ -1,6 +1,7 @@
 # backend/app/models/node.py
 from datetime import datetime
 from app.extensions import db
+from app.utils.last_seen import last_seen
 
 class Node(db.Model):
     __tablename__ = 'nodos'
@@ -18,7 +19,16 @@ class Node(db.Model):
     mediciones = db.relationship('Measurement', backref='nodo', lazy='dynamic', cascade='all, delete-orphan')
     alertas = db.relationship('Alert', backref='nodo', lazy='dynamic')
     
+    @property
+    def ultima_conexion_actual(self):
+        """Última conexión incluyendo la pendiente de escribir en memoria"""
+        pending = last_seen.get(self.id)
+        if pending and (self.ultima_conexion is None or pending > self.ultima_conexion):
+            return pending
+        return self.ultima_conexion
+    
     def to_dict(self):
+        ultima_conexion = self.ultima_conexion_actual
         return {
             'id': self.id,
             'ubicacion': self.ubicacion,
@@ -26,7 +36,7 @@ class Node(db.Model):
             'velocidad_datos': self.velocidad_datos,
             'estado': self.estado,
             'fecha_registro': self.fecha_registro.isoformat(),
-            'ultima_conexion': self.ultima_conexion.isoformat() if self.ultima_conexion else None,
+            'ultima_conexion': ultima_conexion.isoformat() if ultima_conexion else None,
             'sensores': [s.to_dict() for s in self.sensores.all()]
         }
 
@@ -0,0 +1,61 @@
+# backend/app/models/rollup.py
+from app.extensions import db
+
+# Variables agregadas: (prefijo de columna en los rollups, columna en mediciones)
+ROLLUP_VARIABLES = (('temp', 'temperatura'), ('hum', 'humedad'), ('co2', 'co2'))
+
+# Orden de los valores de un acumulador: cantidad y, por variable, suma, mínimo, máximo y suma de cuadrados
+ROLLUP_COLUMNS = ('cantidad',) + tuple(
+    f'{prefix}_{stat}'
+    for prefix, _ in ROLLUP_VARIABLES
+    for stat in ('suma', 'minimo', 'maximo', 'suma_cuadrados')
+)
+
+class RollupMixin:
+    """Agregados de mediciones por nodo e intervalo (inicio del intervalo en UTC)"""
+    nodo_id = db.Column(db.Integer, db.ForeignKey('nodos.id', ondelete='CASCADE'), primary_key=True)
+    inicio = db.Column(db.DateTime, primary_key=True)
+    cantidad = db.Column(db.Integer, nullable=False)
+    temp_suma = db.Column(db.Float, nullable=False)
+    temp_minimo = db.Column(db.Float, nullable=False)
+    temp_maximo = db.Column(db.Float, nullable=False)
+    temp_suma_cuadrados = db.Column(db.Float, nullable=False)
+    hum_suma = db.Column(db.Float, nullable=False)
+    hum_minimo = db.Column(db.Float, nullable=False)
+    hum_maximo = db.Column(db.Float, nullable=False)
+    hum_suma_cuadrados = db.Column(db.Float, nullable=False)
+    co2_suma = db.Column(db.Float, nullable=False)
+    co2_minimo = db.Column(db.Float, nullable=False)
+    co2_maximo = db.Column(db.Float, nullable=False)
+    co2_suma_cuadrados = db.Column(db.Float, nullable=False)
+
+class MinuteRollup(RollupMixin, db.Model):
+    __tablename__ = 'mediciones_minuto'
+    seconds = 60
+
+class FiveMinuteRollup(RollupMixin, db.Model):
+    __tablename__ = 'mediciones_5min'
+    seconds = 300
+
+class HourRollup(RollupMixin, db.Model):
+    __tablename__ = 'mediciones_hora'
+    seconds = 3600
+
+class DayRollup(RollupMixin, db.Model):
+    __tablename__ = 'mediciones_dia'
+    seconds = 86400
+
+# Del más fino al más grueso; cada nivel se calcula a partir del anterior
+ROLLUP_MODELS = (MinuteRollup, FiveMinuteRollup, HourRollup, DayRollup)
+
+class RollupPending(db.Model):
+    """Minutos con mediciones nuevas que el compactador todavía no incorporó a los rollups"""
+    __tablename__ = 'rollups_pendientes'
+
+    id = db.Column(db.Integer, primary_key=True)
+    nodo_id = db.Column(db.Integer, nullable=False)
+    minuto = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('idx_pendiente_nodo_minuto', 'nodo_id', 'minuto'),
+    )
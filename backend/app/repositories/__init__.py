@@ -1,14 +1,21 @@
 # backend/app/repositories/__init__.py
+from app.repositories.unit_of_work import UnitOfWork
 from app.repositories.user_repository import UserRepository
-from app.repositories.node_repository import NodeRepository
+from app.repositories.node_repository import NodeRepository, node_metadata_cache
 from app.repositories.measurement_repository import MeasurementRepository
+from app.repositories.rollup_repository import RollupRepository
+from app.repositories.partition_manager import get_partition_manager
 from app.repositories.alert_repository import AlertRepository
 from app.repositories.report_repository import ReportRepository
 
 __all__ = [
+    'UnitOfWork',
     'UserRepository',
     'NodeRepository', 
+    'node_metadata_cache',
     'MeasurementRepository',
+    'RollupRepository',
+    'get_partition_manager',
     'AlertRepository',
     'ReportRepository'
 ]
@@ -1,11 +1,13 @@
 # backend/app/repositories/alert_repository.py
 from datetime import datetime, date
+from sqlalchemy import select, func
 from app.extensions import db
 from app.models import Alert
+from app.repositories.unit_of_work import get_session, commit_or_flush
 
 class AlertRepository:
     @staticmethod
-    def create(alert_data):
+    def create(alert_data, uow=None):
         """Crea una nueva alerta"""
         # Si no se proporciona fecha/hora, usar actual
         if 'fecha' not in alert_data:
@@ -14,10 +16,23 @@ class AlertRepository:
             alert_data['hora'] = datetime.now().time()
         
         alert = Alert(**alert_data)
-        db.session.add(alert)
-        db.session.commit()
+        get_session(uow).add(alert)
+        commit_or_flush(uow)
         return alert
     
+    @staticmethod
+    def create_bulk(alerts_data, uow=None):
+        """Crea múltiples alertas en una sola transacción"""
+        alerts = []
+        for alert_data in alerts_data:
+            alert_data.setdefault('fecha', date.today())
+            alert_data.setdefault('hora', datetime.now().time())
+            alerts.append(Alert(**alert_data))
+        
+        get_session(uow).add_all(alerts)
+        commit_or_flush(uow)
+        return alerts
+    
     @staticmethod
     def find_by_id(alert_id):
         """Busca alerta por ID"""
@@ -35,6 +50,52 @@ class AlertRepository:
         
         return query.order_by(Alert.fecha.desc(), Alert.hora.desc()).all()
     
+    @staticmethod
+    def find_recent_by_nodes(node_ids, start_date=None, end_date=None, per_node=10):
+        """Últimas per_node alertas de cada nodo en una sola consulta; retorna {nodo_id: [alertas]}"""
+        ranked = select(
+            Alert.id,
+            func.row_number().over(
+                partition_by=Alert.nodo_id, order_by=(Alert.fecha.desc(), Alert.hora.desc())
+            ).label('rn')
+        ).where(Alert.nodo_id.in_(node_ids))
+        if start_date:
+            ranked = ranked.where(Alert.fecha >= start_date)
+        if end_date:
+            ranked = ranked.where(Alert.fecha <= end_date)
+        ranked = ranked.subquery()
+        
+        alerts = Alert.query.join(ranked, Alert.id == ranked.c.id)\
+            .filter(ranked.c.rn <= per_node)\
+            .order_by(Alert.nodo_id, Alert.fecha.desc(), Alert.hora.desc()).all()
+        by_node = {node_id: [] for node_id in node_ids}
+        for alert in alerts:
+            by_node[alert.nodo_id].append(alert)
+        return by_node
+    
+    @staticmethod
+    def count_by_nodes(node_ids=None, start_date=None, end_date=None):
+        """Conteo de alertas por nodo, estado y severidad con un GROUP BY (node_ids None = todos)
+
+        Retorna {nodo_id: {'total', 'por_estado', 'por_severidad'}}.
+        """
+        stmt = select(Alert.nodo_id, Alert.estado, Alert.severidad, func.count(Alert.id))\
+            .group_by(Alert.nodo_id, Alert.estado, Alert.severidad)
+        if node_ids is not None:
+            stmt = stmt.where(Alert.nodo_id.in_(node_ids))
+        if start_date:
+            stmt = stmt.where(Alert.fecha >= start_date)
+        if end_date:
+            stmt = stmt.where(Alert.fecha <= end_date)
+        
+        counts = {node_id: {'total': 0, 'por_estado': {}, 'por_severidad': {}} for node_id in node_ids or ()}
+        for node_id, estado, severidad, total in db.session.execute(stmt):
+            entry = counts.setdefault(node_id, {'total': 0, 'por_estado': {}, 'por_severidad': {}})
+            entry['total'] += total
+            entry['por_estado'][estado] = entry['por_estado'].get(estado, 0) + total
+            entry['por_severidad'][severidad] = entry['por_severidad'].get(severidad, 0) + total
+        return counts
+    
     @staticmethod
     def find_active():
         """Obtiene alertas activas"""
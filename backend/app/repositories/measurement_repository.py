@@ -1,25 +1,118 @@
 # backend/app/repositories/measurement_repository.py
+import time
 from datetime import datetime, timedelta
-from sqlalchemy import func, and_
+from flask import current_app
+from sqlalchemy import select, insert, and_, or_, case, func, tuple_
 from app.extensions import db
 from app.models import Measurement
+from app.models.rollup import ROLLUP_VARIABLES
+from app.repositories.unit_of_work import get_session, commit_or_flush
+from app.repositories.partition_manager import get_partition_manager
+from app.repositories.rollup_repository import (
+    EPOCH, RollupRepository, empty_accumulator, summarize_accumulator, row_accumulator
+)
+from app.utils.metrics import metrics
+from app.utils.time_buckets import parse_bucket, epoch_bucket
+
+# Columnas que se leen sin construir objetos ORM (paginación y exportación)
+MEASUREMENT_COLUMNS = (
+    Measurement.id, Measurement.nodo_id, Measurement.fecha_hora,
+    Measurement.temperatura, Measurement.humedad, Measurement.co2
+)
 
 class MeasurementRepository:
     @staticmethod
-    def create(measurement_data):
+    def create(measurement_data, uow=None):
         """Crea una nueva medición"""
         measurement = Measurement(**measurement_data)
-        db.session.add(measurement)
-        db.session.commit()
+        get_session(uow).add(measurement)
+        commit_or_flush(uow)
         return measurement
     
     @staticmethod
-    def create_bulk(measurements_data):
-        """Crea múltiples mediciones de forma eficiente"""
-        measurements = [Measurement(**data) for data in measurements_data]
-        db.session.bulk_save_objects(measurements)
-        db.session.commit()
-        return measurements
+    def create_bulk(measurements_data, uow=None, ignore_duplicates=False):
+        """Crea múltiples mediciones con una sola sentencia INSERT multi-fila
+
+        Con ignore_duplicates, las filas con una clave (nodo_id, secuencia) ya registrada se
+        descartan y no se incluyen en el resultado: solo se retornan las mediciones insertadas.
+        """
+        if not measurements_data:
+            return []
+        
+        # Ejecución a nivel Core en la conexión de la sesión (misma transacción)
+        connection = get_session(uow).connection()
+        if ignore_duplicates:
+            inserted = MeasurementRepository._insert_ignore(connection, measurements_data)
+            metrics.inc('ingest.duplicates_db', len(measurements_data) - len(inserted))
+        else:
+            connection.execute(insert(Measurement.__table__), measurements_data)
+            inserted = measurements_data
+        commit_or_flush(uow)
+        
+        # Objetos transitorios (sin id) para verificar umbrales y serializar
+        return [Measurement(**data) for data in inserted]
+    
+    @staticmethod
+    def existing_sequences(keys, connection=None):
+        """Claves (nodo_id, secuencia) de la lista que ya están registradas
+
+        Se consulta en grupos acotados sobre el índice de uq_nodo_secuencia. Con la tabla
+        particionada la restricción incluye fecha_hora y la base ya no rechaza una secuencia
+        repetida con otra fecha: esta consulta es la que mantiene la unicidad por secuencia.
+        """
+        keys = list(keys)
+        if connection is None:
+            connection = get_session().connection()
+        existing = set()
+        for i in range(0, len(keys), 1000):
+            existing.update(tuple(row) for row in connection.execute(
+                select(Measurement.nodo_id, Measurement.secuencia)
+                .where(tuple_(Measurement.nodo_id, Measurement.secuencia).in_(keys[i:i + 1000]))
+            ).all())
+        return existing
+    
+    @staticmethod
+    def _insert_ignore(connection, rows):
+        """INSERT que ignora filas duplicadas según el dialecto; retorna las filas insertadas
+
+        En todos los dialectos se descartan antes las claves (nodo_id, secuencia) ya
+        existentes, porque con la tabla particionada la restricción única incluye fecha_hora.
+        El INSERT con ON CONFLICT / IGNORE cubre las inserciones concurrentes; PostgreSQL y
+        SQLite >= 3.35 además informan las filas insertadas con RETURNING.
+        """
+        dialect = connection.dialect
+        keyed = lambda row: row.get('secuencia') is not None
+        
+        existing = MeasurementRepository.existing_sequences(
+            [(row['nodo_id'], row['secuencia']) for row in rows if keyed(row)], connection
+        )
+        rows = [row for row in rows if not keyed(row) or (row['nodo_id'], row['secuencia']) not in existing]
+        if not rows:
+            return []
+        
+        if dialect.name == 'postgresql' or (
+            dialect.name == 'sqlite' and dialect.server_version_info >= (3, 35)
+        ):
+            if dialect.name == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            stmt = dialect_insert(Measurement.__table__).on_conflict_do_nothing().returning(
+                Measurement.nodo_id, Measurement.secuencia
+            )
+            created = {(row.nodo_id, row.secuencia) for row in connection.execute(stmt, rows)}
+            return [row for row in rows if not keyed(row) or (row['nodo_id'], row['secuencia']) in created]
+        
+        stmt = insert(Measurement.__table__)
+        if dialect.name in ('mysql', 'mariadb'):
+            stmt = stmt.prefix_with('IGNORE')
+        elif dialect.name == 'sqlite':
+            stmt = stmt.prefix_with('OR IGNORE')
+        result = connection.execute(stmt, rows)
+        # Una inserción concurrente entre la consulta y el INSERT se descarta sin identificarla
+        if result.rowcount is not None and 0 <= result.rowcount < len(rows):
+            metrics.inc('ingest.duplicates_race', len(rows) - result.rowcount)
+        return rows
     
     @staticmethod
     def find_by_node(node_id, start_date=None, end_date=None, limit=1000):
@@ -33,6 +126,67 @@ class MeasurementRepository:
         
         return query.order_by(Measurement.fecha_hora.desc()).limit(limit).all()
     
+    @staticmethod
+    def find_page(node_id, start_date=None, end_date=None, after=None, limit=1000, ascending=False):
+        """Página de mediciones de un nodo con paginación por clave (fecha_hora, id)
+
+        after es la posición (fecha_hora, id) de la última fila de la página anterior: la
+        consulta continúa sobre el índice desde ese punto en lugar de saltar filas con OFFSET.
+        Retorna filas livianas (id, nodo_id, fecha_hora, temperatura, humedad, co2).
+        """
+        stmt = select(*MEASUREMENT_COLUMNS).where(Measurement.nodo_id == node_id)
+        if start_date:
+            stmt = stmt.where(Measurement.fecha_hora >= start_date)
+        if end_date:
+            stmt = stmt.where(Measurement.fecha_hora <= end_date)
+        
+        if after:
+            fecha_hora, row_id = after
+            if ascending:
+                stmt = stmt.where(or_(
+                    Measurement.fecha_hora > fecha_hora,
+                    and_(Measurement.fecha_hora == fecha_hora, Measurement.id > row_id)
+                ))
+            else:
+                stmt = stmt.where(or_(
+                    Measurement.fecha_hora < fecha_hora,
+                    and_(Measurement.fecha_hora == fecha_hora, Measurement.id < row_id)
+                ))
+        
+        if ascending:
+            stmt = stmt.order_by(Measurement.fecha_hora, Measurement.id)
+        else:
+            stmt = stmt.order_by(Measurement.fecha_hora.desc(), Measurement.id.desc())
+        return db.session.execute(stmt.limit(limit)).all()
+    
+    @staticmethod
+    def stream_by_node(node_id, start_date, end_date, batch_size=1000):
+        """Recorre todas las mediciones del rango en orden cronológico sin cargarlas en memoria
+
+        Usa un cursor del lado del servidor (yield_per) y entrega lotes de batch_size filas.
+        """
+        stmt = select(*MEASUREMENT_COLUMNS).where(
+            Measurement.nodo_id == node_id,
+            Measurement.fecha_hora >= start_date,
+            Measurement.fecha_hora <= end_date
+        ).order_by(Measurement.fecha_hora, Measurement.id)
+        
+        result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+        try:
+            yield from result
+        finally:
+            result.close()
+    
+    @staticmethod
+    def find_after_id(node_id, after_id, start_date=None, limit=1000):
+        """Mediciones de un nodo con id mayor que after_id, en orden de id (filas livianas)"""
+        stmt = select(*MEASUREMENT_COLUMNS).where(
+            Measurement.nodo_id == node_id, Measurement.id > after_id
+        )
+        if start_date:
+            stmt = stmt.where(Measurement.fecha_hora >= start_date)
+        return db.session.execute(stmt.order_by(Measurement.id).limit(limit)).all()
+    
     @staticmethod
     def find_latest_by_node(node_id, limit=1):
         """Obtiene las últimas mediciones de un nodo"""
@@ -42,74 +196,148 @@ class MeasurementRepository:
     
     @staticmethod
     def get_statistics(node_id, start_date, end_date):
-        """Obtiene estadísticas de un nodo en un período"""
-        stats = db.session.query(
-            func.avg(Measurement.temperatura).label('temp_avg'),
-            func.min(Measurement.temperatura).label('temp_min'),
-            func.max(Measurement.temperatura).label('temp_max'),
-            func.avg(Measurement.humedad).label('hum_avg'),
-            func.min(Measurement.humedad).label('hum_min'),
-            func.max(Measurement.humedad).label('hum_max'),
-            func.avg(Measurement.co2).label('co2_avg'),
-            func.min(Measurement.co2).label('co2_min'),
-            func.max(Measurement.co2).label('co2_max'),
-            func.count(Measurement.id).label('count')
-        ).filter(
-            and_(
-                Measurement.nodo_id == node_id,
-                Measurement.fecha_hora >= start_date,
-                Measurement.fecha_hora <= end_date
-            )
-        ).first()
-        
-        return {
-            'temperatura': {
-                'promedio': float(stats.temp_avg) if stats.temp_avg else 0,
-                'minimo': float(stats.temp_min) if stats.temp_min else 0,
-                'maximo': float(stats.temp_max) if stats.temp_max else 0
-            },
-            'humedad': {
-                'promedio': float(stats.hum_avg) if stats.hum_avg else 0,
-                'minimo': float(stats.hum_min) if stats.hum_min else 0,
-                'maximo': float(stats.hum_max) if stats.hum_max else 0
-            },
-            'co2': {
-                'promedio': float(stats.co2_avg) if stats.co2_avg else 0,
-                'minimo': float(stats.co2_min) if stats.co2_min else 0,
-                'maximo': float(stats.co2_max) if stats.co2_max else 0
-            },
-            'total_mediciones': stats.count
-        }
+        """Obtiene estadísticas de un nodo en un período (rollups y mediciones crudas en los bordes)"""
+        acc = RollupRepository.get_window_accumulator(node_id, start_date, _exclusive(end_date))
+        return summarize_accumulator(acc)
+    
+    @staticmethod
+    def get_statistics_bulk(node_ids, start_date, end_date):
+        """Estadísticas de varios nodos (None = todos) en un período, agrupadas por nodo en la base
+
+        Retorna {nodo_id: estadísticas}; con node_ids explícitos incluye los nodos sin mediciones.
+        """
+        accumulators = RollupRepository.get_window_accumulators(node_ids, start_date, _exclusive(end_date))
+        if node_ids is not None:
+            for node_id in node_ids:
+                accumulators.setdefault(node_id, empty_accumulator())
+        return {node_id: summarize_accumulator(acc) for node_id, acc in accumulators.items()}
     
     @staticmethod
     def get_hourly_averages(node_id, start_date, end_date):
         """Obtiene promedios por hora"""
-        results = db.session.query(
-            func.date_format(Measurement.fecha_hora, '%Y-%m-%d %H:00:00').label('hora'),
-            func.avg(Measurement.temperatura).label('temp'),
-            func.avg(Measurement.humedad).label('hum'),
-            func.avg(Measurement.co2).label('co2')
-        ).filter(
-            and_(
-                Measurement.nodo_id == node_id,
-                Measurement.fecha_hora >= start_date,
-                Measurement.fecha_hora <= end_date
-            )
-        ).group_by('hora').all()
+        return MeasurementRepository.get_bucket_averages(
+            node_id, start_date, end_date, '1h', time_format='%Y-%m-%d %H:00:00'
+        )
+    
+    @staticmethod
+    def get_bucket_averages(node_id, start_date, end_date, bucket='1h', time_format=None):
+        """Promedios por intervalo de cualquier ancho ('1m', '5m', '15m', '1h', '1d' o segundos)"""
+        seconds = parse_bucket(bucket)
+        buckets = RollupRepository.get_bucket_accumulators(
+            node_id, start_date, _exclusive(end_date), seconds
+        )
+        results = []
+        for start, acc in buckets:
+            summary = summarize_accumulator(acc)
+            results.append({
+                'fecha_hora': start.strftime(time_format) if time_format else start.isoformat(),
+                'temperatura': summary['temperatura']['promedio'],
+                'humedad': summary['humedad']['promedio'],
+                'co2': summary['co2']['promedio'],
+                'total_mediciones': summary['total_mediciones']
+            })
+        return results
+    
+    @staticmethod
+    def get_series(node_ids, start_date, end_date, seconds, variables, percentiles=()):
+        """Agregados por (nodo, intervalo) de varios nodos en [start_date, end_date)
+
+        Los agregados se resuelven con los rollups (RollupRepository.get_series_accumulators).
+        Los percentiles requieren las mediciones crudas: se calculan en una única sentencia
+        con funciones de ventana (rango más cercano), solo para las variables pedidas.
+        Retorna (origen, {(nodo, inicio): (acumulador, {variable: {percentil: valor}})}).
+        """
+        accumulators = RollupRepository.get_series_accumulators(node_ids, start_date, end_date, seconds)
+        series = {key: (acc, {}) for key, acc in accumulators.items()}
+        if not percentiles:
+            return 'rollups', series
+        
+        bucket = epoch_bucket(Measurement.fecha_hora, seconds)
+        partition = (Measurement.nodo_id, bucket)
+        ranked = select(
+            Measurement.nodo_id.label('nodo_id'),
+            bucket.label('bucket'),
+            func.count().over(partition_by=partition).label('n'),
+            *[getattr(Measurement, var).label(var) for var in variables],
+            *[
+                func.row_number().over(partition_by=partition, order_by=getattr(Measurement, var)).label(f'rn_{var}')
+                for var in variables
+            ]
+        ).where(
+            Measurement.nodo_id.in_(node_ids),
+            Measurement.fecha_hora >= start_date,
+            Measurement.fecha_hora < end_date
+        ).subquery()
+        
+        # Percentil p por rango más cercano: la fila rn con (rn - 1) < p% de n <= rn (aritmética entera)
+        columns = []
+        for var in variables:
+            rank = ranked.c[f'rn_{var}']
+            for p in percentiles:
+                columns.append(func.max(case(
+                    (and_(rank * 100 >= ranked.c.n * p, (rank - 1) * 100 < ranked.c.n * p), ranked.c[var])
+                )))
+        
+        rows = db.session.execute(
+            select(ranked.c.nodo_id, ranked.c.bucket, *columns).group_by(ranked.c.nodo_id, ranked.c.bucket)
+        )
+        for row in rows:
+            values = iter(row[2:])
+            quantiles = {var: {p: next(values) for p in percentiles} for var in variables}
+            key = (row[0], EPOCH + timedelta(seconds=row[1]))
+            series.setdefault(key, (empty_accumulator(), {}))[1].update(quantiles)
         
-        return [{
-            'fecha_hora': r.hora,
-            'temperatura': float(r.temp),
-            'humedad': float(r.hum),
-            'co2': float(r.co2)
-        } for r in results]
+        # Intervalos de los rollups sin mediciones crudas (no debería ocurrir dentro de la retención)
+        empty = {var: {p: None for p in percentiles} for var in variables}
+        for _, quantiles in series.values():
+            for var, values in empty.items():
+                quantiles.setdefault(var, dict(values))
+        return 'rollups+raw', series
     
     @staticmethod
-    def delete_old_measurements(days=90):
-        """Elimina mediciones antiguas (limpieza automática)"""
+    def delete_old_measurements(days=90, batch_size=5000, pause=0.1):
+        """Elimina mediciones antiguas (limpieza automática)
+
+        Con la tabla particionada se eliminan las particiones completas anteriores al corte;
+        el resto se borra en lotes pequeños, cada uno en su propia transacción.
+        """
         cutoff_date = datetime.utcnow() - timedelta(days=days)
-        deleted = Measurement.query.filter(
-            Measurement.fecha_hora < cutoff_date
-        ).delete()
-        db.session.commit()
+        manager = get_partition_manager(
+            db.engine, current_app.config.get('MEASUREMENT_PARTITION_INTERVAL', 'month')
+        )
+        if manager.supported and manager.is_partitioned():
+            dropped = manager.drop_partitions(cutoff_date)
+            if dropped:
+                metrics.inc('retention.partitions_dropped', len(dropped))
+                print(f"Particiones eliminadas: {', '.join(dropped)}")
+        return MeasurementRepository.delete_before(cutoff_date, batch_size=batch_size, pause=pause)
+    
+    @staticmethod
+    def delete_before(cutoff_date, batch_size=5000, pause=0.1, node_ids=None):
+        """Borra las mediciones anteriores a cutoff_date en lotes de batch_size con pausas entre lotes
+
+        Cada lote es una transacción corta: no bloquea la ingesta ni acumula un undo log enorme.
+        """
+        deleted = 0
+        while True:
+            query = db.session.query(Measurement.id).filter(Measurement.fecha_hora < cutoff_date)
+            if node_ids:
+                query = query.filter(Measurement.nodo_id.in_(node_ids))
+            ids = [row.id for row in query.order_by(Measurement.fecha_hora).limit(batch_size)]
+            if not ids:
+                break
+            
+            db.session.query(Measurement).filter(Measurement.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+            deleted += len(ids)
+            metrics.inc('retention.deleted', len(ids))
+            
+            if len(ids) < batch_size:
+                break
+            if pause:
+                time.sleep(pause)
         return deleted
+
+def _exclusive(end_date):
+    """Los períodos incluyen end_date; internamente se usan intervalos [inicio, fin)"""
+    return end_date + timedelta(microseconds=1)
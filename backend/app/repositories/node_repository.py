@@ -1,7 +1,28 @@
 # backend/app/repositories/node_repository.py
 from datetime import datetime
+from sqlalchemy import select
+from collections import namedtuple
 from app.extensions import db
 from app.models import Node, Sensor
+from app.utils.cache import TTLCache
+from app.utils.last_seen import last_seen
+from app.repositories.unit_of_work import get_session
+
+# Metadatos de un nodo usados en la ingesta (inmutables, sin sesión de SQLAlchemy)
+NodeMetadata = namedtuple('NodeMetadata', ['id', 'estado', 'velocidad_datos', 'thresholds'])
+
+# Umbral compilado de un sensor activo: campo de la medición y tipo de alerta
+SensorThreshold = namedtuple('SensorThreshold', ['sensor_id', 'campo', 'tipo', 'umbral_min', 'umbral_max'])
+
+SENSOR_VARIABLES = {
+    'temp': ('temperatura', 'Temperatura'),
+    'hum': ('humedad', 'Humedad'),
+    'CO2': ('co2', 'CO2')
+}
+
+# Caché de metadatos por nodo; se invalida explícitamente en cada CRUD de nodos y sensores
+# (solo en este proceso: en los demás el TTL acota la demora)
+node_metadata_cache = TTLCache('node_metadata', maxsize=10000, ttl=30.0, miss_ttl=5.0)
 
 class NodeRepository:
     @staticmethod
@@ -10,6 +31,7 @@ class NodeRepository:
         node = Node(**node_data)
         db.session.add(node)
         db.session.commit()
+        node_metadata_cache.invalidate(node.id)
         return node
     
     @staticmethod
@@ -17,11 +39,48 @@ class NodeRepository:
         """Busca nodo por ID"""
         return Node.query.get(node_id)
     
+    @staticmethod
+    def get_metadata(node_id):
+        """Obtiene existencia, estado y umbrales compilados de un nodo desde caché"""
+        try:
+            node_id = int(node_id)
+        except (TypeError, ValueError):
+            return None
+        return node_metadata_cache.get_or_load(node_id, NodeRepository._load_metadata)
+    
+    @staticmethod
+    def _load_metadata(node_id):
+        """Carga los metadatos de un nodo con sus sensores activos"""
+        node = Node.query.get(node_id)
+        if not node:
+            return None
+        
+        thresholds = []
+        for sensor in Sensor.query.filter_by(nodo_id=node_id, estado='ON').all():
+            if sensor.variable not in SENSOR_VARIABLES:
+                continue
+            campo, tipo = SENSOR_VARIABLES[sensor.variable]
+            thresholds.append(SensorThreshold(
+                sensor.id, campo, tipo, sensor.umbral_min, sensor.umbral_max
+            ))
+        
+        return NodeMetadata(node.id, node.estado, node.velocidad_datos, tuple(thresholds))
+    
+    @staticmethod
+    def find_by_ids(node_ids):
+        """Busca varios nodos en una consulta; retorna {id: nodo} (omite los inexistentes)"""
+        return {node.id: node for node in Node.query.filter(Node.id.in_(node_ids)).all()}
+    
     @staticmethod
     def find_all():
         """Obtiene todos los nodos"""
         return Node.query.all()
     
+    @staticmethod
+    def find_ids():
+        """ids de todos los nodos"""
+        return db.session.execute(select(Node.id)).scalars().all()
+    
     @staticmethod
     def find_active():
         """Obtiene nodos activos"""
@@ -36,6 +95,7 @@ class NodeRepository:
                 if hasattr(node, key):
                     setattr(node, key, value)
             db.session.commit()
+            node_metadata_cache.invalidate(node_id)
         return node
     
     @staticmethod
@@ -45,16 +105,13 @@ class NodeRepository:
         if node:
             db.session.delete(node)
             db.session.commit()
+            node_metadata_cache.invalidate(node_id)
         return node
     
     @staticmethod
-    def update_last_connection(node_id):
-        """Actualiza última conexión"""
-        node = Node.query.get(node_id)
-        if node:
-            node.ultima_conexion = datetime.utcnow()
-            db.session.commit()
-        return node
+    def update_last_connection(node_id, seen_at=None, uow=None):
+        """Actualiza última conexión (escritura diferida, ver LastSeenTracker)"""
+        last_seen.touch(node_id, seen_at or datetime.utcnow(), session=get_session(uow) if uow else None)
     
     @staticmethod
     def add_sensor(node_id, sensor_data):
@@ -62,6 +119,7 @@ class NodeRepository:
         sensor = Sensor(nodo_id=node_id, **sensor_data)
         db.session.add(sensor)
         db.session.commit()
+        node_metadata_cache.invalidate(node_id)
         return sensor
     
     @staticmethod
@@ -69,10 +127,13 @@ class NodeRepository:
         """Actualiza un sensor"""
         sensor = Sensor.query.get(sensor_id)
         if sensor:
+            previous_node_id = sensor.nodo_id
             for key, value in sensor_data.items():
                 if hasattr(sensor, key):
                     setattr(sensor, key, value)
             db.session.commit()
+            node_metadata_cache.invalidate(previous_node_id)
+            node_metadata_cache.invalidate(sensor.nodo_id)
         return sensor
     
     @staticmethod
@@ -82,4 +143,5 @@ class NodeRepository:
         if sensor:
             db.session.delete(sensor)
             db.session.commit()
+            node_metadata_cache.invalidate(sensor.nodo_id)
         return sensor
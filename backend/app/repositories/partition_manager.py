@@ -0,0 +1,289 @@
+# backend/app/repositories/partition_manager.py
+import re
+from datetime import datetime, timedelta
+from sqlalchemy import DateTime, column, func, inspect, select, table, text
+
+PARTITION_INTERVALS = ('month', 'week')
+
+_PG_BOUND = re.compile(r"TO \('([^']+)'\)")
+
+def partition_start(value, interval='month'):
+    """Inicio del mes (o de la semana, lunes) que contiene value"""
+    day = datetime(value.year, value.month, value.day)
+    if interval == 'week':
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+def next_partition_start(value, interval='month'):
+    """Inicio de la partición siguiente a la que empieza en value"""
+    if interval == 'week':
+        return value + timedelta(days=7)
+    return (value.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+def start_before(bound, interval='month'):
+    """Inicio de la partición cuyo límite superior es bound"""
+    return partition_start(bound - timedelta(days=1), interval)
+
+def partition_name(start):
+    """Nombre de la partición por su fecha inicial (p20261101)"""
+    return start.strftime('p%Y%m%d')
+
+class PartitionManager:
+    """Particiones por rango de fecha_hora de una tabla (base: motores sin particionado)
+
+    Cada partición se identifica por su límite superior exclusivo; la retención elimina
+    (o desvincula) las particiones completas anteriores al corte en lugar de borrar filas.
+    """
+
+    supported = False
+
+    def __init__(self, engine, table='mediciones', interval='month'):
+        if interval not in PARTITION_INTERVALS:
+            raise ValueError(f'Intervalo de partición inválido: {interval}')
+        self.engine = engine
+        self.table = table
+        self.interval = interval
+
+    def is_partitioned(self):
+        return False
+
+    def partitions(self):
+        """Particiones en orden: [(nombre, límite superior o None si no tiene límite)]"""
+        return []
+
+    def boundaries(self, until):
+        """Límites superiores desde la partición que contiene el dato más antiguo hasta cubrir until"""
+        with self.engine.connect() as conn:
+            oldest = conn.execute(
+                select(func.min(column('fecha_hora', DateTime))).select_from(table(self.table))
+            ).scalar()
+        start = partition_start(oldest or until, self.interval)
+        bounds = []
+        while not bounds or bounds[-1] <= until:
+            start = next_partition_start(start, self.interval)
+            bounds.append(start)
+        return bounds
+
+    def ensure_partitions(self, until):
+        raise NotImplementedError(f'{self.engine.dialect.name} no admite particionado por rango')
+
+    def drop_partitions(self, cutoff, detach=False):
+        raise NotImplementedError(f'{self.engine.dialect.name} no admite particionado por rango')
+
+    def convert(self, until):
+        raise NotImplementedError(f'{self.engine.dialect.name} no admite particionado por rango')
+
+    def expired(self, cutoff):
+        """Particiones cuyo rango completo es anterior a cutoff"""
+        return [name for name, upper in self.partitions() if upper is not None and upper <= cutoff]
+
+class MySQLPartitionManager(PartitionManager):
+    """RANGE COLUMNS(fecha_hora) con una partición pmax abierta para datos futuros
+
+    MySQL exige que toda clave única incluya la columna de partición y no admite claves
+    foráneas en tablas particionadas: la conversión reemplaza la clave primaria por
+    (id, fecha_hora), uq_nodo_secuencia por (nodo_id, secuencia, fecha_hora) y elimina la
+    clave foránea a nodos.
+    """
+
+    supported = True
+
+    def is_partitioned(self):
+        return bool(self.partitions())
+
+    def partitions(self):
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(
+                'SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS '
+                'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL '
+                'ORDER BY PARTITION_ORDINAL_POSITION'
+            ), {'table': self.table}).all()
+        return [(name, _parse_mysql_bound(description)) for name, description in rows]
+
+    def ensure_partitions(self, until):
+        """Divide pmax para que existan particiones hasta cubrir until; retorna las creadas"""
+        bounded = [upper for _, upper in self.partitions() if upper is not None]
+        if not bounded:
+            raise RuntimeError(f'{self.table} no está particionada (ejecutar convert)')
+
+        created = []
+        upper = bounded[-1]
+        while upper <= until:
+            created.append((partition_name(upper), next_partition_start(upper, self.interval)))
+            upper = created[-1][1]
+        if not created:
+            return []
+
+        definitions = ', '.join(
+            f"PARTITION {name} VALUES LESS THAN ('{bound:%Y-%m-%d %H:%M:%S}')" for name, bound in created
+        )
+        with self.engine.begin() as conn:
+            conn.execute(text(
+                f'ALTER TABLE {self.table} REORGANIZE PARTITION pmax INTO '
+                f'({definitions}, PARTITION pmax VALUES LESS THAN (MAXVALUE))'
+            ))
+        return [name for name, _ in created]
+
+    def drop_partitions(self, cutoff, detach=False):
+        """Elimina las particiones anteriores a cutoff (con detach las mueve a tablas <tabla>_<partición>)"""
+        names = self.expired(cutoff)
+        with self.engine.begin() as conn:
+            for name in names:
+                if detach:
+                    archive = f'{self.table}_{name}'
+                    conn.execute(text(f'CREATE TABLE {archive} LIKE {self.table}'))
+                    conn.execute(text(f'ALTER TABLE {archive} REMOVE PARTITIONING'))
+                    conn.execute(text(f'ALTER TABLE {self.table} EXCHANGE PARTITION {name} WITH TABLE {archive}'))
+            if names:
+                conn.execute(text(f'ALTER TABLE {self.table} DROP PARTITION {", ".join(names)}'))
+        return names
+
+    def convert(self, until):
+        """Particiona la tabla existente (reescribe la tabla completa: ejecutar en mantenimiento)"""
+        if self.is_partitioned():
+            return False
+        bounds = self.boundaries(until)
+        inspector = inspect(self.engine)
+
+        with self.engine.begin() as conn:
+            for fk in inspector.get_foreign_keys(self.table):
+                conn.execute(text(f'ALTER TABLE {self.table} DROP FOREIGN KEY {fk["name"]}'))
+            unique = {u['name'] for u in inspector.get_unique_constraints(self.table)}
+            unique |= {i['name'] for i in inspector.get_indexes(self.table) if i.get('unique')}
+            drop_unique = 'DROP INDEX uq_nodo_secuencia, ' if 'uq_nodo_secuencia' in unique else ''
+            # La clave única debe incluir la columna de partición: una secuencia repetida con
+            # otra fecha_hora ya no la rechaza la base (ver scripts/manage_partitions.py)
+            conn.execute(text(
+                f'ALTER TABLE {self.table} DROP PRIMARY KEY, ADD PRIMARY KEY (id, fecha_hora), '
+                f'{drop_unique}ADD UNIQUE INDEX uq_nodo_secuencia (nodo_id, secuencia, fecha_hora)'
+            ))
+            definitions = ', '.join(
+                f"PARTITION {partition_name(start_before(bound, self.interval))} "
+                f"VALUES LESS THAN ('{bound:%Y-%m-%d %H:%M:%S}')"
+                for bound in bounds
+            )
+            conn.execute(text(
+                f'ALTER TABLE {self.table} PARTITION BY RANGE COLUMNS(fecha_hora) '
+                f'({definitions}, PARTITION pmax VALUES LESS THAN (MAXVALUE))'
+            ))
+        return True
+
+class PostgresPartitionManager(PartitionManager):
+    """Particionado declarativo (PARTITION BY RANGE) con partición DEFAULT para datos fuera de rango"""
+
+    supported = True
+
+    def is_partitioned(self):
+        with self.engine.connect() as conn:
+            return conn.execute(text(
+                'SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid '
+                'WHERE c.relname = :table'
+            ), {'table': self.table}).first() is not None
+
+    def partitions(self):
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(
+                'SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i '
+                'JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent '
+                'WHERE p.relname = :table'
+            ), {'table': self.table}).all()
+        partitions = []
+        for name, bound in rows:
+            match = _PG_BOUND.search(bound or '')
+            partitions.append((name, datetime.fromisoformat(match.group(1)) if match else None))
+        # Las acotadas por fecha primero; DEFAULT al final
+        return sorted(partitions, key=lambda p: (p[1] is None, p[1] or datetime.min))
+
+    def ensure_partitions(self, until):
+        """Crea las particiones faltantes hasta cubrir until; retorna las creadas"""
+        bounded = [upper for _, upper in self.partitions() if upper is not None]
+        if not bounded:
+            raise RuntimeError(f'{self.table} no está particionada (ejecutar convert)')
+
+        created = []
+        start = bounded[-1]
+        with self.engine.begin() as conn:
+            while start <= until:
+                end = next_partition_start(start, self.interval)
+                name = f'{self.table}_{partition_name(start)}'
+                conn.execute(text(
+                    f"CREATE TABLE {name} PARTITION OF {self.table} "
+                    f"FOR VALUES FROM ('{start:%Y-%m-%d %H:%M:%S}') TO ('{end:%Y-%m-%d %H:%M:%S}')"
+                ))
+                created.append(name)
+                start = end
+        return created
+
+    def drop_partitions(self, cutoff, detach=False):
+        """Desvincula las particiones anteriores a cutoff y, sin detach, las elimina"""
+        names = self.expired(cutoff)
+        with self.engine.begin() as conn:
+            for name in names:
+                conn.execute(text(f'ALTER TABLE {self.table} DETACH PARTITION {name}'))
+                if not detach:
+                    conn.execute(text(f'DROP TABLE {name}'))
+        return names
+
+    def convert(self, until):
+        """Crea la tabla particionada, copia los datos y conserva la original como <tabla>_legacy"""
+        if self.is_partitioned():
+            return False
+        bounds = self.boundaries(until)
+        legacy = f'{self.table}_legacy'
+        inspector = inspect(self.engine)
+        indexes = inspector.get_indexes(self.table)
+        renamed = [index['name'] for index in indexes]
+        renamed.append(inspector.get_pk_constraint(self.table)['name'])
+        unique = {u['name'] for u in inspector.get_unique_constraints(self.table)}
+
+        with self.engine.begin() as conn:
+            # Los nombres de índices (y de la clave primaria) son únicos por esquema
+            conn.execute(text(f'ALTER TABLE {self.table} RENAME TO {legacy}'))
+            for name in set(renamed) | unique:
+                conn.execute(text(f'ALTER INDEX IF EXISTS {name} RENAME TO {name}_legacy'))
+            conn.execute(text(
+                f'CREATE TABLE {self.table} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE (fecha_hora)'
+            ))
+            conn.execute(text(f'ALTER TABLE {self.table} ADD PRIMARY KEY (id, fecha_hora)'))
+            # Igual que en MySQL, la clave única incluye fecha_hora
+            conn.execute(text(
+                f'ALTER TABLE {self.table} ADD CONSTRAINT uq_nodo_secuencia UNIQUE (nodo_id, secuencia, fecha_hora)'
+            ))
+            conn.execute(text(f'ALTER TABLE {self.table} ADD FOREIGN KEY (nodo_id) REFERENCES nodos (id)'))
+            for index in indexes:
+                if not index.get('unique'):
+                    conn.execute(text(
+                        f'CREATE INDEX {index["name"]} ON {self.table} ({", ".join(index["column_names"])})'
+                    ))
+
+            start = start_before(bounds[0], self.interval)
+            for end in bounds:
+                conn.execute(text(
+                    f"CREATE TABLE {self.table}_{partition_name(start)} PARTITION OF {self.table} "
+                    f"FOR VALUES FROM ('{start:%Y-%m-%d %H:%M:%S}') TO ('{end:%Y-%m-%d %H:%M:%S}')"
+                ))
+                start = end
+            conn.execute(text(f'CREATE TABLE {self.table}_default PARTITION OF {self.table} DEFAULT'))
+
+            conn.execute(text(f'INSERT INTO {self.table} SELECT * FROM {legacy}'))
+            # La secuencia de id pasa a la tabla nueva (la original puede eliminarse luego)
+            sequence = conn.execute(
+                text("SELECT pg_get_serial_sequence(:table, 'id')"), {'table': legacy}
+            ).scalar()
+            if sequence:
+                conn.execute(text(f'ALTER SEQUENCE {sequence} OWNED BY {self.table}.id'))
+        return True
+
+def _parse_mysql_bound(description):
+    if not description or description.upper() == 'MAXVALUE':
+        return None
+    return datetime.fromisoformat(description.strip("'"))
+
+def get_partition_manager(engine, interval='month', table='mediciones'):
+    """PartitionManager según el dialecto del engine (la base no admite particiones en SQLite)"""
+    managers = {
+        'mysql': MySQLPartitionManager,
+        'mariadb': MySQLPartitionManager,
+        'postgresql': PostgresPartitionManager
+    }
+    return managers.get(engine.dialect.name, PartitionManager)(engine, table=table, interval=interval)
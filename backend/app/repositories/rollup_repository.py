@@ -0,0 +1,458 @@
+# backend/app/repositories/rollup_repository.py
+import math
+from datetime import datetime, timedelta
+from sqlalchemy import select, insert, delete, func, and_, or_
+from app.extensions import db
+from app.models import Measurement
+from app.models.rollup import ROLLUP_MODELS, ROLLUP_COLUMNS, ROLLUP_VARIABLES, MinuteRollup, RollupPending
+from app.repositories.unit_of_work import get_session, commit_or_flush
+from app.utils.metrics import metrics
+from app.utils.time_buckets import epoch_bucket
+
+EPOCH = datetime(1970, 1, 1)
+
+# Condiciones por sentencia al filtrar varios rangos con OR
+_RANGES_PER_QUERY = 200
+
+def floor_time(value, seconds):
+    """Inicio del intervalo de `seconds` segundos (alineado a epoch) que contiene value"""
+    step = timedelta(seconds=seconds)
+    return EPOCH + step * ((value - EPOCH) // step)
+
+def ceil_time(value, seconds):
+    """Primer inicio de intervalo mayor o igual a value"""
+    floor = floor_time(value, seconds)
+    return floor if floor == value else floor + timedelta(seconds=seconds)
+
+def plan_window(start, end, models=ROLLUP_MODELS):
+    """Reparte [start, end) entre los niveles de rollup (el más grueso posible) y datos crudos
+
+    Retorna ({modelo: [(inicio, fin), ...]}, [(inicio, fin) crudos]): los rollups cubren los
+    intervalos completos y los crudos solo los bordes parciales.
+    """
+    plan = {model: [] for model in models}
+    raw = []
+    coarsest_first = sorted(models, key=lambda m: m.seconds, reverse=True)
+
+    def split(lo, hi, level):
+        if lo >= hi:
+            return
+        if level == len(coarsest_first):
+            raw.append((lo, hi))
+            return
+        model = coarsest_first[level]
+        first = ceil_time(lo, model.seconds)
+        last = floor_time(hi, model.seconds)
+        if first >= last:
+            split(lo, hi, level + 1)
+            return
+        plan[model].append((first, last))
+        split(lo, first, level + 1)
+        split(last, hi, level + 1)
+
+    split(start, end, 0)
+    return plan, raw
+
+def empty_accumulator():
+    return [0] + [0.0, math.inf, -math.inf, 0.0] * len(ROLLUP_VARIABLES)
+
+def merge_accumulator(acc, other):
+    """Combina dos acumuladores (cantidad, suma, mínimo, máximo, suma de cuadrados por variable)"""
+    if not other[0]:
+        return acc
+    acc[0] += other[0]
+    for base in range(1, len(acc), 4):
+        acc[base] += other[base]
+        acc[base + 1] = min(acc[base + 1], other[base + 1])
+        acc[base + 2] = max(acc[base + 2], other[base + 2])
+        acc[base + 3] += other[base + 3]
+    return acc
+
+def summarize_accumulator(acc):
+    """Promedio, mínimo, máximo y desviación estándar por variable de un acumulador"""
+    count = acc[0]
+    summary = {'total_mediciones': count}
+    for offset, (_, variable) in enumerate(ROLLUP_VARIABLES):
+        base = 1 + offset * 4
+        if not count:
+            summary[variable] = {'promedio': 0, 'minimo': 0, 'maximo': 0, 'desviacion': 0}
+            continue
+        mean = acc[base] / count
+        variance = max(acc[base + 3] / count - mean * mean, 0.0)
+        summary[variable] = {
+            'promedio': mean,
+            'minimo': acc[base + 1],
+            'maximo': acc[base + 2],
+            'desviacion': math.sqrt(variance)
+        }
+    return summary
+
+def _range_filters(time_column, ranges, node_column=None):
+    """Condiciones OR de rangos [inicio, fin) (opcionalmente por nodo), en grupos acotados"""
+    conditions = []
+    for item in ranges:
+        if node_column is not None:
+            node_id, lo, hi = item
+            conditions.append(and_(node_column == node_id, time_column >= lo, time_column < hi))
+        else:
+            lo, hi = item
+            conditions.append(and_(time_column >= lo, time_column < hi))
+    for i in range(0, len(conditions), _RANGES_PER_QUERY):
+        yield or_(*conditions[i:i + _RANGES_PER_QUERY])
+
+def _runs(keys, seconds):
+    """Agrupa (nodo, inicio) consecutivos en rangos (nodo, inicio, fin)"""
+    runs = []
+    step = timedelta(seconds=seconds)
+    for node_id, start in sorted(keys):
+        if runs and runs[-1][0] == node_id and runs[-1][2] == start:
+            runs[-1][2] = start + step
+        else:
+            runs.append([node_id, start, start + step])
+    return [tuple(run) for run in runs]
+
+def _aggregate_columns(model):
+    """Columnas SQL que combinan filas de un rollup en un acumulador"""
+    columns = [func.sum(model.cantidad)]
+    for prefix, _ in ROLLUP_VARIABLES:
+        columns += [
+            func.sum(getattr(model, f'{prefix}_suma')),
+            func.min(getattr(model, f'{prefix}_minimo')),
+            func.max(getattr(model, f'{prefix}_maximo')),
+            func.sum(getattr(model, f'{prefix}_suma_cuadrados'))
+        ]
+    return columns
+
+def _raw_aggregate_columns():
+    """Columnas SQL que agregan mediciones crudas en un acumulador"""
+    columns = [func.count(Measurement.id)]
+    for _, variable in ROLLUP_VARIABLES:
+        column = getattr(Measurement, variable)
+        columns += [func.sum(column), func.min(column), func.max(column), func.sum(column * column)]
+    return columns
+
+def row_accumulator(row):
+    """Acumulador a partir de una fila agregada (None en columnas vacías)"""
+    if not row or not row[0]:
+        return empty_accumulator()
+    return [int(row[0])] + [float(value) for value in row[1:]]
+
+class RollupRepository:
+    @staticmethod
+    def mark_pending(rows, uow=None):
+        """Registra los minutos (por nodo) que recibieron mediciones, en la misma transacción"""
+        minutes = {
+            (row['nodo_id'], row['fecha_hora'].replace(second=0, microsecond=0))
+            for row in rows
+        }
+        if not minutes:
+            return
+        get_session(uow).execute(
+            insert(RollupPending.__table__),
+            [{'nodo_id': node_id, 'minuto': minute} for node_id, minute in minutes]
+        )
+        commit_or_flush(uow)
+
+    @staticmethod
+    def compacted_until(node_id, default):
+        """Límite hasta el que los rollups del nodo están al día (minuto pendiente más antiguo)"""
+        oldest = db.session.query(func.min(RollupPending.minuto))\
+            .filter(RollupPending.nodo_id == node_id).scalar()
+        return min(oldest, default) if oldest else default
+
+    @staticmethod
+    def compact(limit=5000):
+        """Incorpora a los rollups hasta `limit` minutos pendientes; retorna cuántos se procesaron
+
+        Cada minuto se recalcula desde las mediciones crudas y las horas y días afectados
+        desde el nivel anterior, así que repetir la compactación es inocuo. Las marcas
+        pendientes se eliminan por id en la misma transacción: las que llegan mientras
+        tanto quedan para la siguiente pasada.
+        """
+        session = db.session
+        pending = session.execute(
+            select(RollupPending.id, RollupPending.nodo_id, RollupPending.minuto)
+            .order_by(RollupPending.id).limit(limit)
+        ).all()
+        if not pending:
+            return 0
+
+        try:
+            keys = {(row.nodo_id, row.minuto) for row in pending}
+            accumulators = RollupRepository._aggregate_raw(_runs(keys, MinuteRollup.seconds))
+            RollupRepository._replace(MinuteRollup, keys, accumulators)
+
+            for finer, coarser in zip(ROLLUP_MODELS, ROLLUP_MODELS[1:]):
+                keys = {(node_id, floor_time(start, coarser.seconds)) for node_id, start in keys}
+                accumulators = RollupRepository._aggregate_rollup(
+                    finer, coarser.seconds, _runs(keys, coarser.seconds)
+                )
+                RollupRepository._replace(coarser, keys, accumulators)
+
+            ids = [row.id for row in pending]
+            for i in range(0, len(ids), 1000):
+                session.execute(delete(RollupPending).where(RollupPending.id.in_(ids[i:i + 1000])))
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+        metrics.inc('rollups.compacted', len(pending))
+        return len(pending)
+
+    @staticmethod
+    def rebuild(start, end, node_ids=None):
+        """Recalcula los rollups desde las mediciones crudas, un día a la vez; retorna los minutos escritos"""
+        session = db.session
+        day = floor_time(start, 86400)
+        end = ceil_time(end, 86400)
+        written = 0
+
+        while day < end:
+            next_day = day + timedelta(days=1)
+            condition = and_(Measurement.fecha_hora >= day, Measurement.fecha_hora < next_day)
+            if node_ids:
+                condition = and_(condition, Measurement.nodo_id.in_(node_ids))
+            minutes = RollupRepository._aggregate_raw_where(condition)
+
+            try:
+                for model in ROLLUP_MODELS:
+                    stale = delete(model).where(model.inicio >= day, model.inicio < next_day)
+                    if node_ids:
+                        stale = stale.where(model.nodo_id.in_(node_ids))
+                    session.execute(stale)
+
+                accumulators = minutes
+                for model in ROLLUP_MODELS:
+                    if model is not MinuteRollup:
+                        accumulators = RollupRepository._coarsen(accumulators, model.seconds)
+                    RollupRepository._insert(model, accumulators)
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+
+            written += len(minutes)
+            day = next_day
+
+        return written
+
+    @staticmethod
+    def delete_before(model, cutoff, node_ids=None):
+        """Elimina las filas de un nivel de rollup anteriores a cutoff, un día por transacción"""
+        query = db.session.query(func.min(model.inicio)).filter(model.inicio < cutoff)
+        if node_ids:
+            query = query.filter(model.nodo_id.in_(node_ids))
+        day = query.scalar()
+        deleted = 0
+
+        while day is not None and day < cutoff:
+            next_day = min(floor_time(day, 86400) + timedelta(days=1), cutoff)
+            stmt = delete(model).where(model.inicio >= day, model.inicio < next_day)
+            if node_ids:
+                stmt = stmt.where(model.nodo_id.in_(node_ids))
+            deleted += db.session.execute(stmt).rowcount
+            db.session.commit()
+            day = next_day
+        return deleted
+
+    @staticmethod
+    def get_window_accumulator(node_id, start, end):
+        """Acumulador de un nodo en [start, end): rollups más gruesos posibles y crudos en los bordes"""
+        return RollupRepository.get_window_accumulators([node_id], start, end).get(node_id, empty_accumulator())
+
+    @staticmethod
+    def get_window_accumulators(node_ids, start, end):
+        """Acumuladores por nodo en [start, end) con GROUP BY nodo_id (node_ids None = todos)
+
+        Los nodos sin minutos pendientes comparten un plan de rollups hasta end. Los rollups
+        de un nodo con pendientes valen hasta su minuto pendiente más antiguo y desde ahí se
+        leen sus mediciones crudas (rangos por nodo, agrupados en pocas sentencias).
+        """
+        pending = select(RollupPending.nodo_id, func.min(RollupPending.minuto)).group_by(RollupPending.nodo_id)
+        if node_ids is not None:
+            pending = pending.where(RollupPending.nodo_id.in_(node_ids))
+        lagging = {node_id: oldest for node_id, oldest in db.session.execute(pending) if oldest < end}
+
+        sources = {model: (model.inicio, model.nodo_id, _aggregate_columns(model)) for model in ROLLUP_MODELS}
+        sources[Measurement] = (Measurement.fecha_hora, Measurement.nodo_id, _raw_aggregate_columns())
+        accumulators = {}
+
+        def collect(model, conditions, restrict=None):
+            _, node_column, columns = sources[model]
+            for condition in conditions:
+                stmt = select(node_column, *columns).where(condition).group_by(node_column)
+                if restrict is not None:
+                    stmt = stmt.where(restrict)
+                for row in db.session.execute(stmt):
+                    merge_accumulator(accumulators.setdefault(row[0], empty_accumulator()), row_accumulator(row[1:]))
+
+        # Nodos al día: un mismo plan para todos
+        if node_ids is None:
+            current = None
+        else:
+            current = [node_id for node_id in node_ids if node_id not in lagging]
+        if current is None or current:
+            plan, raw = plan_window(start, end)
+            plan[Measurement] = raw
+            for model, ranges in plan.items():
+                node_column = sources[model][1]
+                if current is not None:
+                    restrict = node_column.in_(current)
+                else:
+                    restrict = node_column.not_in(list(lagging)) if lagging else None
+                collect(model, _range_filters(sources[model][0], ranges), restrict)
+
+        # Nodos con pendientes: rollups hasta su límite y crudos desde ahí
+        node_ranges = {model: [] for model in sources}
+        for node_id, oldest in lagging.items():
+            boundary = max(start, oldest)
+            plan, raw = plan_window(start, boundary)
+            plan[Measurement] = raw + [(boundary, end)]
+            for model, ranges in plan.items():
+                node_ranges[model] += [(node_id, lo, hi) for lo, hi in ranges]
+        for model, ranges in node_ranges.items():
+            time_column, node_column, _ = sources[model]
+            collect(model, _range_filters(time_column, ranges, node_column))
+        return accumulators
+
+    @staticmethod
+    def get_bucket_accumulators(node_id, start, end, seconds):
+        """Acumuladores por intervalo de `seconds` segundos de un nodo en [start, end)
+
+        Retorna [(inicio, acumulador)] en orden cronológico (ver get_series_accumulators).
+        """
+        series = RollupRepository.get_series_accumulators([node_id], start, end, seconds)
+        return [(bucket_start, acc) for (_, bucket_start), acc in sorted(series.items())]
+
+    @staticmethod
+    def get_series_accumulators(node_ids, start, end, seconds):
+        """Acumuladores por (nodo, intervalo de `seconds` segundos) de varios nodos en [start, end)
+
+        Agrupa en la base de datos con aritmética epoch entera. La parte alineada se lee del
+        rollup más grueso cuyo nivel divide al intervalo (una sentencia para todos los nodos);
+        los bordes parciales y lo que aún no pasó por el compactador, de las mediciones crudas.
+        """
+        source = None
+        for model in ROLLUP_MODELS:
+            if seconds % model.seconds == 0:
+                source = model
+
+        # Los rollups de cada nodo valen hasta su minuto pendiente más antiguo
+        pending = dict(db.session.execute(
+            select(RollupPending.nodo_id, func.min(RollupPending.minuto))
+            .where(RollupPending.nodo_id.in_(node_ids))
+            .group_by(RollupPending.nodo_id)
+        ).all())
+
+        rollup_ranges = []
+        raw_ranges = []
+        for node_id in node_ids:
+            boundary = max(start, min(end, pending.get(node_id) or end))
+            if source is None:
+                raw_ranges.append((node_id, start, end))
+                continue
+            first = ceil_time(start, source.seconds)
+            last = max(first, floor_time(boundary, source.seconds))
+            if first < last:
+                rollup_ranges.append((node_id, first, last))
+            raw_ranges += [(node_id, start, min(first, end)), (node_id, last, end)]
+
+        buckets = {}
+        if rollup_ranges:
+            bucket = epoch_bucket(source.inicio, seconds)
+            for condition in _range_filters(source.inicio, rollup_ranges, source.nodo_id):
+                rows = db.session.execute(
+                    select(source.nodo_id, bucket, *_aggregate_columns(source))
+                    .where(condition)
+                    .group_by(source.nodo_id, bucket)
+                )
+                for row in rows:
+                    buckets[(row[0], row[1])] = row_accumulator(row[2:])
+
+        raw_ranges = [(node_id, lo, hi) for node_id, lo, hi in raw_ranges if lo < hi]
+        bucket = epoch_bucket(Measurement.fecha_hora, seconds)
+        for condition in _range_filters(Measurement.fecha_hora, raw_ranges, Measurement.nodo_id):
+            rows = db.session.execute(
+                select(Measurement.nodo_id, bucket, *_raw_aggregate_columns())
+                .where(condition)
+                .group_by(Measurement.nodo_id, bucket)
+            )
+            for row in rows:
+                merge_accumulator(
+                    buckets.setdefault((row[0], row[1]), empty_accumulator()), row_accumulator(row[2:])
+                )
+
+        return {
+            (node_id, EPOCH + timedelta(seconds=epoch)): acc
+            for (node_id, epoch), acc in buckets.items()
+        }
+
+    @staticmethod
+    def _aggregate_raw(runs):
+        """Acumuladores por (nodo, minuto) de las mediciones crudas en los rangos dados"""
+        accumulators = {}
+        for condition in _range_filters(Measurement.fecha_hora, runs, Measurement.nodo_id):
+            accumulators.update(RollupRepository._aggregate_raw_where(condition))
+        return accumulators
+
+    @staticmethod
+    def _aggregate_raw_where(condition):
+        """Acumuladores por (nodo, minuto) de las mediciones que cumplen la condición (GROUP BY en la base)"""
+        bucket = epoch_bucket(Measurement.fecha_hora, MinuteRollup.seconds)
+        rows = db.session.execute(
+            select(Measurement.nodo_id, bucket, *_raw_aggregate_columns())
+            .where(condition)
+            .group_by(Measurement.nodo_id, bucket)
+        )
+        return {
+            (row[0], EPOCH + timedelta(seconds=row[1])): row_accumulator(row[2:])
+            for row in rows
+        }
+
+    @staticmethod
+    def _aggregate_rollup(model, seconds, runs):
+        """Acumuladores por (nodo, intervalo de `seconds`) a partir de las filas de un rollup más fino"""
+        bucket = epoch_bucket(model.inicio, seconds)
+        accumulators = {}
+        for condition in _range_filters(model.inicio, runs, model.nodo_id):
+            rows = db.session.execute(
+                select(model.nodo_id, bucket, *_aggregate_columns(model))
+                .where(condition)
+                .group_by(model.nodo_id, bucket)
+            )
+            for row in rows:
+                accumulators[(row[0], EPOCH + timedelta(seconds=row[1]))] = row_accumulator(row[2:])
+        return accumulators
+
+    @staticmethod
+    def _coarsen(accumulators, seconds):
+        """Agrupa acumuladores (nodo, inicio) en intervalos de `seconds` segundos"""
+        coarser = {}
+        for (node_id, start), acc in accumulators.items():
+            key = (node_id, floor_time(start, seconds))
+            merge_accumulator(coarser.setdefault(key, empty_accumulator()), acc)
+        return coarser
+
+    @staticmethod
+    def _replace(model, keys, accumulators):
+        """Reemplaza las filas (nodo, inicio) de un rollup; los intervalos sin mediciones se eliminan"""
+        by_node = {}
+        for node_id, start in keys:
+            by_node.setdefault(node_id, []).append(start)
+        for node_id, starts in by_node.items():
+            for i in range(0, len(starts), 500):
+                db.session.execute(
+                    delete(model).where(model.nodo_id == node_id, model.inicio.in_(starts[i:i + 500]))
+                )
+        RollupRepository._insert(model, accumulators)
+
+    @staticmethod
+    def _insert(model, accumulators):
+        rows = [
+            dict(zip(ROLLUP_COLUMNS, acc), nodo_id=node_id, inicio=start)
+            for (node_id, start), acc in accumulators.items()
+            if acc[0]
+        ]
+        for i in range(0, len(rows), 5000):
+            db.session.execute(insert(model.__table__), rows[i:i + 5000])
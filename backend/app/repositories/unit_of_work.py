@@ -0,0 +1,45 @@
+# backend/app/repositories/unit_of_work.py
+from app.extensions import db
+
+class UnitOfWork:
+    """Agrupa operaciones de varios repositorios en una sola transacción (commit al salir del bloque)"""
+
+    def __init__(self, session=None):
+        self.session = session or db.session
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+    def flush(self):
+        """Envía los cambios pendientes sin confirmar la transacción"""
+        self.session.flush()
+
+    def commit(self):
+        """Confirma la transacción"""
+        try:
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+
+    def rollback(self):
+        """Descarta la transacción"""
+        self.session.rollback()
+
+def get_session(uow=None):
+    """Sesión de la unidad de trabajo o la sesión por defecto"""
+    return uow.session if uow else db.session
+
+def commit_or_flush(uow=None):
+    """Hace commit si no hay unidad de trabajo; dentro de una, solo flush"""
+    if uow:
+        uow.flush()
+    else:
+        db.session.commit()
@@ -7,6 +7,7 @@ from app.services.alert_service import AlertService
 from app.services.report_service import ReportService
 from app.services.mqtt_service import MQTTService
 from app.services.ia_service import IAService
+from app.services.query_service import QueryService
 
 __all__ = [
     'AuthService',
@@ -16,5 +17,6 @@ __all__ = [
     'AlertService',
     'ReportService',
     'MQTTService',
-    'IAService'
+    'IAService',
+    'QueryService'
 ]
\ No newline at end of file
@@ -4,46 +4,50 @@ from app.repositories import AlertRepository
 
 class AlertService:
     @staticmethod
-    def check_and_create_alerts(measurement, node):
+    def check_and_create_alerts(measurement, node, uow=None):
         """Verifica umbrales y crea alertas si es necesario"""
-        alerts_created = []
+        alerts_data = AlertService._evaluate_thresholds(measurement, node)
+        if not alerts_data:
+            return []
+        return AlertRepository.create_bulk(alerts_data, uow=uow)
+    
+    @staticmethod
+    def check_batch_alerts(measurements, nodes, uow=None):
+        """Verifica umbrales de un lote de mediciones y crea sus alertas en una sola escritura"""
+        alerts_data = []
+        for measurement in measurements:
+            alerts_data.extend(AlertService._evaluate_thresholds(measurement, nodes[measurement.nodo_id]))
         
-        # Obtener sensores del nodo
-        for sensor in node.sensores:
-            if sensor.estado == 'OFF':
-                continue
-            
-            value = None
-            tipo = None
-            
-            if sensor.variable == 'temp':
-                value = measurement.temperatura
-                tipo = 'Temperatura'
-            elif sensor.variable == 'hum':
-                value = measurement.humedad
-                tipo = 'Humedad'
-            elif sensor.variable == 'CO2':
-                value = measurement.co2
-                tipo = 'CO2'
+        if not alerts_data:
+            return []
+        return AlertRepository.create_bulk(alerts_data, uow=uow)
+    
+    @staticmethod
+    def _evaluate_thresholds(measurement, node):
+        """Compara una medición con los umbrales compilados del nodo (NodeMetadata)"""
+        alerts_data = []
+        
+        for threshold in node.thresholds:
+            value = getattr(measurement, threshold.campo)
+            tipo = threshold.tipo
             
             if value is None:
                 continue
             
             # Verificar si se superó el umbral
             umbral_superado = None
-            if value < sensor.umbral_min:
-                umbral_superado = sensor.umbral_min
+            if value < threshold.umbral_min:
+                umbral_superado = threshold.umbral_min
                 mensaje = f'{tipo} por debajo del mínimo ({value} < {umbral_superado})'
-            elif value > sensor.umbral_max:
-                umbral_superado = sensor.umbral_max
+            elif value > threshold.umbral_max:
+                umbral_superado = threshold.umbral_max
                 mensaje = f'{tipo} por encima del máximo ({value} > {umbral_superado})'
             
-            if umbral_superado:
+            if umbral_superado is not None:
                 # Determinar severidad
-                severidad = AlertService._calculate_severity(value, sensor)
+                severidad = AlertService._calculate_severity(value, threshold)
                 
-                # Crear alerta
-                alert_data = {
+                alerts_data.append({
                     'nodo_id': node.id,
                     'fecha': date.today(),
                     'hora': datetime.now().time(),
@@ -53,12 +57,9 @@ class AlertService:
                     'severidad': severidad,
                     'estado': 'Activa',
                     'mensaje': mensaje
-                }
-                
-                alert = AlertRepository.create(alert_data)
-                alerts_created.append(alert)
+                })
         
-        return alerts_created
+        return alerts_data
     
     @staticmethod
     def _calculate_severity(value, sensor):
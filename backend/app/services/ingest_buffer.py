@@ -0,0 +1,53 @@
+# backend/app/services/ingest_buffer.py
+import time
+from threading import Lock
+from app.utils.metrics import metrics
+
+class IngestBuffer:
+    """Acumula mediciones decodificadas y las escribe por lotes"""
+
+    def __init__(self, flush_handler, max_size=100, max_interval=1.0):
+        self.flush_handler = flush_handler
+        self.max_size = max_size
+        self.max_interval = max_interval
+        self._items = []
+        self._lock = Lock()
+        self._flush_lock = Lock()
+        self._last_flush = time.monotonic()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+    def add(self, payload):
+        """Agrega una medición; retorna True si el lote alcanzó su tamaño máximo"""
+        with self._lock:
+            self._items.append(payload)
+            return len(self._items) >= self.max_size
+
+    def is_due(self):
+        """Indica si hay mediciones pendientes más antiguas que el intervalo máximo"""
+        with self._lock:
+            return bool(self._items) and \
+                time.monotonic() - self._last_flush >= self.max_interval
+
+    def flush(self):
+        """Escribe el lote pendiente con el handler configurado"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._items = self._items, []
+                self._last_flush = time.monotonic()
+
+            if not batch:
+                return []
+
+            start = time.perf_counter()
+            try:
+                return self.flush_handler(batch)
+            except Exception:
+                metrics.inc('ingest.flush_errors')
+                raise
+            finally:
+                metrics.observe('ingest.flush_latency_ms', (time.perf_counter() - start) * 1000)
+                metrics.observe('ingest.batch_size', len(batch))
+                metrics.inc('ingest.flushes')
@@ -0,0 +1,105 @@
+# backend/app/services/ingest_queue.py
+import time
+import queue
+from collections import namedtuple
+from threading import Lock
+from app.utils.metrics import metrics
+
+# Mensaje crudo tal como llega del broker (se decodifica en los workers)
+IngestMessage = namedtuple('IngestMessage', ['topic', 'payload', 'received_at'])
+
+class IngestQueue:
+    """Cola acotada entre el callback de paho y los workers de ingesta
+
+    Con shards > 1 la capacidad se reparte en particiones independientes; cada worker
+    consume una sola, de modo que los mensajes de un nodo se procesan en orden.
+    """
+
+    POLICIES = ('block', 'drop_oldest', 'spill')
+
+    def __init__(self, maxsize=10000, policy='drop_oldest', block_timeout=None, spool=None, shards=1):
+        if policy not in self.POLICIES:
+            raise ValueError(f'Política de desbordamiento inválida: {policy}')
+        if policy == 'spill' and spool is None:
+            raise ValueError('La política spill requiere un spool en disco')
+
+        self.maxsize = maxsize
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.spool = spool
+        self.shards = max(1, shards)
+        self._queues = [queue.Queue(maxsize=max(1, maxsize // self.shards)) for _ in range(self.shards)]
+        self._put_lock = Lock()
+        metrics.set_gauge('ingest.queue_capacity', maxsize)
+        metrics.set_gauge('ingest.queue_depth', 0)
+
+    def __len__(self):
+        return sum(q.qsize() for q in self._queues)
+
+    def put(self, message, shard=0):
+        """Encola un mensaje en su partición aplicando la política de desbordamiento"""
+        target = self._queues[shard % self.shards]
+        try:
+            target.put_nowait(message)
+            self._update_depth()
+            return True
+        except queue.Full:
+            metrics.inc('ingest.queue_full')
+
+        if self.policy == 'block':
+            return self._put_blocking(target, message)
+        if self.policy == 'drop_oldest':
+            return self._put_dropping_oldest(target, message)
+        self._spill(message)
+        return False
+
+    def get(self, timeout=None, shard=0):
+        """Obtiene el siguiente mensaje de una partición o None si se agota el tiempo de espera"""
+        try:
+            message = self._queues[shard % self.shards].get(timeout=timeout)
+        except queue.Empty:
+            return None
+        self._update_depth()
+        return message
+
+    def _put_blocking(self, target, message):
+        """Espera espacio en la cola hasta block_timeout; si no lo hay va al spool o se descarta"""
+        metrics.inc('ingest.queue_blocked')
+        try:
+            target.put(message, timeout=self.block_timeout)
+        except queue.Full:
+            if self.spool is not None:
+                self._spill(message)
+            else:
+                metrics.inc('ingest.queue_dropped')
+            return False
+        self._update_depth()
+        return True
+
+    def _put_dropping_oldest(self, target, message):
+        """Descarta el mensaje más antiguo para dejar lugar al nuevo"""
+        with self._put_lock:
+            while True:
+                try:
+                    target.put_nowait(message)
+                    break
+                except queue.Full:
+                    try:
+                        target.get_nowait()
+                        metrics.inc('ingest.queue_dropped')
+                    except queue.Empty:
+                        pass
+        self._update_depth()
+        return True
+
+    def _spill(self, message):
+        """Vuelca el mensaje sin decodificar al spool para reprocesarlo más tarde"""
+        self.spool.append_raw(message.topic, message.payload, message.received_at)
+        metrics.inc('ingest.queue_spilled')
+
+    def _update_depth(self):
+        metrics.set_gauge('ingest.queue_depth', len(self))
+
+def make_message(topic, payload):
+    """Construye un IngestMessage con la hora de recepción"""
+    return IngestMessage(topic, bytes(payload), time.time())
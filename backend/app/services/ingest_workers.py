@@ -0,0 +1,139 @@
+# backend/app/services/ingest_workers.py
+import time
+from datetime import datetime
+from threading import Thread, Event
+from app.extensions import db
+from app.services.ingest_buffer import IngestBuffer
+from app.services.measurement_service import MeasurementService
+from app.services.spool import is_transient_error
+from app.utils.metrics import metrics
+from app.utils.payload_codec import decode_payload, expand_payload, PayloadError
+from app.utils.topics import TopicRouter
+from app.utils.validators import validate_measurement, format_validation_errors
+
+class IngestWorkerPool:
+    """Pool de workers que consumen la cola de ingesta y escriben por lotes"""
+
+    def __init__(self, app, ingest_queue, size=4, batch_size=100, batch_interval=1.0, spool=None):
+        self.app = app
+        self.queue = ingest_queue
+        self.spool = spool
+        self.size = size
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.binary_suffix = app.config.get('MQTT_BINARY_TOPIC_SUFFIX', '/bin')
+        self.max_samples = app.config.get('INGEST_MAX_SAMPLES', 500)
+        self.router = TopicRouter.from_config(app.config)
+        self._threads = []
+        self._stop = Event()
+
+    def start(self):
+        """Inicia los workers como threads daemon"""
+        for index in range(self.size):
+            thread = Thread(target=self._run, args=(index,), name=f'ingest-worker-{index}')
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+        metrics.set_gauge('ingest.workers', self.size)
+
+    def stop(self, timeout=None):
+        """Detiene los workers después de vaciar sus lotes pendientes"""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _run(self, index):
+        """Bucle de un worker: cada uno tiene su propio contexto y sesión de SQLAlchemy"""
+        with self.app.app_context():
+            buffer = IngestBuffer(
+                self._save_batch,
+                max_size=self.batch_size,
+                max_interval=self.batch_interval
+            )
+            try:
+                while not self._stop.is_set():
+                    # Cada worker consume su partición: los mensajes de un nodo llegan en orden
+                    message = self.queue.get(timeout=self.batch_interval / 2, shard=index)
+                    if message is not None:
+                        # Un mensaje puede traer varias muestras; todas van al mismo lote
+                        full = False
+                        for reading in self._decode(message):
+                            full = buffer.add(reading) or full
+                        if full:
+                            self._flush(buffer)
+                    if buffer.is_due():
+                        self._flush(buffer)
+                self._flush(buffer)
+            finally:
+                db.session.remove()
+
+    def _decode(self, message):
+        """Decodifica un mensaje (trama binaria o JSON) en su lista de mediciones"""
+        return decode_message(message, self.binary_suffix, self.max_samples,
+                              node_id=self.router.node_id(message.topic))
+
+    def _save_batch(self, batch):
+        """Escribe el lote; si la base de datos no está disponible lo deriva al spool"""
+        return save_or_spool(batch, self.spool)
+
+    def _flush(self, buffer):
+        """Escribe el lote del worker; ante error descarta la transacción en curso"""
+        try:
+            buffer.flush()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error guardando lote de mediciones: {e}")
+
+def decode_message(message, binary_suffix='/bin', max_samples=None, node_id=None):
+    """Decodifica un IngestMessage en su lista de mediciones ([] si el payload es inválido)
+
+    node_id es el nodo indicado por el tópico: completa payloads sin nodo_id y
+    descarta los que declaran otro nodo.
+    """
+    try:
+        payload = decode_payload(message.topic, message.payload, binary_suffix)
+        if node_id is not None:
+            if not payload.get('nodo_id'):
+                payload['nodo_id'] = node_id
+            elif str(payload['nodo_id']) != str(node_id):
+                metrics.inc('ingest.topic_mismatch')
+                raise PayloadError(f"nodo_id {payload['nodo_id']} no coincide con el tópico {message.topic}")
+        readings = expand_payload(payload, max_samples)
+    except PayloadError as e:
+        metrics.inc('ingest.decode_errors')
+        print(f"Error decodificando payload: {e}")
+        return []
+
+    # Las mediciones inválidas se descartan antes de llegar a la sesión
+    valid = []
+    for reading in readings:
+        errors = validate_measurement(reading)
+        if errors:
+            print(f"Medición rechazada ({message.topic}): {format_validation_errors(errors)}")
+            continue
+        valid.append(reading)
+    readings = valid
+
+    # Sin hora del dispositivo se usa la de recepción (se conserva si el lote pasa por el spool)
+    received_at = datetime.utcfromtimestamp(message.received_at)
+    for reading in readings:
+        if reading.get('fecha_hora') is None:
+            reading['fecha_hora'] = received_at
+
+    metrics.observe('ingest.queue_wait_ms', (time.time() - message.received_at) * 1000)
+    metrics.observe('ingest.samples_per_message', len(readings))
+    return readings
+
+def save_or_spool(batch, spool=None):
+    """Escribe un lote con save_batch; ante un corte de la base de datos lo deriva al spool"""
+    try:
+        return MeasurementService.save_batch(batch)
+    except Exception as e:
+        db.session.rollback()
+        if spool is None or not is_transient_error(e):
+            raise
+        spool.append_readings(batch)
+        metrics.inc('ingest.spooled', len(batch))
+        print(f"Base de datos no disponible, {len(batch)} mediciones al spool: {e}")
+        return []
@@ -1,28 +1,77 @@
 # backend/app/services/measurement_service.py
+import json
 from datetime import datetime, timedelta
-from app.repositories import MeasurementRepository, NodeRepository, AlertRepository
+from flask import current_app
+from app.repositories import (
+    MeasurementRepository, NodeRepository, AlertRepository, RollupRepository, UnitOfWork
+)
 from app.services.alert_service import AlertService
+from app.services.retention_service import RetentionPolicy
+from app.services.recent_readings import recent_readings
+from app.utils.validators import validate_measurement_batch
+from app.utils.helpers import parse_date_range
+from app.utils.pagination import encode_cursor, decode_cursor
+from app.utils.downsampling import (
+    DOWNSAMPLING_METHODS, METHOD_MIN_POINTS, downsample_indices, downsample_rows
+)
+from app.utils.payload_codec import expand_payload, parse_timestamp, PayloadError
+from app.utils.metrics import metrics
+from app.utils.dedup import dedup_key, dedup_window
+from sqlalchemy.exc import IntegrityError
 import requests
 
+# Campos de la tabla mediciones que se aceptan desde los dispositivos
+MEASUREMENT_FIELDS = ('nodo_id', 'fecha_hora', 'temperatura', 'humedad', 'co2')
+
+def measurement_row_to_dict(row):
+    """Serializa una fila de MEASUREMENT_COLUMNS igual que Measurement.to_dict"""
+    return {
+        'id': row.id,
+        'nodo_id': row.nodo_id,
+        'fecha_hora': row.fecha_hora.isoformat(),
+        'temperatura': row.temperatura,
+        'humedad': row.humedad,
+        'co2': row.co2
+    }
+
 class MeasurementService:
     @staticmethod
     def save_measurement(data):
         """Guarda una nueva medición y verifica alertas"""
         node_id = data['nodo_id']
         
-        # Validar que el nodo exista
-        node = NodeRepository.find_by_id(node_id)
+        # Validar que el nodo exista (metadatos en caché)
+        node = NodeRepository.get_metadata(node_id)
         if not node:
             return {'error': 'Nodo no encontrado'}, 404
         
-        # Actualizar última conexión
-        NodeRepository.update_last_connection(node_id)
+        fecha_hora, error = MeasurementService._resolve_timestamp(
+            data.get('fecha_hora', data.get('ts')), datetime.utcnow()
+        )
+        if error:
+            return {'error': error}, 400
+        
+        # Reenvíos del mismo mensaje (QoS 1, reintentos del gateway) no generan filas nuevas
+        key = dedup_key(data)
+        if key is not None and dedup_window.contains(node.id, key):
+            metrics.inc('ingest.duplicates_suppressed')
+            return {'message': 'Medición duplicada, ya registrada'}, 200
         
-        # Guardar medición
-        measurement = MeasurementRepository.create(data)
+        # La restricción única no basta con la tabla particionada (incluye fecha_hora)
+        if key is not None and MeasurementRepository.existing_sequences([(node.id, key)]):
+            metrics.inc('ingest.duplicates_db')
+            dedup_window.remember(node.id, [key])
+            return {'message': 'Medición duplicada, ya registrada'}, 200
         
-        # Verificar umbrales y generar alertas
-        AlertService.check_and_create_alerts(measurement, node)
+        # Una sola transacción para medición, última conexión y alertas
+        try:
+            measurement_dict = MeasurementService._save_single(data, node, fecha_hora, key)
+        except IntegrityError:
+            metrics.inc('ingest.duplicates_db')
+            return {'message': 'Medición duplicada, ya registrada'}, 200
+        
+        if key is not None:
+            dedup_window.remember(node.id, [key])
         
         # Enviar a IA para análisis (asíncrono)
         try:
@@ -31,38 +80,323 @@ class MeasurementService:
         except Exception as e:
             print(f"Error al enviar a IA: {e}")
         
-        return {'measurement': measurement.to_dict(), 'message': 'Medición guardada'}, 201
+        return {'measurement': measurement_dict, 'message': 'Medición guardada'}, 201
     
     @staticmethod
-    def get_historical(node_id, period='day'):
-        """Obtiene datos históricos"""
+    def _save_single(data, node, fecha_hora, key):
+        """Guarda una medición, la última conexión y sus alertas en una transacción"""
+        with UnitOfWork() as uow:
+            # Actualizar última conexión
+            NodeRepository.update_last_connection(node.id, uow=uow)
+            
+            # Guardar medición
+            row = {field: data[field] for field in MEASUREMENT_FIELDS if field in data}
+            row['nodo_id'] = node.id
+            row['fecha_hora'] = fecha_hora
+            row['secuencia'] = key
+            measurement = MeasurementRepository.create(row, uow=uow)
+            RollupRepository.mark_pending([row], uow=uow)
+            
+            # Verificar umbrales y generar alertas
+            AlertService.check_and_create_alerts(measurement, node, uow=uow)
+            
+            # Serializar antes del commit para no recargar la fila expirada
+            measurement_dict = measurement.to_dict()
+        
+        recent_readings.add([dict(row, id=measurement_dict['id'])])
+        return measurement_dict
+    
+    @staticmethod
+    def save_batch(payloads):
+        """Guarda un lote de mediciones con un único insert y verifica alertas por lote"""
+        results = []
+        rows = []
+        row_results = []
+        nodes = {}
+        batch_keys = {}
+        now = datetime.utcnow()
+        
+        for index, data in enumerate(payloads):
+            node = NodeRepository.get_metadata(data.get('nodo_id'))
+            if not node:
+                results.append({'index': index, 'status': 'error', 'error': 'Nodo no encontrado'})
+                continue
+            
+            # Las muestras con hora del dispositivo se aceptan en cualquier orden dentro de la ventana
+            fecha_hora, error = MeasurementService._resolve_timestamp(data.get('fecha_hora'), now)
+            if error:
+                results.append({'index': index, 'status': 'error', 'error': error})
+                continue
+            
+            # Descartar repeticiones conocidas sin tocar la base de datos
+            key = dedup_key(data)
+            if key is not None:
+                node_keys = batch_keys.setdefault(node.id, set())
+                if key in node_keys or dedup_window.contains(node.id, key):
+                    metrics.inc('ingest.duplicates_suppressed')
+                    results.append({'index': index, 'status': 'duplicate'})
+                    continue
+                node_keys.add(key)
+            
+            nodes[node.id] = node
+            row = {field: data[field] for field in MEASUREMENT_FIELDS if field in data}
+            row['nodo_id'] = node.id
+            row['fecha_hora'] = fecha_hora
+            row['secuencia'] = key
+            rows.append(row)
+            row_results.append({'index': index, 'status': 'ok'})
+            results.append(row_results[-1])
+        
+        if not rows:
+            return results
+        
+        with UnitOfWork() as uow:
+            # La restricción única descarta las repeticiones que no estaban en la ventana
+            measurements = MeasurementRepository.create_bulk(
+                rows, uow=uow, ignore_duplicates=any(batch_keys.values())
+            )
+            
+            # Las filas descartadas por la base de datos se informan como duplicadas
+            if len(measurements) < len(rows):
+                created = {(m.nodo_id, m.secuencia) for m in measurements}
+                inserted = []
+                for row, result in zip(rows, row_results):
+                    if row['secuencia'] is None or (row['nodo_id'], row['secuencia']) in created:
+                        inserted.append(row)
+                    else:
+                        result['status'] = 'duplicate'
+                rows = inserted
+            
+            # Minutos a recalcular por el compactador de rollups
+            RollupRepository.mark_pending(rows, uow=uow)
+            
+            for node_id in nodes:
+                NodeRepository.update_last_connection(node_id, uow=uow)
+            
+            AlertService.check_batch_alerts(measurements, nodes, uow=uow)
+        
+        # Las claves se recuerdan solo después del commit
+        for node_id, keys in batch_keys.items():
+            if keys:
+                dedup_window.remember(node_id, keys)
+        recent_readings.add(rows)
+        
+        return results
+    
+    @staticmethod
+    def _resolve_timestamp(value, now):
+        """Normaliza la hora de una muestra y verifica la ventana de aceptación; retorna (fecha, error)"""
+        if value is None:
+            return now, None
+        
+        try:
+            fecha_hora = parse_timestamp(value)
+        except PayloadError as e:
+            return None, str(e)
+        
+        late_window = timedelta(seconds=current_app.config.get('INGEST_LATE_WINDOW', 7 * 24 * 3600))
+        future_skew = timedelta(seconds=current_app.config.get('INGEST_FUTURE_SKEW', 300))
+        if fecha_hora < now - late_window or fecha_hora > now + future_skew:
+            metrics.inc('ingest.out_of_window')
+            return None, 'Muestra fuera de la ventana de aceptación'
+        
+        return fecha_hora, None
+    
+    @staticmethod
+    def save_measurements_batch(items):
+        """Valida y guarda un lote de mediciones recibido por HTTP con estado por elemento"""
+        max_samples = current_app.config.get('INGEST_MAX_SAMPLES', 500)
+        results = []
+        readings = []
+        origins = []
+        
+        # Los elementos con 'samples' se expanden; cada muestra conserva su índice de origen
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                readings.append(item)
+                origins.append((index, None))
+                continue
+            
+            try:
+                expanded = expand_payload(item, max_samples)
+            except PayloadError as e:
+                results.append({'index': index, 'status': 'error', 'error': str(e)})
+                continue
+            
+            multi = 'samples' in item
+            for sample_index, reading in enumerate(expanded):
+                readings.append(reading)
+                origins.append((index, sample_index if multi else None))
+        
+        valid, rejected = validate_measurement_batch(readings)
+        
+        pending = list(rejected)
+        if valid:
+            saved = MeasurementService.save_batch([item for _, item in valid])
+            for (position, _), result in zip(valid, saved):
+                result['index'] = position
+                pending.append(result)
+        
+        # Reasignar las posiciones del lote expandido a las del lote original
+        for result in pending:
+            index, sample_index = origins[result['index']]
+            result['index'] = index
+            if sample_index is not None:
+                result['sample'] = sample_index
+            results.append(result)
+        results.sort(key=lambda r: (r['index'], r.get('sample', 0)))
+        
+        # Un duplicado ya registrado cuenta como aceptado (reenvíos idempotentes)
+        accepted = sum(1 for r in results if r['status'] in ('ok', 'duplicate'))
+        if accepted == len(results):
+            status = 201
+        elif accepted:
+            status = 207
+        else:
+            status = 400
+        
+        return {
+            'results': results,
+            'accepted': accepted,
+            'duplicates': sum(1 for r in results if r['status'] == 'duplicate'),
+            'rejected': len(results) - accepted
+        }, status
+    
+    @staticmethod
+    def get_historical(node_id, period='day', resolution=None, cursor=None, limit=None,
+                       max_points=None, method='lttb'):
+        """Obtiene datos históricos
+
+        Con resolución cruda (elegida por rango o pedida con resolution='raw') las mediciones
+        se entregan por páginas: next_cursor continúa el recorrido hacia fechas anteriores.
+        Con max_points se entrega la serie completa reducida a max_points puntos que conservan
+        su forma (LTTB o mínimo/máximo por intervalo).
+        """
         node = NodeRepository.find_by_id(node_id)
         if not node:
             return {'error': 'Nodo no encontrado'}, 404
         
         # Calcular rango de fechas
-        end_date = datetime.utcnow()
-        if period == 'day':
-            start_date = end_date - timedelta(days=1)
-        elif period == 'week':
-            start_date = end_date - timedelta(weeks=1)
-        elif period == 'month':
-            start_date = end_date - timedelta(days=30)
+        start_date, end_date = parse_date_range(period)
+        
+        if max_points is not None and not cursor:
+            if method not in DOWNSAMPLING_METHODS:
+                return {'error': f'Método de reducción inválido: {method}'}, 400
+            if max_points < METHOD_MIN_POINTS[method]:
+                return {'error': f'max_points debe ser al menos {METHOD_MIN_POINTS[method]} con el método {method}'}, 400
+            return MeasurementService._get_downsampled(node, period, start_date, end_date, max_points, method)
+        
+        # Nivel de retención que cubre el rango sin superar el máximo de puntos
+        max_points = current_app.config.get('HISTORICAL_MAX_POINTS', 1000)
+        if resolution == 'raw' or cursor:
+            level = 'raw'
         else:
-            start_date = end_date - timedelta(days=1)
+            level = RetentionPolicy.from_config(current_app.config).pick_level(
+                node_id, start_date, end_date, node.velocidad_datos, max_points, end_date
+            )
         
-        # Obtener mediciones
-        measurements = MeasurementRepository.find_by_node(node_id, start_date, end_date)
+        # Obtener mediciones (crudas o promedios del rollup, más recientes primero)
+        next_cursor = None
+        if level == 'raw':
+            try:
+                after = decode_cursor(cursor) if cursor else None
+            except ValueError as e:
+                return {'error': str(e)}, 400
+            limit = max(1, min(limit or max_points, current_app.config.get('HISTORICAL_PAGE_LIMIT', 5000)))
+            rows = MeasurementRepository.find_page(node_id, start_date, end_date, after, limit + 1)
+            if len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = encode_cursor(rows[-1].fecha_hora, rows[-1].id)
+            measurements = [measurement_row_to_dict(row) for row in rows]
+        else:
+            measurements = [
+                dict(row, nodo_id=node_id) for row in reversed(
+                    MeasurementRepository.get_bucket_averages(node_id, start_date, end_date, level)
+                )
+            ]
         
         # Obtener estadísticas
-        stats = MeasurementRepository.get_statistics(node_id, start_date, end_date)
+        stats = MeasurementService._get_statistics(node, start_date, end_date)
         
         return {
-            'measurements': [m.to_dict() for m in measurements],
+            'measurements': measurements,
             'statistics': stats,
-            'period': period
+            'period': period,
+            'resolucion': level,
+            'next_cursor': next_cursor
+        }, 200
+    
+    @staticmethod
+    def _get_downsampled(node, period, start_date, end_date, max_points, method):
+        """Serie del período reducida en el servidor a max_points puntos (más recientes primero)"""
+        config = current_app.config
+        max_points = min(max_points, config.get('HISTORICAL_PAGE_LIMIT', 5000))
+        # Nivel más fino cuya cantidad de puntos se puede leer y reducir en una petición
+        source_points = config.get('HISTORICAL_DOWNSAMPLE_SOURCE_POINTS', 100000)
+        policy = RetentionPolicy.from_config(config)
+        level = policy.pick_level(
+            node.id, start_date, end_date, node.velocidad_datos, source_points, end_date
+        )
+        
+        rows = None
+        if level == 'raw':
+            # Cota dura: el nodo puede enviar más de lo que indica velocidad_datos
+            rows = MeasurementRepository.find_page(
+                node.id, start_date, end_date, limit=source_points + 1, ascending=True
+            )
+            if len(rows) > source_points:
+                metrics.inc('historical.downsample_raw_overflow')
+                rows = None
+                level = policy.pick_level(
+                    node.id, start_date, end_date, node.velocidad_datos, source_points, end_date,
+                    allow_raw=False
+                )
+        
+        if rows is not None:
+            indices = downsample_indices(
+                [row.fecha_hora for row in rows],
+                [[row.temperatura for row in rows], [row.humedad for row in rows], [row.co2 for row in rows]],
+                max_points, method
+            )
+            measurements = [measurement_row_to_dict(rows[i]) for i in indices]
+        else:
+            buckets = MeasurementRepository.get_bucket_averages(node.id, start_date, end_date, level)
+            measurements = [dict(row, nodo_id=node.id) for row in downsample_rows(buckets, max_points, method)]
+        measurements.reverse()
+        
+        return {
+            'measurements': measurements,
+            'statistics': MeasurementService._get_statistics(node, start_date, end_date),
+            'period': period,
+            'resolucion': level,
+            'reduccion': method,
+            'next_cursor': None
         }, 200
     
+    @staticmethod
+    def export_historical(node_id, period='day'):
+        """Todas las mediciones crudas del período como NDJSON, generadas a medida que se leen"""
+        node = NodeRepository.find_by_id(node_id)
+        if not node:
+            return {'error': 'Nodo no encontrado'}, 404
+        
+        start_date, end_date = parse_date_range(period)
+        batch_size = current_app.config.get('HISTORICAL_PAGE_LIMIT', 5000)
+        
+        def generate():
+            for row in MeasurementRepository.stream_by_node(node_id, start_date, end_date, batch_size):
+                yield json.dumps(measurement_row_to_dict(row)) + '\n'
+        
+        return generate(), 200
+    
+    @staticmethod
+    def _get_statistics(node, start_date, end_date):
+        """Estadísticas del período desde las lecturas recientes si las cubren, si no desde la base"""
+        stats = recent_readings.statistics(node, start_date, end_date)
+        if stats is None:
+            stats = MeasurementRepository.get_statistics(node.id, start_date, end_date)
+        return stats
+    
     @staticmethod
     def get_dashboard_data(node_id):
         """Obtiene datos para el dashboard"""
@@ -70,13 +404,20 @@ class MeasurementService:
         if not node:
             return {'error': 'Nodo no encontrado'}, 404
         
-        # Última medición
-        latest = MeasurementRepository.find_latest_by_node(node_id, 1)
-        
-        # Promedios últimas 24 horas
+        # Última medición y promedios de las últimas 24 horas (lecturas recientes en memoria)
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(hours=24)
-        hourly_data = MeasurementRepository.get_hourly_averages(node_id, start_date, end_date)
+        latest = recent_readings.latest(node)
+        hourly_data = recent_readings.bucket_averages(
+            node, start_date, end_date, 3600, time_format='%Y-%m-%d %H:00:00'
+        )
+        
+        # Sin buffer (deshabilitado o sin cobertura) se consulta la base de datos
+        if latest is None:
+            rows = MeasurementRepository.find_latest_by_node(node_id, 1)
+            latest = rows[0].to_dict() if rows else None
+        if hourly_data is None:
+            hourly_data = MeasurementRepository.get_hourly_averages(node_id, start_date, end_date)
         
         # Alertas activas
         alerts = AlertRepository.find_by_node(node_id)
@@ -84,7 +425,7 @@ class MeasurementService:
         
         return {
             'node': node.to_dict(),
-            'latest_measurement': latest[0].to_dict() if latest else None,
+            'latest_measurement': latest,
             'hourly_data': hourly_data,
             'active_alerts': [a.to_dict() for a in active_alerts]
         }, 200
\ No newline at end of file
@@ -1,13 +1,39 @@
 # backend/app/services/mqtt_service.py
 import paho.mqtt.client as mqtt
 import json
-from threading import Thread
+from threading import Event, Lock, Thread
 from flask import current_app
+from app.repositories import NodeRepository
+from app.services.ingest_queue import IngestQueue, make_message
+from app.services.ingest_workers import IngestWorkerPool
+from app.services.spool import SpoolReplayer, create_spool
+from app.services.rollup_compactor import create_compactor
 from app.services.measurement_service import MeasurementService
+from app.utils.topics import NodeSubscriptions, TopicRouter
+
+# Versiones de protocolo admitidas en MQTT_PROTOCOL
+MQTT_PROTOCOLS = {'3.1.1': mqtt.MQTTv311, '5': mqtt.MQTTv5}
+
+def create_mqtt_client(config):
+    """Crea un cliente paho con el protocolo y las credenciales configuradas"""
+    protocol = MQTT_PROTOCOLS.get(str(config.get('MQTT_PROTOCOL', '3.1.1')), mqtt.MQTTv311)
+    client = mqtt.Client(protocol=protocol)
+    if config.get('MQTT_USERNAME'):
+        client.username_pw_set(config['MQTT_USERNAME'], config['MQTT_PASSWORD'])
+    return client
 
 class MQTTService:
     def __init__(self, app=None):
         self.client = None
+        self.queue = None
+        self.workers = None
+        self.spool = None
+        self.replayer = None
+        self.compactor = None
+        self.router = None
+        self.node_subscriptions = None
+        self._subscription_lock = Lock()
+        self._stopping = Event()
         self.app = app
         if app:
             self.init_app(app)
@@ -15,26 +41,68 @@ class MQTTService:
     def init_app(self, app):
         """Inicializa el servicio MQTT"""
         self.app = app
+        self.router = TopicRouter.from_config(app.config)
+        
+        # Spool en disco para cortes de la base de datos y cola saturada (vacío = deshabilitado)
+        self.spool = create_spool(app)
         
-        # Configurar cliente MQTT
-        self.client = mqtt.Client()
+        # Cola acotada y workers: el loop de red de paho nunca escribe en la base de datos
+        policy = app.config.get('INGEST_QUEUE_POLICY', 'spill')
+        if policy == 'spill' and self.spool is None:
+            policy = 'drop_oldest'
+        self.queue = IngestQueue(
+            maxsize=app.config.get('INGEST_QUEUE_SIZE', 10000),
+            policy=policy,
+            block_timeout=app.config.get('INGEST_QUEUE_BLOCK_TIMEOUT', 5.0),
+            spool=self.spool,
+            shards=app.config.get('INGEST_WORKERS', 4)
+        )
+        self.workers = IngestWorkerPool(
+            app,
+            self.queue,
+            size=app.config.get('INGEST_WORKERS', 4),
+            batch_size=app.config.get('INGEST_BATCH_SIZE', 100),
+            batch_interval=app.config.get('INGEST_BATCH_INTERVAL', 1.0),
+            spool=self.spool
+        )
+        self.workers.start()
+        
+        # El spool se reprocesa por la misma ruta de inserción por lotes, a ritmo limitado
+        if self.spool:
+            self.replayer = SpoolReplayer(
+                app,
+                self.spool,
+                MeasurementService.save_batch,
+                self.workers._decode,
+                batch_size=app.config.get('INGEST_BATCH_SIZE', 100),
+                max_rate=app.config.get('INGEST_SPOOL_REPLAY_RATE', 500)
+            )
+            self.replayer.start()
+        
+        # Rollups minuto/5 min/hora/día de las mediciones recibidas
+        self.compactor = create_compactor(app)
+        if self.compactor:
+            self.compactor.start()
+        
+        # Configurar cliente MQTT (protocolo y credenciales según configuración)
+        self.client = create_mqtt_client(app.config)
         
         # Callbacks
         self.client.on_connect = self.on_connect
         self.client.on_message = self.on_message
         self.client.on_disconnect = self.on_disconnect
         
-        # Credenciales si son necesarias
-        if app.config.get('MQTT_USERNAME'):
-            self.client.username_pw_set(
-                app.config['MQTT_USERNAME'],
-                app.config['MQTT_PASSWORD']
-            )
-        
         # Conectar en un thread separado
         thread = Thread(target=self._connect_mqtt)
         thread.daemon = True
         thread.start()
+        
+        # Reparto fijo de nodos entre instancias: los nodos nuevos se suscriben periódicamente
+        if self.router.partitioned:
+            self.node_subscriptions = NodeSubscriptions(self.router)
+            refresher = Thread(target=self._refresh_loop, name='mqtt-subscriptions')
+            refresher.daemon = True
+            refresher.start()
     
     def _connect_mqtt(self):
         """Conecta al broker MQTT"""
@@ -48,42 +116,70 @@ class MQTTService:
         except Exception as e:
             print(f"Error conectando a MQTT: {e}")
     
-    def on_connect(self, client, userdata, flags, rc):
+    def on_connect(self, client, userdata, flags, rc, properties=None):
         """Callback cuando se conecta al broker"""
         if rc == 0:
             print("Conectado al broker MQTT")
-            # Suscribirse al tópico
-            topic = self.app.config.get('MQTT_TOPIC', 'environmental/measurements')
-            client.subscribe(topic)
-            print(f"Suscrito a: {topic}")
+            # Tópico común, tópicos por nodo y sus variantes binarias
+            # (con MQTT_SHARED_GROUP como suscripción compartida $share/<grupo>/...)
+            topics = self.router.subscriptions()
+            if topics:
+                client.subscribe([(t, 0) for t in topics])
+                print(f"Suscrito a: {', '.join(topics)}")
+            # Con reparto por instancia, tópicos explícitos de los nodos propios
+            if self.node_subscriptions:
+                self.node_subscriptions.reset()
+                self._refresh_subscriptions()
         else:
             print(f"Falló conexión MQTT con código: {rc}")
     
+    def _refresh_loop(self):
+        while not self._stopping.wait(self.app.config.get('MQTT_SUBSCRIPTION_REFRESH', 60)):
+            self._refresh_subscriptions()
+    
+    def _refresh_subscriptions(self):
+        """Suscribe los tópicos de los nodos de esta instancia que aún no lo están"""
+        try:
+            with self.app.app_context():
+                node_ids = NodeRepository.find_ids()
+            with self._subscription_lock:
+                for chunk in self.node_subscriptions.pending(node_ids):
+                    self.client.subscribe([(t, 0) for t in chunk])
+                    print(f"Suscrito a {len(chunk)} tópicos de nodos")
+        except Exception as e:
+            print(f"Error actualizando suscripciones por nodo: {e}")
+    
     def on_message(self, client, userdata, msg):
         """Callback cuando llega un mensaje"""
         try:
-            # Decodificar payload
-            payload = json.loads(msg.payload.decode())
-            print(f"Mensaje recibido: {payload}")
-            
-            # Estructura esperada:
+            # Estructura esperada del payload (se decodifica en los workers):
             # {
             #   "nodo_id": 1,
             #   "temperatura": 25.5,
             #   "humedad": 60.0,
             #   "co2": 450.0
             # }
-            
-            # Guardar medición en contexto de aplicación
-            with self.app.app_context():
-                MeasurementService.save_measurement(payload)
-                
-        except json.JSONDecodeError:
-            print(f"Error decodificando JSON: {msg.payload}")
+            # Los mensajes de un mismo nodo van siempre a la misma partición
+            shard = self.router.shard(msg.topic, msg.payload, self.queue.shards)
+            self.queue.put(make_message(msg.topic, msg.payload), shard=shard)
         except Exception as e:
             print(f"Error procesando mensaje: {e}")
     
-    def on_disconnect(self, client, userdata, rc):
+    def stop(self):
+        """Desconecta del broker, vacía los lotes pendientes y cierra el spool"""
+        self._stopping.set()
+        if self.client:
+            self.client.disconnect()
+        if self.workers:
+            self.workers.stop()
+        if self.replayer:
+            self.replayer.stop()
+        if self.compactor:
+            self.compactor.stop()
+        if self.spool:
+            self.spool.close()
+    
+    def on_disconnect(self, client, userdata, rc, properties=None):
         """Callback cuando se desconecta"""
         if rc != 0:
             print(f"Desconexión inesperada. Código: {rc}")
@@ -0,0 +1,141 @@
+# backend/app/services/query_service.py
+import math
+import re
+from datetime import datetime
+from flask import current_app
+from app.repositories import MeasurementRepository
+from app.models.rollup import ROLLUP_VARIABLES
+from app.services.retention_service import RetentionPolicy
+from app.utils.payload_codec import parse_timestamp, PayloadError
+from app.utils.time_buckets import parse_bucket
+
+QUERY_VARIABLES = tuple(variable for _, variable in ROLLUP_VARIABLES)
+# Agregados que se obtienen de los rollups; los percentiles ('p95', 'p50'...) usan las mediciones
+# crudas y solo están disponibles dentro de su retención
+QUERY_AGGREGATES = ('avg', 'min', 'max', 'sum', 'count', 'stddev')
+_PERCENTILE_PATTERN = re.compile(r'^p([1-9][0-9]?)$')
+
+def _split(value):
+    """Lista de valores separados por comas (acepta también listas de parámetros repetidos)"""
+    if value is None:
+        return []
+    items = value if isinstance(value, (list, tuple)) else [value]
+    return [part.strip() for item in items for part in str(item).split(',') if part.strip()]
+
+def _aggregate(acc, offset, name):
+    """Valor de un agregado para la variable en la posición offset de un acumulador"""
+    count = acc[0]
+    if not count:
+        return None
+    base = 1 + offset * 4
+    if name == 'avg':
+        return acc[base] / count
+    if name == 'min':
+        return acc[base + 1]
+    if name == 'max':
+        return acc[base + 2]
+    if name == 'sum':
+        return acc[base]
+    mean = acc[base] / count
+    return math.sqrt(max(acc[base + 3] / count - mean * mean, 0.0))
+
+class QueryService:
+    @staticmethod
+    def query_series(start=None, end=None, node_ids=None, variables=None, bucket='1h', aggs=None):
+        """Serie agregada de varios nodos en un rango arbitrario
+
+        Parámetros en texto (como llegan en la URL): start/end ISO 8601 o epoch, node_ids y
+        variables/aggs separados por comas, bucket '5m', '1h', '1d' o segundos. Retorna una
+        serie columnar por nodo: fechas de inicio de intervalo y, por variable, una lista
+        por agregado.
+        """
+        config = current_app.config
+        try:
+            if not start:
+                raise ValueError('start es obligatorio')
+            start_date = parse_timestamp(start)
+            end_date = parse_timestamp(end) if end else datetime.utcnow()
+            if end_date <= start_date:
+                raise ValueError('end debe ser posterior a start')
+            seconds = parse_bucket(int(bucket) if str(bucket).isdigit() else bucket)
+        except (ValueError, PayloadError) as e:
+            return {'error': str(e)}, 400
+
+        node_values = _split(node_ids)
+        invalid = [node_id for node_id in node_values if not node_id.isdigit()]
+        if invalid:
+            return {'error': f"node_ids inválido: {', '.join(invalid)}"}, 400
+        node_list = sorted({int(node_id) for node_id in node_values})
+        if not node_list:
+            return {'error': 'node_ids es obligatorio'}, 400
+        if len(node_list) > config.get('QUERY_MAX_NODES', 100):
+            return {'error': f"Máximo {config.get('QUERY_MAX_NODES', 100)} nodos por consulta"}, 400
+
+        variable_list = _split(variables) or list(QUERY_VARIABLES)
+        invalid = [v for v in variable_list if v not in QUERY_VARIABLES]
+        if invalid:
+            return {'error': f"Variables inválidas: {', '.join(invalid)}"}, 400
+
+        agg_list = _split(aggs) or ['avg']
+        percentiles = []
+        for name in agg_list:
+            match = _PERCENTILE_PATTERN.match(name)
+            if match:
+                percentiles.append(int(match.group(1)))
+            elif name not in QUERY_AGGREGATES:
+                return {'error': f'Agregado inválido: {name}'}, 400
+
+        # Cota del tamaño de la respuesta: nodos x intervalos
+        points = len(node_list) * math.ceil((end_date - start_date).total_seconds() / seconds)
+        if points > config.get('QUERY_MAX_POINTS', 100000):
+            return {'error': f'La consulta produce {points} puntos; usar un intervalo mayor o un rango menor'}, 400
+
+        # Los percentiles no pueden calcularse antes de la retención de las mediciones crudas
+        if percentiles:
+            policy = RetentionPolicy.from_config(config)
+            now = datetime.utcnow()
+            cutoffs = [policy.cutoff(node_id, 'raw', now) for node_id in node_list]
+            cutoff = max((c for c in cutoffs if c is not None), default=None)
+            if cutoff is not None and start_date < cutoff:
+                return {
+                    'error': f'Percentiles no disponibles antes de {cutoff.isoformat()} '
+                             f'(retención de mediciones crudas); usar start posterior o solo '
+                             f'agregados {", ".join(QUERY_AGGREGATES)}'
+                }, 400
+
+        source, series = MeasurementRepository.get_series(
+            node_list, start_date, end_date, seconds, variable_list, sorted(set(percentiles))
+        )
+
+        by_node = {node_id: [] for node_id in node_list}
+        for (node_id, bucket_start), values in sorted(series.items()):
+            by_node[node_id].append((bucket_start, values))
+
+        offsets = {variable: offset for offset, variable in enumerate(QUERY_VARIABLES)}
+        result = []
+        for node_id, buckets in by_node.items():
+            entry = {'nodo_id': node_id, 'fecha_hora': [b.isoformat() for b, _ in buckets]}
+            if 'count' in agg_list:
+                entry['count'] = [acc[0] for _, (acc, _) in buckets]
+            for variable in variable_list:
+                entry[variable] = {}
+                for name in agg_list:
+                    if name == 'count':
+                        continue
+                    if name in QUERY_AGGREGATES:
+                        values = [_aggregate(acc, offsets[variable], name) for _, (acc, _) in buckets]
+                    else:
+                        p = int(name[1:])
+                        values = [quantiles[variable][p] for _, (_, quantiles) in buckets]
+                    entry[variable][name] = values
+            result.append(entry)
+
+        return {
+            'start': start_date.isoformat(),
+            'end': end_date.isoformat(),
+            'bucket': seconds,
+            'variables': variable_list,
+            'aggs': agg_list,
+            'source': source,
+            'series': result
+        }, 200
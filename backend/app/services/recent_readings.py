@@ -0,0 +1,370 @@
+# backend/app/services/recent_readings.py
+import math
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from threading import Lock
+import numpy as np
+from app.utils.metrics import metrics
+
+EPOCH = datetime(1970, 1, 1)
+VARIABLES = ('temperatura', 'humedad', 'co2')
+
+# id desconocido (filas de la ingesta por lotes del propio proceso)
+_NO_ID = -1
+
+def _epoch(value):
+    return (value - EPOCH).total_seconds()
+
+class NodeRing:
+    """Buffer circular de las últimas lecturas de un nodo en columnas numpy (orden cronológico)"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.t = np.empty(capacity, dtype=np.float64)
+        self.ids = np.empty(capacity, dtype=np.int64)
+        self.values = np.empty((len(VARIABLES), capacity), dtype=np.float64)
+        self.head = 0
+        self.size = 0
+        # Desde cuándo el buffer tiene todas las lecturas del nodo (epoch)
+        self.covered_from = None
+        self.synced_at = None
+        # ultima_conexion del nodo ya leída y cursor de id: las filas con id <= cursor están
+        # en el buffer; pending guarda (momento, id máximo) de las lecturas aún no asentadas
+        self.marker = None
+        self.cursor = 0
+        self.pending = deque()
+        self.lock = Lock()
+
+    def clear(self, covered_from):
+        self.head = 0
+        self.size = 0
+        self.covered_from = covered_from
+
+    def last(self):
+        """(fecha epoch, id) de la última lectura o None"""
+        if not self.size:
+            return None
+        index = (self.head + self.size - 1) % self.capacity
+        return self.t[index], self.ids[index]
+
+    def append(self, t, row_id, values):
+        """Agrega una lectura al final; las anteriores a la última se descartan (retorna False)"""
+        last = self.last()
+        if last is not None and t < last[0]:
+            return False
+        if self.size == self.capacity:
+            # Buffer lleno: se pisa la más antigua y la cobertura empieza después de ella
+            evicted = self.t[self.head]
+            self.head = (self.head + 1) % self.capacity
+            self.size -= 1
+            self.covered_from = max(self.covered_from, np.nextafter(evicted, np.inf))
+        index = (self.head + self.size) % self.capacity
+        self.t[index] = t
+        self.ids[index] = row_id
+        self.values[:, index] = values
+        self.size += 1
+        return True
+
+    def insert(self, t, row_id, values):
+        """Agrega una lectura en su posición cronológica (retorna False si es anterior a la cobertura)
+
+        Las lecturas atrasadas son poco frecuentes: se reordena el buffer completo.
+        """
+        if t < self.covered_from:
+            return False
+        last = self.last()
+        if last is None or t >= last[0]:
+            return self.append(t, row_id, values)
+
+        order = self.order()
+        position = np.searchsorted(self.t[order], t, 'right')
+        t_col = np.insert(self.t[order], position, t)
+        ids = np.insert(self.ids[order], position, row_id)
+        values = np.insert(self.values[:, order], position, values, axis=1)
+        if len(t_col) > self.capacity:
+            self.covered_from = max(self.covered_from, np.nextafter(t_col[0], np.inf))
+            t_col, ids, values = t_col[1:], ids[1:], values[:, 1:]
+        self.size = len(t_col)
+        self.head = 0
+        self.t[:self.size] = t_col
+        self.ids[:self.size] = ids
+        self.values[:, :self.size] = values
+        return True
+
+    def contains(self, t, values):
+        """Si ya hay una lectura con la misma fecha y los mismos valores"""
+        order = self.order()
+        t_col = self.t[order]
+        lo, hi = np.searchsorted(t_col, t, 'left'), np.searchsorted(t_col, t, 'right')
+        values = np.asarray(values, dtype=np.float64)
+        # Tolerancia: la base puede guardar los valores con menor precisión (FLOAT)
+        return any(
+            np.allclose(self.values[:, index], values, rtol=1e-6, equal_nan=True) for index in order[lo:hi]
+        )
+
+    def has_ids(self, row_ids):
+        """Máscara de los ids que ya están en el buffer"""
+        return np.isin(np.asarray(row_ids, dtype=np.int64), self.ids[self.order()])
+
+    def order(self):
+        """Posiciones del buffer en orden cronológico"""
+        return (self.head + np.arange(self.size)) % self.capacity
+
+    def window(self, start, end):
+        """Columnas (t, ids, valores) de las lecturas en [start, end], copiadas en orden"""
+        order = self.order()
+        t = self.t[order]
+        lo, hi = np.searchsorted(t, start, 'left'), np.searchsorted(t, end, 'right')
+        return t[lo:hi], self.ids[order[lo:hi]], self.values[:, order[lo:hi]]
+
+class RecentReadings:
+    """Últimas horas de lecturas por nodo en memoria para el dashboard
+
+    La ingesta del proceso agrega sus lecturas sin tocar la base de datos. Un nodo se
+    carga desde la base de datos en la primera consulta; después solo se vuelve a leer
+    cuando nodos.ultima_conexion cambió desde la última sincronización (la ingesta de otros
+    procesos, como el servicio ingest, la escribe cada LAST_SEEN_FLUSH_INTERVAL segundos),
+    como mucho cada sync_interval segundos, y esa lectura trae únicamente las filas con id
+    posterior al cursor del nodo (también las atrasadas, que se insertan en orden).
+
+    Proporción de consultas: cada poll del dashboard lee el nodo por clave primaria; un nodo
+    sin lecturas nuevas no genera consultas de mediciones. Con un nodo que reporta cada 60 s
+    y polls cada 30 s, alrededor de uno de cada dos polls hace una lectura incremental de
+    pocas filas. Un cambio de ultima_conexion con menos de settle segundos (transacciones
+    quizá sin confirmar) se vuelve a leer en el poll siguiente. Las ventanas que el buffer
+    no cubre se responden desde la base.
+    """
+
+    def __init__(self, hours=24, max_points=20000, sync_interval=5.0, max_nodes=1000, settle=10.0):
+        self.hours = hours
+        self.max_points = max_points
+        self.sync_interval = sync_interval
+        self.max_nodes = max_nodes
+        self.settle = settle
+        self._nodes = OrderedDict()
+        self._lock = Lock()
+
+    def configure(self, hours=None, max_points=None, sync_interval=None, max_nodes=None, settle=None):
+        """Ajusta los límites (se vacían los buffers)"""
+        with self._lock:
+            if hours is not None:
+                self.hours = hours
+            if max_points is not None:
+                self.max_points = max_points
+            if sync_interval is not None:
+                self.sync_interval = sync_interval
+            if max_nodes is not None:
+                self.max_nodes = max_nodes
+            if settle is not None:
+                self.settle = settle
+            self._nodes.clear()
+
+    @property
+    def enabled(self):
+        return self.hours > 0
+
+    def add(self, rows):
+        """Agrega lecturas recién guardadas (dicts de mediciones); solo nodos ya cargados"""
+        if not self.enabled:
+            return
+        by_node = {}
+        for row in rows:
+            by_node.setdefault(row['nodo_id'], []).append(row)
+
+        for node_id, node_rows in by_node.items():
+            with self._lock:
+                ring = self._nodes.get(node_id)
+            if ring is None:
+                continue
+            node_rows.sort(key=lambda r: r['fecha_hora'])
+            with ring.lock:
+                if ring.covered_from is None:
+                    continue
+                dropped = 0
+                for row in node_rows:
+                    t = _epoch(row['fecha_hora'])
+                    values = [row[var] for var in VARIABLES]
+                    last = ring.last()
+                    # La sincronización puede haber leído la fila antes que la ingesta del proceso
+                    if last is not None and t <= last[0] and ring.contains(t, values):
+                        continue
+                    # Las atrasadas se insertan en orden; solo se descartan las anteriores a la cobertura
+                    if not ring.insert(t, row.get('id') or _NO_ID, values):
+                        dropped += 1
+                if dropped:
+                    metrics.inc('recent_readings.dropped', dropped)
+
+    def latest(self, node):
+        """Última lectura del nodo como Measurement.to_dict (None si no hay o no está habilitado)"""
+        ring = self._sync(node)
+        if ring is None:
+            return None
+        with ring.lock:
+            last = ring.last()
+            if last is None:
+                return None
+            index = (ring.head + ring.size - 1) % ring.capacity
+            values = ring.values[:, index].tolist()
+        return dict(
+            id=None if last[1] == _NO_ID else int(last[1]),
+            nodo_id=node.id,
+            fecha_hora=(EPOCH + timedelta(seconds=float(last[0]))).isoformat(),
+            **dict(zip(VARIABLES, values))
+        )
+
+    def bucket_averages(self, node, start_date, end_date, seconds=3600, time_format=None):
+        """Promedios por intervalo como get_bucket_averages; None si el buffer no cubre start_date"""
+        window = self._window(node, start_date, end_date)
+        if window is None:
+            return None
+        t, _, values = window
+        if not len(t):
+            return []
+
+        buckets = np.floor(t / seconds) * seconds
+        starts, first, counts = np.unique(buckets, return_index=True, return_counts=True)
+        means = np.add.reduceat(values, first, axis=1) / counts
+
+        results = []
+        for i, bucket_start in enumerate(starts.tolist()):
+            bucket_start = EPOCH + timedelta(seconds=bucket_start)
+            results.append({
+                'fecha_hora': bucket_start.strftime(time_format) if time_format else bucket_start.isoformat(),
+                'temperatura': float(means[0, i]),
+                'humedad': float(means[1, i]),
+                'co2': float(means[2, i]),
+                'total_mediciones': int(counts[i])
+            })
+        return results
+
+    def statistics(self, node, start_date, end_date):
+        """Estadísticas como get_statistics; None si el buffer no cubre start_date"""
+        window = self._window(node, start_date, end_date)
+        if window is None:
+            return None
+        t, _, values = window
+        summary = {'total_mediciones': len(t)}
+        for index, variable in enumerate(VARIABLES):
+            if not len(t):
+                summary[variable] = {'promedio': 0, 'minimo': 0, 'maximo': 0, 'desviacion': 0}
+                continue
+            column = values[index]
+            summary[variable] = {
+                'promedio': float(column.mean()),
+                'minimo': float(column.min()),
+                'maximo': float(column.max()),
+                'desviacion': float(column.std())
+            }
+        return summary
+
+    def _window(self, node, start_date, end_date):
+        ring = self._sync(node)
+        if ring is None:
+            return None
+        start = _epoch(start_date)
+        with ring.lock:
+            if ring.covered_from is None or start < ring.covered_from:
+                metrics.inc('recent_readings.misses')
+                return None
+            metrics.inc('recent_readings.hits')
+            return ring.window(start, _epoch(end_date))
+
+    def _sync(self, node):
+        """Buffer del nodo cargado y al día con la base de datos (None si está deshabilitado)"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            ring = self._nodes.get(node.id)
+            if ring is None:
+                ring = NodeRing(self._capacity(node))
+                self._nodes[node.id] = ring
+                while len(self._nodes) > self.max_nodes:
+                    self._nodes.popitem(last=False)
+            else:
+                self._nodes.move_to_end(node.id)
+
+        with ring.lock:
+            now = time.monotonic()
+            marker = getattr(node, 'ultima_conexion', None)
+            if self._stale(ring, marker, now):
+                try:
+                    self._load(node.id, ring, now)
+                    ring.synced_at = now
+                    # Con un cambio reciente puede haber transacciones sin confirmar: se relee
+                    if marker is None or (datetime.utcnow() - marker).total_seconds() >= self.settle:
+                        ring.marker = marker
+                except Exception as e:
+                    metrics.inc('recent_readings.sync_errors')
+                    print(f"Error sincronizando lecturas recientes del nodo {node.id}: {e}")
+                    if ring.covered_from is None:
+                        return None
+        return ring
+
+    def _stale(self, ring, marker, now):
+        """Si hay que leer la base: buffer sin cargar o ultima_conexion distinta de la leída"""
+        if ring.covered_from is None or ring.synced_at is None:
+            return True
+        if now - ring.synced_at < self.sync_interval:
+            return False
+        return marker != ring.marker
+
+    def _capacity(self, node):
+        """Lecturas de la ventana según la velocidad de datos del nodo, con margen"""
+        expected = self.hours * 3600 / max(node.velocidad_datos or 60, 1)
+        return max(16, min(self.max_points, int(math.ceil(expected * 1.25)) + 16))
+
+    def _load(self, node_id, ring, now):
+        """Lectura incremental de las filas con id posterior al cursor; carga completa si no hay base"""
+        from app.repositories import MeasurementRepository
+
+        window_start = datetime.utcnow() - timedelta(hours=self.hours)
+        if ring.covered_from is not None:
+            rows = MeasurementRepository.find_after_id(
+                node_id, ring.cursor, start_date=window_start, limit=ring.capacity
+            )
+            # Un hueco mayor que el buffer se resuelve con una carga completa
+            if len(rows) < ring.capacity:
+                known = ring.has_ids([row.id for row in rows])
+                for row, seen in zip(rows, known):
+                    t = _epoch(row.fecha_hora)
+                    values = [getattr(row, var) for var in VARIABLES]
+                    # Las filas releídas y las que la ingesta del proceso agregó sin id se omiten
+                    if seen or ring.contains(t, values):
+                        continue
+                    ring.insert(t, row.id, values)
+                self._advance(ring, now, max([ring.cursor] + [row.id for row in rows]))
+                return len(rows)
+            metrics.inc('recent_readings.resynced')
+
+        rows = MeasurementRepository.find_page(node_id, start_date=window_start, limit=ring.capacity)
+        rows.reverse()
+        ring.clear(_epoch(window_start))
+        if len(rows) == ring.capacity:
+            # Pueden faltar lecturas de la misma fecha que la más antigua cargada
+            ring.covered_from = np.nextafter(_epoch(rows[0].fecha_hora), np.inf)
+        for row in rows:
+            ring.append(_epoch(row.fecha_hora), row.id, [getattr(row, var) for var in VARIABLES])
+        ring.cursor = max([0] + [row.id for row in rows])
+        ring.pending.clear()
+        metrics.inc('recent_readings.primed')
+        return len(rows)
+
+    def _advance(self, ring, now, max_id):
+        """Mueve el cursor hasta los ids leídos hace al menos settle segundos
+
+        Las transacciones concurrentes confirman ids fuera de orden: hasta settle segundos
+        después de una lectura pueden aparecer filas con id menor que el máximo leído, así
+        que el cursor solo avanza hasta él cuando una lectura posterior ya las cubrió.
+        """
+        while ring.pending and now - ring.pending[0][0] >= self.settle:
+            ring.cursor = max(ring.cursor, ring.pending.popleft()[1])
+        ring.pending.append((now, max_id))
+
+    def clear(self):
+        """Vacía los buffers"""
+        with self._lock:
+            self._nodes.clear()
+
+# Instancia global del proceso
+recent_readings = RecentReadings()
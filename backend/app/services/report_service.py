@@ -33,9 +33,16 @@ class ReportService:
         elements.append(title)
         elements.append(Spacer(1, 0.3*inch))
         
+        # Nodos, estadísticas y alertas de todos los nodos con consultas agrupadas
+        node_ids = [int(node_id) for node_id in node_ids]
+        nodes = NodeRepository.find_by_ids(node_ids)
+        all_stats = MeasurementRepository.get_statistics_bulk(list(nodes), start_date, end_date)
+        recent_alerts = AlertRepository.find_recent_by_nodes(list(nodes), start_date.date(), end_date.date())
+        alert_counts = AlertRepository.count_by_nodes(list(nodes), start_date.date(), end_date.date())
+        
         # Por cada nodo
         for node_id in node_ids:
-            node = NodeRepository.find_by_id(node_id)
+            node = nodes.get(node_id)
             if not node:
                 continue
             
@@ -45,7 +52,7 @@ class ReportService:
             elements.append(Spacer(1, 0.2*inch))
             
             # Estadísticas
-            stats = MeasurementRepository.get_statistics(node_id, start_date, end_date)
+            stats = all_stats[node_id]
             
             data = [
                 ['Variable', 'Promedio', 'Mínimo', 'Máximo'],
@@ -79,13 +86,15 @@ class ReportService:
             elements.append(Spacer(1, 0.3*inch))
             
             # Alertas
-            alerts = AlertRepository.find_by_node(node_id, start_date.date(), end_date.date())
+            alerts = recent_alerts[node_id]  # Primeras 10 alertas
             if alerts:
-                alert_title = Paragraph("<b>Alertas Generadas:</b>", styles['Heading3'])
+                alert_title = Paragraph(
+                    f"<b>Alertas Generadas:</b> {alert_counts[node_id]['total']}", styles['Heading3']
+                )
                 elements.append(alert_title)
                 
                 alert_data = [['Fecha', 'Tipo', 'Severidad', 'Estado']]
-                for alert in alerts[:10]:  # Primeras 10 alertas
+                for alert in alerts:
                     alert_data.append([
                         str(alert.fecha),
                         alert.tipo,
@@ -131,6 +140,33 @@ class ReportService:
             'message': 'Reporte generado exitosamente'
         }, 201
     
+    @staticmethod
+    def get_fleet_statistics(start_date=None, end_date=None, node_ids=None):
+        """Estadísticas y conteo de alertas de la flota (o de node_ids) en un período (30 días por defecto)"""
+        try:
+            end_date = datetime.fromisoformat(end_date) if isinstance(end_date, str) else end_date
+            start_date = datetime.fromisoformat(start_date) if isinstance(start_date, str) else start_date
+        except ValueError:
+            return {'error': 'Fechas inválidas'}, 400
+        end_date = end_date or datetime.utcnow()
+        start_date = start_date or end_date - timedelta(days=30)
+        
+        nodes = NodeRepository.find_by_ids(node_ids) if node_ids else \
+            {node.id: node for node in NodeRepository.find_all()}
+        stats = MeasurementRepository.get_statistics_bulk(list(nodes), start_date, end_date)
+        alert_counts = AlertRepository.count_by_nodes(list(nodes), start_date.date(), end_date.date())
+        
+        return {
+            'fecha_inicio': start_date.isoformat(),
+            'fecha_fin': end_date.isoformat(),
+            'nodes': [{
+                # Sin sensores: node.to_dict() consultaría los sensores de cada nodo
+                'node': {'id': node.id, 'ubicacion': node.ubicacion, 'estado': node.estado},
+                'statistics': stats[node_id],
+                'alertas': alert_counts[node_id]
+            } for node_id, node in sorted(nodes.items())]
+        }, 200
+    
     @staticmethod
     def get_user_reports(user_id):
         """Obtiene los reportes de un usuario"""
@@ -0,0 +1,135 @@
+# backend/app/services/retention_service.py
+import json
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func
+from app.extensions import db
+from app.models import Node, Measurement
+from app.models.rollup import MinuteRollup, FiveMinuteRollup, HourRollup, DayRollup
+from app.repositories import MeasurementRepository, RollupRepository, get_partition_manager
+from app.repositories.rollup_repository import floor_time
+from app.utils.metrics import metrics
+
+# Niveles de almacenamiento del más fino al más grueso: mediciones crudas y rollups
+TIER_MODELS = {'raw': None, '1m': MinuteRollup, '5m': FiveMinuteRollup, '1h': HourRollup, '1d': DayRollup}
+
+def parse_tiers(spec):
+    """Convierte 'raw:30,5m:365,1d:0' en {'raw': 30, '5m': 365, '1d': None} (0 = sin límite)"""
+    tiers = {}
+    for item in filter(None, (part.strip() for part in (spec or '').split(','))):
+        level, _, days = item.partition(':')
+        level = level.strip()
+        if level not in TIER_MODELS:
+            raise ValueError(f'Nivel de retención inválido: {level}')
+        try:
+            days = int(days)
+        except ValueError:
+            raise ValueError(f'Días de retención inválidos para {level}: {days!r}')
+        tiers[level] = days if days > 0 else None
+    return tiers
+
+class RetentionPolicy:
+    """Días que se conserva cada nivel (crudo, 1m, 5m, 1h, 1d), globales o por nodo
+
+    Un nivel ausente o con 0 días no se elimina nunca.
+    """
+
+    def __init__(self, tiers, node_tiers=None):
+        self.tiers = tiers
+        self.node_tiers = node_tiers or {}
+
+    @classmethod
+    def from_config(cls, config):
+        tiers = parse_tiers(config.get('RETENTION_TIERS'))
+        tiers.setdefault('raw', config.get('MEASUREMENT_RETENTION_DAYS', 90) or None)
+        overrides = json.loads(config.get('RETENTION_NODE_TIERS') or '{}')
+        node_tiers = {int(node_id): dict(tiers, **parse_tiers(spec)) for node_id, spec in overrides.items()}
+        return cls(tiers, node_tiers)
+
+    def tiers_for(self, node_id):
+        return self.node_tiers.get(node_id, self.tiers)
+
+    def cutoff(self, node_id, level, now):
+        """Inicio (alineado al día) de los datos que conserva un nivel; None si no vencen"""
+        days = self.tiers_for(node_id).get(level)
+        if days is None:
+            return None
+        return floor_time(now - timedelta(days=days), 86400)
+
+    def pick_level(self, node_id, start, end, raw_interval, max_points, now, allow_raw=True):
+        """Nivel más fino que aún conserva datos desde start sin superar max_points puntos"""
+        span = (end - start).total_seconds()
+        for level, model in TIER_MODELS.items():
+            if model is None and not allow_raw:
+                continue
+            cutoff = self.cutoff(node_id, level, now)
+            if cutoff is not None and start < cutoff:
+                continue
+            resolution = raw_interval if model is None else model.seconds
+            if span / max(resolution, 1) <= max_points:
+                return level
+        return '1d'
+
+class RetentionService:
+    @staticmethod
+    def apply_retention(now=None, batch_size=None, pause=None):
+        """Aplica la política de retención: reduce a rollups y luego elimina lo vencido
+
+        1. Incorpora los minutos pendientes y recalcula los rollups de los días crudos que
+           van a eliminarse (cubre histórico cargado fuera de la ruta de ingesta).
+        2. Elimina las particiones vencidas para todos los nodos y borra el resto por lotes.
+        3. Elimina las filas de cada nivel de rollup más antiguas que su retención.
+        """
+        config = current_app.config
+        policy = RetentionPolicy.from_config(config)
+        now = now or datetime.utcnow()
+        batch_size = batch_size or config.get('RETENTION_DELETE_BATCH', 5000)
+        pause = config.get('RETENTION_DELETE_PAUSE', 0.1) if pause is None else pause
+        summary = {'raw_deleted': 0, 'partitions_dropped': [], 'rollups_deleted': {}, 'rebuilt_minutes': 0}
+
+        compact_batch = config.get('ROLLUP_COMPACT_BATCH', 5000)
+        while RollupRepository.compact(compact_batch) == compact_batch:
+            pass
+
+        # Nodos agrupados por política (una sola pasada por grupo)
+        node_ids = [row.id for row in db.session.query(Node.id).all()]
+        groups = {}
+        for node_id in node_ids:
+            tiers = policy.tiers_for(node_id)
+            groups.setdefault(tuple(sorted(tiers.items())), []).append(node_id)
+        single_group = len(groups) == 1
+
+        raw_cutoffs = {}
+        for key, nodes in groups.items():
+            cutoff = policy.cutoff(nodes[0], 'raw', now)
+            if cutoff is None:
+                continue
+            raw_cutoffs[key] = cutoff
+            oldest = db.session.query(func.min(Measurement.fecha_hora))\
+                .filter(Measurement.nodo_id.in_(nodes)).scalar()
+            if oldest is not None and oldest < cutoff:
+                summary['rebuilt_minutes'] += RollupRepository.rebuild(oldest, cutoff, nodes)
+
+        # Las particiones contienen todos los nodos: solo se eliminan las vencidas para todos
+        if raw_cutoffs and len(raw_cutoffs) == len(groups):
+            manager = get_partition_manager(db.engine, config.get('MEASUREMENT_PARTITION_INTERVAL', 'month'))
+            if manager.supported and manager.is_partitioned():
+                summary['partitions_dropped'] = manager.drop_partitions(min(raw_cutoffs.values()))
+                metrics.inc('retention.partitions_dropped', len(summary['partitions_dropped']))
+
+        for key, cutoff in raw_cutoffs.items():
+            summary['raw_deleted'] += MeasurementRepository.delete_before(
+                cutoff, batch_size=batch_size, pause=pause,
+                node_ids=None if single_group else groups[key]
+            )
+
+        for key, nodes in groups.items():
+            for level, model in TIER_MODELS.items():
+                cutoff = policy.cutoff(nodes[0], level, now)
+                if model is None or cutoff is None:
+                    continue
+                deleted = RollupRepository.delete_before(model, cutoff, None if single_group else nodes)
+                summary['rollups_deleted'][level] = summary['rollups_deleted'].get(level, 0) + deleted
+                metrics.inc('retention.rollups_deleted', deleted)
+
+        return summary
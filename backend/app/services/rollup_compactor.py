@@ -0,0 +1,63 @@
+# backend/app/services/rollup_compactor.py
+import time
+from threading import Thread, Event
+from app.repositories.rollup_repository import RollupRepository
+from app.utils.metrics import metrics
+
+class RollupCompactor:
+    """Thread que incorpora periódicamente los minutos pendientes a los rollups minuto/5 min/hora/día"""
+
+    def __init__(self, app, interval=30.0, batch=5000):
+        self.app = app
+        self.interval = interval
+        self.batch = batch
+        self._stop = Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name='rollup-compactor')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def run_once(self):
+        """Compacta hasta vaciar los pendientes (o hasta que se pida detener); retorna los procesados"""
+        total = 0
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            processed = RollupRepository.compact(self.batch)
+            if processed:
+                metrics.observe('rollups.compact_ms', (time.perf_counter() - start) * 1000)
+            total += processed
+            if processed < self.batch:
+                break
+        return total
+
+    def _run(self):
+        from app.extensions import db
+
+        with self.app.app_context():
+            while not self._stop.wait(self.interval):
+                try:
+                    self.run_once()
+                except Exception as e:
+                    metrics.inc('rollups.compact_errors')
+                    print(f"Error compactando rollups: {e}")
+                finally:
+                    db.session.remove()
+
+def create_compactor(app):
+    """Crea el compactador de rollups según la configuración
+
+    Retorna None si está deshabilitado o si create_app ya inició uno (ROLLUP_COMPACT_IN_WEB).
+    """
+    interval = app.config.get('ROLLUP_COMPACT_INTERVAL', 30)
+    if not interval or interval <= 0 or 'rollup_compactor' in app.extensions:
+        return None
+    return RollupCompactor(app, interval=interval, batch=app.config.get('ROLLUP_COMPACT_BATCH', 5000))
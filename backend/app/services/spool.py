@@ -0,0 +1,327 @@
+# backend/app/services/spool.py
+import os
+import json
+import time
+import base64
+from datetime import datetime
+from threading import Lock, Thread, Event
+from sqlalchemy import exc as sa_exc
+from app.utils.metrics import metrics
+from app.services.ingest_queue import IngestMessage
+
+SEGMENT_PREFIX = 'segment-'
+SEGMENT_SUFFIX = '.jsonl'
+
+def is_transient_error(error):
+    """Indica si un error de base de datos es de conectividad (se reintenta) y no de datos"""
+    if isinstance(error, (sa_exc.OperationalError, sa_exc.InterfaceError,
+                          sa_exc.DisconnectionError, sa_exc.TimeoutError)):
+        return True
+    return isinstance(error, sa_exc.DBAPIError) and error.connection_invalidated
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'Tipo no serializable: {type(value)}')
+
+class Spool:
+    """Spool local append-only en segmentos para lo que no se pudo escribir en la base de datos
+
+    Cada línea es un registro JSON: {"kind": "reading", "data": {...}} para mediciones
+    decodificadas o {"kind": "raw", "topic": .., "payload": <base64>} para mensajes
+    sin decodificar (cola saturada).
+    """
+
+    def __init__(self, directory, segment_bytes=8 * 1024 * 1024, quota_bytes=512 * 1024 * 1024,
+                 fsync_every=100):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.quota_bytes = quota_bytes
+        self.fsync_every = fsync_every
+        self._lock = Lock()
+        self._active = None
+        self._active_path = None
+        self._unsynced = 0
+        os.makedirs(directory, exist_ok=True)
+        self._bytes = sum(os.path.getsize(p) for p in self.segments())
+        self._next_index = self._last_index() + 1
+        self._update_gauges()
+
+    def append_readings(self, readings):
+        """Agrega mediciones decodificadas al spool"""
+        now = time.time()
+        self._append([{'kind': 'reading', 'data': r, 'spooled_at': now} for r in readings])
+
+    def append_raw(self, topic, payload, received_at):
+        """Agrega un mensaje MQTT sin decodificar al spool"""
+        self._append([{
+            'kind': 'raw',
+            'topic': topic,
+            'payload': base64.b64encode(payload).decode('ascii'),
+            'received_at': received_at,
+            'spooled_at': time.time()
+        }])
+
+    def _append(self, records):
+        data = ''.join(json.dumps(r, default=_json_default) + '\n' for r in records).encode('utf-8')
+
+        with self._lock:
+            self._enforce_quota(len(data))
+            if self._active is None or self._active.tell() >= self.segment_bytes:
+                self._rotate()
+            self._active.write(data)
+            self._bytes += len(data)
+            self._unsynced += len(records)
+            # fsync por grupos de registros para no pagar un fsync por mensaje
+            if self._unsynced >= self.fsync_every:
+                self._sync()
+
+        metrics.inc('spool.appended', len(records))
+        self._update_gauges()
+
+    def sync(self):
+        """Fuerza la escritura a disco del segmento activo"""
+        with self._lock:
+            self._sync()
+
+    def close(self):
+        """Cierra el segmento activo"""
+        with self._lock:
+            self._close_active()
+
+    def seal(self):
+        """Cierra el segmento activo si tiene datos para que pueda reprocesarse"""
+        with self._lock:
+            if self._active is not None and self._active.tell() > 0:
+                self._close_active()
+
+    def segments(self, include_active=True):
+        """Segmentos pendientes ordenados del más antiguo al más reciente"""
+        paths = [
+            os.path.join(self.directory, name)
+            for name in sorted(os.listdir(self.directory))
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+        ]
+        if not include_active:
+            paths = [p for p in paths if p != self._active_path]
+        return paths
+
+    def remove(self, path):
+        """Elimina un segmento ya reprocesado"""
+        with self._lock:
+            self._remove(path)
+        self._update_gauges()
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+    def oldest_record_time(self):
+        """spooled_at del registro pendiente más antiguo (o None si el spool está vacío)"""
+        for path in self.segments():
+            try:
+                with open(path, 'rb') as f:
+                    f.seek(read_offset(path))
+                    line = f.readline()
+                if line.strip():
+                    return json.loads(line).get('spooled_at')
+            except (OSError, json.JSONDecodeError):
+                continue
+        return None
+
+    def _rotate(self):
+        self._close_active()
+        self._active_path = os.path.join(
+            self.directory, f'{SEGMENT_PREFIX}{self._next_index:012d}{SEGMENT_SUFFIX}'
+        )
+        self._next_index += 1
+        self._active = open(self._active_path, 'ab')
+
+    def _close_active(self):
+        if self._active is not None:
+            self._sync()
+            self._active.close()
+            self._active = None
+            self._active_path = None
+
+    def _sync(self):
+        if self._active is not None and self._unsynced:
+            self._active.flush()
+            os.fsync(self._active.fileno())
+            self._unsynced = 0
+
+    def _remove(self, path):
+        try:
+            self._bytes -= os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        try:
+            os.remove(offset_path(path))
+        except FileNotFoundError:
+            pass
+
+    def _enforce_quota(self, incoming):
+        """Descarta los segmentos cerrados más antiguos si se supera la cuota de disco"""
+        for path in self.segments(include_active=False):
+            if self._bytes + incoming <= self.quota_bytes:
+                break
+            self._remove(path)
+            metrics.inc('spool.dropped_segments')
+            print(f"Spool lleno: segmento descartado {os.path.basename(path)}")
+
+    def _last_index(self):
+        indexes = [
+            int(os.path.basename(p)[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+            for p in self.segments()
+        ]
+        return max(indexes, default=0)
+
+    def _update_gauges(self):
+        metrics.set_gauge('spool.bytes', self._bytes)
+
+class SpoolReplayer:
+    """Reprocesa el spool a ritmo controlado a través de la ruta de inserción por lotes"""
+
+    def __init__(self, app, spool, handler, decoder, batch_size=100, max_rate=500, retry_interval=5.0):
+        self.app = app
+        self.spool = spool
+        self.handler = handler
+        self.decoder = decoder
+        self.batch_size = batch_size
+        self.max_rate = max_rate
+        self.retry_interval = retry_interval
+        self._stop = Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name='spool-replayer')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        from app.extensions import db
+
+        with self.app.app_context():
+            while not self._stop.is_set():
+                self._update_lag()
+                segments = self.spool.segments(include_active=False)
+                if not segments:
+                    self.spool.seal()
+                    segments = self.spool.segments(include_active=False)
+                if not segments:
+                    self._stop.wait(self.retry_interval)
+                    continue
+                try:
+                    self.replay_segment(segments[0])
+                except Exception as e:
+                    # La base de datos sigue caída: se reintenta desde el último offset confirmado
+                    db.session.rollback()
+                    metrics.inc('spool.replay_errors')
+                    print(f"Error reprocesando spool: {e}")
+                    self._stop.wait(self.retry_interval)
+            db.session.remove()
+
+    def replay_segment(self, path):
+        """Reprocesa un segmento cerrado desde su offset confirmado y lo elimina al terminar"""
+        with open(path, 'rb') as f:
+            f.seek(read_offset(path))
+            while True:
+                if self._stop.is_set():
+                    return False
+                start = f.tell()
+                batch = self._read_batch(f)
+                if f.tell() == start:
+                    break
+
+                started = time.monotonic()
+                if batch:
+                    self._replay_batch(batch)
+                write_offset(path, f.tell())
+                self._update_lag()
+
+                # Limitar el ritmo para no saturar la base de datos recién recuperada
+                if self.max_rate and batch:
+                    pause = len(batch) / self.max_rate - (time.monotonic() - started)
+                    if pause > 0:
+                        self._stop.wait(pause)
+
+        self.spool.remove(path)
+        return True
+
+    def _replay_batch(self, batch):
+        """Escribe un lote; los errores de datos lo descartan para no bloquear el spool"""
+        from app.extensions import db
+
+        try:
+            self.handler(batch)
+        except Exception as e:
+            if is_transient_error(e):
+                raise
+            db.session.rollback()
+            metrics.inc('spool.replay_rejected', len(batch))
+            print(f"Lote del spool descartado por error de datos: {e}")
+            return
+        metrics.inc('spool.replayed', len(batch))
+
+    def _read_batch(self, f):
+        """Lee hasta batch_size mediciones desde la posición actual del archivo"""
+        batch = []
+        while len(batch) < self.batch_size:
+            line = f.readline()
+            if not line:
+                break
+            if not line.endswith(b'\n'):
+                # Línea incompleta por un corte durante la escritura
+                metrics.inc('spool.corrupt_records')
+                break
+            try:
+                record = json.loads(line)
+                if record.get('kind') == 'raw':
+                    batch.extend(self.decoder(IngestMessage(
+                        record['topic'], base64.b64decode(record['payload']), record['received_at']
+                    )))
+                else:
+                    batch.append(record['data'])
+            except (ValueError, KeyError, TypeError):
+                metrics.inc('spool.corrupt_records')
+        return batch
+
+    def _update_lag(self):
+        oldest = self.spool.oldest_record_time()
+        metrics.set_gauge('spool.replay_lag_seconds', round(time.time() - oldest, 3) if oldest else 0)
+
+def create_spool(app):
+    """Crea el spool configurado en la aplicación (None si INGEST_SPOOL_DIR está vacío)"""
+    if not app.config.get('INGEST_SPOOL_DIR'):
+        return None
+    return Spool(
+        app.config['INGEST_SPOOL_DIR'],
+        segment_bytes=app.config.get('INGEST_SPOOL_SEGMENT_MB', 8) * 1024 * 1024,
+        quota_bytes=app.config.get('INGEST_SPOOL_QUOTA_MB', 512) * 1024 * 1024,
+        fsync_every=app.config.get('INGEST_SPOOL_FSYNC_EVERY', 100)
+    )
+
+def offset_path(path):
+    return path + '.offset'
+
+def read_offset(path):
+    """Offset confirmado de un segmento (bytes ya reprocesados)"""
+    try:
+        with open(offset_path(path)) as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+def write_offset(path, offset):
+    tmp = offset_path(path) + '.tmp'
+    with open(tmp, 'w') as f:
+        f.write(str(offset))
+    os.replace(tmp, offset_path(path))
@@ -1,6 +1,8 @@
 # backend/app/utils/__init__.py
 from app.utils.decorators import validate_json, admin_required
-from app.utils.validators import validate_email, validate_password
+from app.utils.validators import (
+    validate_email, validate_password, validate_measurement, validate_measurement_batch
+)
 from app.utils.helpers import parse_date_range, format_measurement_for_chart
 
 __all__ = [
@@ -8,6 +10,8 @@ __all__ = [
     'admin_required',
     'validate_email',
     'validate_password',
+    'validate_measurement',
+    'validate_measurement_batch',
     'parse_date_range',
     'format_measurement_for_chart'
 ]
\ No newline at end of file
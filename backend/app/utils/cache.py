@@ -0,0 +1,107 @@
+# backend/app/utils/cache.py
+import time
+from collections import OrderedDict
+from threading import Lock
+from app.utils.metrics import metrics
+
+_MISSING = object()
+
+class TTLCache:
+    """Caché LRU con expiración por tiempo, segura para uso desde varios threads
+
+    Los valores None que retorna el loader de get_or_load (claves inexistentes) se
+    guardan solo miss_ttl segundos (0 = no se guardan). invalidate solo alcanza al
+    proceso actual: en otros procesos el valor vive hasta que expira su TTL.
+    """
+
+    def __init__(self, name, maxsize=1024, ttl=60.0, miss_ttl=5.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self._data = OrderedDict()
+        # Generación por clave (y global): una carga iniciada antes de invalidar no se guarda
+        self._generations = {}
+        self._epoch = 0
+        self._lock = Lock()
+
+    def configure(self, maxsize=None, ttl=None, miss_ttl=None):
+        """Ajusta tamaño y TTL (se vacía la caché)"""
+        with self._lock:
+            if maxsize is not None:
+                self.maxsize = maxsize
+            if ttl is not None:
+                self.ttl = ttl
+            if miss_ttl is not None:
+                self.miss_ttl = miss_ttl
+            self._data.clear()
+            self._epoch += 1
+
+    def get(self, key, default=None):
+        """Obtiene un valor vigente o default si no está o expiró"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    metrics.inc(f'cache.{self.name}.hits')
+                    return value
+                del self._data[key]
+        metrics.inc(f'cache.{self.name}.misses')
+        return default
+
+    def set(self, key, value, ttl=None):
+        """Guarda un valor desalojando el menos usado si se supera maxsize"""
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def _store(self, key, value, ttl):
+        self._data[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            metrics.inc(f'cache.{self.name}.evictions')
+
+    def get_or_load(self, key, loader):
+        """Obtiene un valor o lo carga con loader(key) si no está en caché
+
+        El loader corre fuera del lock; si la clave se invalidó mientras tanto, el valor
+        cargado se retorna pero no se guarda.
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            with self._lock:
+                generation = (self._epoch, self._generations.get(key, 0))
+            value = loader(key)
+            ttl = self.miss_ttl if value is None else None
+            if ttl != 0:
+                with self._lock:
+                    if generation == (self._epoch, self._generations.get(key, 0)):
+                        self._store(key, value, ttl)
+                    else:
+                        metrics.inc(f'cache.{self.name}.stale_loads')
+        return value
+
+    def invalidate(self, key):
+        """Elimina una clave de la caché y descarta las cargas en curso de esa clave"""
+        with self._lock:
+            self._data.pop(key, None)
+            self._generations[key] = self._generations.get(key, 0) + 1
+        metrics.inc(f'cache.{self.name}.invalidations')
+
+    def clear(self):
+        """Vacía la caché"""
+        with self._lock:
+            self._data.clear()
+            self._epoch += 1
+
+    def stats(self):
+        """Retorna tamaño actual y contadores de aciertos/fallos"""
+        with self._lock:
+            size = len(self._data)
+        return {
+            'size': size,
+            'hits': metrics.get_counter(f'cache.{self.name}.hits'),
+            'misses': metrics.get_counter(f'cache.{self.name}.misses')
+        }
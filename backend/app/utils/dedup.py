@@ -0,0 +1,72 @@
+# backend/app/utils/dedup.py
+import hashlib
+from collections import OrderedDict, deque
+from threading import Lock
+
+# Los message ids de texto se mapean a enteros con el bit 62 activo para no chocar con 'seq'
+_MSG_ID_FLAG = 1 << 62
+_MSG_ID_MASK = _MSG_ID_FLAG - 1
+
+def dedup_key(reading):
+    """Clave de idempotencia de una medición: 'seq' entero o hash de 'msg_id' (None si no tiene)"""
+    seq = reading.get('seq')
+    if isinstance(seq, int) and not isinstance(seq, bool) and 0 <= seq < _MSG_ID_FLAG:
+        return seq
+
+    msg_id = reading.get('msg_id', seq)
+    if msg_id is None:
+        return None
+    digest = hashlib.blake2b(str(msg_id).encode(), digest_size=8).digest()
+    return _MSG_ID_FLAG | (int.from_bytes(digest, 'big') & _MSG_ID_MASK)
+
+class DedupWindow:
+    """Ventana acotada por nodo con las últimas claves de mensaje confirmadas"""
+
+    def __init__(self, per_node=1024, max_nodes=10000):
+        self.per_node = per_node
+        self.max_nodes = max_nodes
+        self._nodes = OrderedDict()
+        self._lock = Lock()
+
+    def configure(self, per_node=None, max_nodes=None):
+        """Ajusta los límites (se vacía la ventana)"""
+        with self._lock:
+            if per_node is not None:
+                self.per_node = per_node
+            if max_nodes is not None:
+                self.max_nodes = max_nodes
+            self._nodes.clear()
+
+    def contains(self, node_id, key):
+        """Indica si la clave ya fue confirmada para el nodo"""
+        with self._lock:
+            entry = self._nodes.get(node_id)
+            return entry is not None and key in entry[1]
+
+    def remember(self, node_id, keys):
+        """Registra claves confirmadas (llamar después del commit)"""
+        with self._lock:
+            entry = self._nodes.get(node_id)
+            if entry is None:
+                entry = (deque(), set())
+                self._nodes[node_id] = entry
+                while len(self._nodes) > self.max_nodes:
+                    self._nodes.popitem(last=False)
+            else:
+                self._nodes.move_to_end(node_id)
+
+            order, members = entry
+            for key in keys:
+                if key in members:
+                    continue
+                order.append(key)
+                members.add(key)
+                if len(order) > self.per_node:
+                    members.discard(order.popleft())
+
+    def clear(self):
+        with self._lock:
+            self._nodes.clear()
+
+# Ventana global del proceso
+dedup_window = DedupWindow()
@@ -0,0 +1,117 @@
+# backend/app/utils/downsampling.py
+import numpy as np
+
+DOWNSAMPLING_METHODS = ('lttb', 'minmax')
+# Puntos mínimos con los que cada método reduce (con menos se conservan todas las filas)
+METHOD_MIN_POINTS = {'lttb': 3, 'minmax': 4}
+# Pasadas de ajuste del presupuesto por variable en downsample_indices
+_BUDGET_ROUNDS = 8
+
+def lttb_indices(x, y, threshold):
+    """Índices elegidos por Largest-Triangle-Three-Buckets (conserva picos y forma de la curva)"""
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # Límites de los threshold-2 intervalos interiores (el primer y último punto se conservan)
+    edges = (np.arange(threshold - 1) * ((n - 2) / (threshold - 2))).astype(np.int64) + 1
+    edges[-1] = n - 1
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(x[:-1], edges[:-1]) / counts
+    mean_y = np.add.reduceat(y[:-1], edges[:-1]) / counts
+    # El intervalo siguiente al último interior es el punto final
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - next_x[i]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (next_y[i] - ay))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+def minmax_indices(y, threshold):
+    """Índices del mínimo y el máximo de cada intervalo (threshold/2 intervalos, sin bucles)"""
+    n = len(y)
+    if threshold >= n or threshold < 4:
+        return np.arange(n)
+    y = np.asarray(y, dtype=np.float64)
+
+    buckets = (threshold - 2) // 2
+    edges = (np.arange(buckets) * (n / buckets)).astype(np.int64)
+    bucket_of = np.repeat(np.arange(buckets), np.diff(np.append(edges, n)))
+    mins = np.minimum.reduceat(y, edges)
+    maxs = np.maximum.reduceat(y, edges)
+
+    selected = [np.array([0, n - 1])]
+    for extreme in (mins, maxs):
+        hits = np.flatnonzero(y == extreme[bucket_of])
+        # Primera coincidencia de cada intervalo
+        _, first = np.unique(bucket_of[hits], return_index=True)
+        selected.append(hits[first])
+    return np.unique(np.concatenate(selected))
+
+def downsample_indices(times, series, max_points, method='lttb'):
+    """Índices (ordenados) de las filas a conservar para graficar varias series con max_points filas
+
+    times: fechas de las filas; series: listas de valores por variable. Se conserva la unión
+    de los puntos elegidos para cada variable: el presupuesto por variable se busca por
+    bisección (a lo sumo _BUDGET_ROUNDS pasadas) para que la unión se acerque a max_points
+    sin superarlo. El resultado nunca tiene más de max_points filas.
+    """
+    n = len(times)
+    if not max_points or n <= max_points:
+        return np.arange(n)
+    if max_points < 0:
+        raise ValueError(f'max_points inválido: {max_points}')
+    if method not in DOWNSAMPLING_METHODS:
+        raise ValueError(f'Método de reducción inválido: {method}')
+
+    x = np.asarray(times, dtype='datetime64[us]').astype(np.int64) / 1e6
+    columns = [np.asarray(values, dtype=np.float64) for values in series]
+
+    def select(budget):
+        if method == 'lttb':
+            chosen = [lttb_indices(x, y, budget) for y in columns]
+        else:
+            chosen = [minmax_indices(y, budget) for y in columns]
+        return np.unique(np.concatenate(chosen))
+
+    # La unión crece con el presupuesto, pero no en proporción fija (las variables coinciden
+    # en parte de los puntos): se acota entre el mayor presupuesto que entra y el menor que no
+    minimum = METHOD_MIN_POINTS[method]
+    fits, over = None, None
+    low, high = minimum - 1, max_points + 1
+    budget = max(max_points // max(len(columns), 1), minimum)
+    for _ in range(_BUDGET_ROUNDS):
+        chosen = select(budget)
+        if len(chosen) <= max_points:
+            low, fits = budget, chosen
+            if len(chosen) >= max_points * 0.95:
+                break
+        else:
+            high, over = budget, chosen
+        # Estimación proporcional dentro del intervalo; si se sale, punto medio
+        guess = int(budget * max_points / len(chosen))
+        budget = guess if low < guess < high else (low + high) // 2
+        if budget <= low or budget < minimum:
+            break
+    if fits is not None:
+        return fits
+    # Ni el presupuesto mínimo entra (max_points muy chico): puntos equiespaciados de la unión
+    return over[np.linspace(0, len(over) - 1, max_points).round().astype(np.int64)]
+
+def downsample_rows(rows, max_points, method='lttb', time_key='fecha_hora',
+                    variables=('temperatura', 'humedad', 'co2')):
+    """Reduce una lista de diccionarios ordenada por fecha a lo sumo a max_points filas"""
+    if not max_points or len(rows) <= max_points:
+        return rows
+    times = [row[time_key] for row in rows]
+    series = [[row[var] for row in rows] for var in variables]
+    return [rows[i] for i in downsample_indices(times, series, max_points, method)]
@@ -1,6 +1,7 @@
 # backend/app/utils/helpers.py
 from datetime import datetime, timedelta
 import json
+from app.utils.downsampling import downsample_indices
 
 def parse_date_range(period):
     """Convierte un período en rango de fechas"""
@@ -17,8 +18,16 @@ def parse_date_range(period):
     
     return start_date, end_date
 
-def format_measurement_for_chart(measurements):
-    """Formatea mediciones para gráficos"""
+def format_measurement_for_chart(measurements, max_points=None, method='lttb'):
+    """Formatea mediciones para gráficos (reducidas a max_points puntos si se indica)"""
+    if max_points and len(measurements) > max_points:
+        indices = downsample_indices(
+            [m.fecha_hora for m in measurements],
+            [[m.temperatura for m in measurements], [m.humedad for m in measurements],
+             [m.co2 for m in measurements]],
+            max_points, method
+        )
+        measurements = [measurements[i] for i in indices]
     return [{
         'timestamp': m.fecha_hora.isoformat(),
         'temperatura': m.temperatura,
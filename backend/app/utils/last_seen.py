@@ -0,0 +1,110 @@
+# backend/app/utils/last_seen.py
+import atexit
+from datetime import datetime
+from threading import Lock, Thread, Event
+from app.utils.metrics import metrics
+
+class LastSeenTracker:
+    """Mapa en memoria de última conexión por nodo con escritura diferida a nodos.ultima_conexion"""
+
+    def __init__(self):
+        self.app = None
+        self.interval = 0
+        self._pending = {}
+        self._lock = Lock()
+        self._stop = Event()
+        self._thread = None
+
+    def init_app(self, app):
+        """Configura el intervalo de escritura e inicia el thread de vaciado"""
+        self.app = app
+        self.interval = app.config.get('LAST_SEEN_FLUSH_INTERVAL', 5.0)
+
+        if self.interval > 0 and self._thread is None:
+            self._stop.clear()
+            self._thread = Thread(target=self._run, name='last-seen-flusher')
+            self._thread.daemon = True
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def touch(self, node_id, seen_at=None, session=None):
+        """Registra actividad de un nodo (sin acceso a la base de datos)"""
+        seen_at = seen_at or datetime.utcnow()
+        with self._lock:
+            current = self._pending.get(node_id)
+            if current is None or seen_at > current:
+                self._pending[node_id] = seen_at
+            pending = len(self._pending)
+        metrics.set_gauge('last_seen.pending', pending)
+
+        # Sin thread de vaciado la escritura es inmediata (dentro de la sesión del llamador si la hay)
+        if self.interval <= 0:
+            self.flush(session=session)
+
+    def get(self, node_id):
+        """Última conexión pendiente de escribir para un nodo (o None)"""
+        with self._lock:
+            return self._pending.get(node_id)
+
+    def flush(self, session=None):
+        """Escribe las conexiones pendientes con un único UPDATE multi-fila (con session, sin commit)"""
+        from sqlalchemy import update, case, or_
+        from app.extensions import db
+        from app.models import Node
+
+        with self._lock:
+            snapshot = dict(self._pending)
+        if not snapshot:
+            return 0
+
+        new_value = case(snapshot, value=Node.id)
+        stmt = update(Node).where(
+            Node.id.in_(list(snapshot)),
+            # No retroceder valores escritos por otro proceso
+            or_(Node.ultima_conexion.is_(None), Node.ultima_conexion < new_value)
+        ).values(ultima_conexion=new_value).execution_options(synchronize_session=False)
+
+        if session is not None:
+            session.execute(stmt)
+        else:
+            try:
+                db.session.execute(stmt)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                metrics.inc('last_seen.flush_errors')
+                raise
+
+        # Quitar solo las entradas que no cambiaron durante la escritura
+        with self._lock:
+            for node_id, seen_at in snapshot.items():
+                if self._pending.get(node_id) == seen_at:
+                    del self._pending[node_id]
+            pending = len(self._pending)
+
+        metrics.set_gauge('last_seen.pending', pending)
+        metrics.inc('last_seen.flushes')
+        return len(snapshot)
+
+    def stop(self):
+        """Detiene el thread y escribe lo pendiente (se llama también al salir)"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self._flush_in_context()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._flush_in_context()
+
+    def _flush_in_context(self):
+        try:
+            with self.app.app_context():
+                self.flush()
+        except Exception as e:
+            print(f"Error escribiendo última conexión de nodos: {e}")
+
+# Instancia global del proceso
+last_seen = LastSeenTracker()
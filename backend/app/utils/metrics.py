@@ -0,0 +1,90 @@
+# backend/app/utils/metrics.py
+import math
+from threading import Lock
+from collections import deque
+
+class MetricsRegistry:
+    """Registro en memoria de contadores, gauges y distribuciones (thread-safe)"""
+    
+    def __init__(self, reservoir_size=1024):
+        self.reservoir_size = reservoir_size
+        self._lock = Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._summaries = {}
+
+    def inc(self, name, value=1):
+        """Incrementa un contador"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name, value):
+        """Fija el valor actual de un gauge"""
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name, value):
+        """Registra una observación (latencias, tamaños de lote)"""
+        with self._lock:
+            summary = self._summaries.get(name)
+            if summary is None:
+                summary = {
+                    'count': 0,
+                    'sum': 0.0,
+                    'min': value,
+                    'max': value,
+                    'recent': deque(maxlen=self.reservoir_size)
+                }
+                self._summaries[name] = summary
+            summary['count'] += 1
+            summary['sum'] += value
+            summary['min'] = min(summary['min'], value)
+            summary['max'] = max(summary['max'], value)
+            summary['recent'].append(value)
+
+    def get_counter(self, name):
+        """Obtiene el valor de un contador"""
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def get_gauge(self, name, default=None):
+        """Obtiene el valor de un gauge"""
+        with self._lock:
+            return self._gauges.get(name, default)
+
+    def snapshot(self):
+        """Devuelve una copia serializable de todas las métricas"""
+        with self._lock:
+            summaries = {}
+            for name, s in self._summaries.items():
+                recent = sorted(s['recent'])
+                summaries[name] = {
+                    'count': s['count'],
+                    'avg': s['sum'] / s['count'] if s['count'] else 0,
+                    'min': s['min'],
+                    'max': s['max'],
+                    'p50': _percentile(recent, 50),
+                    'p99': _percentile(recent, 99)
+                }
+            return {
+                'counters': dict(self._counters),
+                'gauges': dict(self._gauges),
+                'summaries': summaries
+            }
+
+    def reset(self):
+        """Reinicia todas las métricas"""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._summaries.clear()
+
+def _percentile(sorted_values, percent):
+    """Percentil por rango más cercano sobre una lista ordenada"""
+    if not sorted_values:
+        return 0
+    index = max(0, math.ceil(percent / 100 * len(sorted_values)) - 1)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+# Registro global del proceso
+metrics = MetricsRegistry()
@@ -0,0 +1,17 @@
+# backend/app/utils/pagination.py
+import base64
+from datetime import datetime
+
+def encode_cursor(fecha_hora, row_id):
+    """Token opaco con la posición (fecha_hora, id) de la última fila de una página"""
+    raw = f'{fecha_hora.isoformat()}|{row_id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(token):
+    """Recupera (fecha_hora, id) de un token; ValueError si es inválido"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        fecha_hora, row_id = raw.split('|')
+        return datetime.fromisoformat(fecha_hora), int(row_id)
+    except (ValueError, UnicodeDecodeError, TypeError):
+        raise ValueError('Cursor inválido')
@@ -0,0 +1,198 @@
+# backend/app/utils/payload_codec.py
+import json
+import struct
+from datetime import datetime, timezone, timedelta
+
+# Trama binaria v1 (little-endian, 16 bytes):
+#   B  magic        0xA5 (nunca es el primer byte de un JSON válido)
+#   B  versión      1
+#   I  nodo_id      uint32
+#   I  timestamp    uint32, segundos epoch UTC del dispositivo (0 = hora del servidor)
+#   h  temperatura  int16, °C x 100
+#   H  humedad      uint16, % x 100
+#   H  co2          uint16, ppm
+#
+# Trama binaria v2 (multi-muestra, delta respecto a un tiempo base):
+#   B  magic        0xA5
+#   B  versión      2
+#   I  nodo_id      uint32
+#   I  base_ts      uint32, segundos epoch UTC
+#   H  n            cantidad de muestras
+#   n x (H dt, h temperatura, H humedad, H co2)   dt en segundos desde base_ts
+BINARY_MAGIC = 0xA5
+BINARY_VERSION = 1
+BINARY_VERSION_MULTI = 2
+FRAME_V1 = struct.Struct('<BBIIhHH')
+FRAME_V2_HEADER = struct.Struct('<BBIIH')
+FRAME_V2_SAMPLE = struct.Struct('<HhHH')
+
+TEMP_SCALE = 100.0
+HUM_SCALE = 100.0
+CO2_SCALE = 1.0
+
+class PayloadError(ValueError):
+    """Payload de dispositivo que no se puede decodificar"""
+
+def is_binary_payload(topic, payload, binary_suffix='/bin'):
+    """Determina el formato por sufijo del tópico o por el byte mágico"""
+    if binary_suffix and topic and topic.endswith(binary_suffix):
+        return True
+    return len(payload) > 0 and payload[0] == BINARY_MAGIC
+
+def decode_payload(topic, payload, binary_suffix='/bin'):
+    """Decodifica un payload MQTT (binario o JSON) a un diccionario de medición"""
+    if is_binary_payload(topic, payload, binary_suffix):
+        return decode_binary(payload)
+    return decode_json(payload)
+
+def decode_json(payload):
+    """Decodifica un payload JSON"""
+    try:
+        data = json.loads(payload)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise PayloadError(f'JSON inválido: {e}')
+    if not isinstance(data, dict):
+        raise PayloadError('El payload JSON debe ser un objeto')
+    return data
+
+def decode_binary(payload):
+    """Decodifica una trama binaria versionada"""
+    if len(payload) < 2 or payload[0] != BINARY_MAGIC:
+        raise PayloadError('Trama binaria sin byte mágico')
+
+    version = payload[1]
+    if version == BINARY_VERSION_MULTI:
+        return _decode_binary_multi(payload)
+    if version != BINARY_VERSION:
+        raise PayloadError(f'Versión de trama no soportada: {version}')
+    if len(payload) != FRAME_V1.size:
+        raise PayloadError(f'Longitud de trama inválida: {len(payload)} bytes')
+
+    _, _, nodo_id, timestamp, temp, hum, co2 = FRAME_V1.unpack(payload)
+    data = {
+        'nodo_id': nodo_id,
+        'temperatura': temp / TEMP_SCALE,
+        'humedad': hum / HUM_SCALE,
+        'co2': co2 / CO2_SCALE
+    }
+    if timestamp:
+        data['fecha_hora'] = parse_timestamp(timestamp)
+    return data
+
+def _decode_binary_multi(payload):
+    """Decodifica una trama v2 con varias muestras"""
+    if len(payload) < FRAME_V2_HEADER.size:
+        raise PayloadError('Trama multi-muestra truncada')
+    _, _, nodo_id, base_ts, count = FRAME_V2_HEADER.unpack_from(payload)
+    if len(payload) != FRAME_V2_HEADER.size + count * FRAME_V2_SAMPLE.size:
+        raise PayloadError(f'Longitud de trama inválida para {count} muestras')
+
+    samples = [
+        [dt, temp / TEMP_SCALE, hum / HUM_SCALE, co2 / CO2_SCALE]
+        for dt, temp, hum, co2 in FRAME_V2_SAMPLE.iter_unpack(payload[FRAME_V2_HEADER.size:])
+    ]
+    return {'nodo_id': nodo_id, 'base_ts': base_ts, 'samples': samples}
+
+def parse_timestamp(value):
+    """Convierte epoch (s o ms), ISO 8601 o datetime a datetime UTC sin zona"""
+    if isinstance(value, datetime):
+        parsed = value
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        # Valores muy grandes se interpretan como milisegundos
+        seconds = value / 1000.0 if value > 1e11 else value
+        return datetime(1970, 1, 1) + timedelta(seconds=seconds)
+    elif isinstance(value, str):
+        try:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            raise PayloadError(f'Marca de tiempo inválida: {value}')
+    else:
+        raise PayloadError(f'Marca de tiempo inválida: {value!r}')
+
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def expand_payload(data, max_samples=None):
+    """Expande un payload (una muestra o 'samples') a una lista de mediciones con fecha_hora
+
+    Formatos de muestra aceptados dentro de 'samples':
+      {"ts": <epoch|ISO>, "temperatura": .., "humedad": .., "co2": ..}
+      {"dt": <segundos desde base_ts>, ...}
+      [dt, temperatura, humedad, co2]
+    """
+    if 'samples' not in data:
+        reading = dict(data)
+        if 'ts' in reading:
+            reading['fecha_hora'] = reading.pop('ts')
+        if reading.get('fecha_hora') is not None:
+            reading['fecha_hora'] = parse_timestamp(reading['fecha_hora'])
+        return [reading]
+
+    samples = data['samples']
+    if not isinstance(samples, list) or not samples:
+        raise PayloadError("'samples' debe ser una lista no vacía")
+    if max_samples and len(samples) > max_samples:
+        raise PayloadError(f'El payload supera el máximo de {max_samples} muestras')
+
+    base = parse_timestamp(data['base_ts']) if data.get('base_ts') is not None else None
+    node_id = data.get('nodo_id')
+    message_id = data.get('msg_id', data.get('seq'))
+    readings = []
+
+    for sample_index, sample in enumerate(samples):
+        if isinstance(sample, (list, tuple)):
+            if len(sample) != 4:
+                raise PayloadError('Las muestras compactas deben ser [dt, temperatura, humedad, co2]')
+            sample = {'dt': sample[0], 'temperatura': sample[1], 'humedad': sample[2], 'co2': sample[3]}
+        elif not isinstance(sample, dict):
+            raise PayloadError('Cada muestra debe ser un objeto o un arreglo')
+
+        reading = {key: value for key, value in sample.items() if key not in ('ts', 'dt')}
+        reading['nodo_id'] = node_id
+
+        if 'ts' in sample:
+            reading['fecha_hora'] = parse_timestamp(sample['ts'])
+        elif 'dt' in sample:
+            if base is None:
+                raise PayloadError("Las muestras con 'dt' requieren 'base_ts'")
+            try:
+                reading['fecha_hora'] = base + timedelta(seconds=sample['dt'])
+            except TypeError:
+                raise PayloadError(f"'dt' inválido: {sample['dt']!r}")
+        elif reading.get('fecha_hora') is not None:
+            reading['fecha_hora'] = parse_timestamp(reading['fecha_hora'])
+
+        # Con id a nivel de mensaje, cada muestra recibe un id derivado para la deduplicación
+        if message_id is not None and 'seq' not in reading and 'msg_id' not in reading:
+            reading['msg_id'] = f'{message_id}:{sample_index}'
+
+        readings.append(reading)
+
+    return readings
+
+def encode_binary(nodo_id, temperatura, humedad, co2, timestamp=0):
+    """Codifica una medición como trama binaria v1 (usado por pruebas y simuladores)"""
+    return FRAME_V1.pack(
+        BINARY_MAGIC,
+        BINARY_VERSION,
+        nodo_id,
+        int(timestamp),
+        int(round(temperatura * TEMP_SCALE)),
+        int(round(humedad * HUM_SCALE)),
+        int(round(co2 * CO2_SCALE))
+    )
+
+def encode_binary_multi(nodo_id, base_ts, samples):
+    """Codifica muestras [dt, temperatura, humedad, co2] como trama binaria v2"""
+    frame = bytearray(FRAME_V2_HEADER.pack(
+        BINARY_MAGIC, BINARY_VERSION_MULTI, nodo_id, int(base_ts), len(samples)
+    ))
+    for dt, temperatura, humedad, co2 in samples:
+        frame += FRAME_V2_SAMPLE.pack(
+            int(dt),
+            int(round(temperatura * TEMP_SCALE)),
+            int(round(humedad * HUM_SCALE)),
+            int(round(co2 * CO2_SCALE))
+        )
+    return bytes(frame)
@@ -0,0 +1,68 @@
+# backend/app/utils/series_format.py
+import json
+import struct
+import numpy as np
+from flask import Response, jsonify
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional: se usa json de la biblioteca estándar
+    orjson = None
+
+SERIES_FORMATS = ('rows', 'columnar', 'binary')
+SERIES_VARIABLES = ('temperatura', 'humedad', 'co2')
+
+# Cabecera binaria: magic, cantidad de puntos, cantidad de variables, reservado (16 bytes,
+# deja alineados los Float64Array/Float32Array que siguen)
+BINARY_MAGIC = b'MSR1'
+BINARY_HEADER = struct.Struct('<4sIII')
+BINARY_MIMETYPE = 'application/vnd.measurement-series'
+
+def to_columns(measurements, variables=SERIES_VARIABLES):
+    """Arreglos paralelos: t en milisegundos epoch (int64) y un float64 por variable"""
+    times = np.array([m['fecha_hora'] for m in measurements], dtype='datetime64[ms]')
+    columns = {'t': times.astype(np.int64)}
+    for var in variables:
+        columns[var] = np.array([m[var] for m in measurements], dtype=np.float64)
+    return columns
+
+def dumps(data):
+    """Serializa a JSON (bytes) con orjson si está instalado; NaN se emite como null"""
+    if orjson:
+        return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(data, default=_json_default).encode()
+
+def _json_default(value):
+    if isinstance(value, np.ndarray):
+        return [None if v != v else v for v in value.tolist()]
+    raise TypeError(f'{type(value).__name__} no es serializable')
+
+def pack_columns(columns, variables=SERIES_VARIABLES):
+    """Formato binario: cabecera, tiempos float64 y cada variable float32 (little-endian)"""
+    count = len(columns['t'])
+    parts = [BINARY_HEADER.pack(BINARY_MAGIC, count, len(variables), 0),
+             columns['t'].astype('<f8').tobytes()]
+    parts.extend(columns[var].astype('<f4').tobytes() for var in variables)
+    return b''.join(parts)
+
+def series_response(result, fmt='rows'):
+    """Respuesta HTTP de una serie histórica en el formato pedido
+
+    rows: JSON con un objeto por medición (formato original).
+    columnar: JSON con 'series' {t, temperatura, humedad, co2} en arreglos paralelos.
+    binary: solo la serie empaquetada; los metadatos viajan en cabeceras X-Series-*.
+    """
+    if fmt == 'columnar':
+        body = dict(result, series=to_columns(result['measurements']))
+        del body['measurements']
+        return Response(dumps(body), mimetype='application/json')
+
+    if fmt == 'binary':
+        response = Response(pack_columns(to_columns(result['measurements'])), mimetype=BINARY_MIMETYPE)
+        response.headers['X-Series-Columns'] = ','.join(SERIES_VARIABLES)
+        response.headers['X-Series-Resolution'] = result.get('resolucion') or ''
+        if result.get('next_cursor'):
+            response.headers['X-Series-Next-Cursor'] = result['next_cursor']
+        return response
+
+    return jsonify(result)
@@ -0,0 +1,79 @@
+# backend/app/utils/time_buckets.py
+import re
+from sqlalchemy import BigInteger, literal_column
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+
+# Anchos de intervalo admitidos por nombre (segundos)
+BUCKET_WIDTHS = {'1m': 60, '5m': 300, '15m': 900, '30m': 1800, '1h': 3600, '6h': 21600, '1d': 86400}
+
+_BUCKET_PATTERN = re.compile(r'^(\d+)([smhd])$')
+_UNIT_SECONDS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+def parse_bucket(value):
+    """Convierte '5m', '1h', '1d' o una cantidad de segundos en segundos (ValueError si es inválido)"""
+    if isinstance(value, int) and not isinstance(value, bool):
+        seconds = value
+    else:
+        match = _BUCKET_PATTERN.match(str(value).strip().lower())
+        if not match:
+            raise ValueError(f'Intervalo inválido: {value}')
+        seconds = int(match.group(1)) * _UNIT_SECONDS[match.group(2)]
+    if seconds <= 0:
+        raise ValueError(f'Intervalo inválido: {value}')
+    return seconds
+
+class epoch_seconds(FunctionElement):
+    """Segundos enteros desde 1970-01-01 de una columna DateTime (UTC sin zona)"""
+    type = BigInteger()
+    inherit_cache = True
+
+class epoch_bucket(FunctionElement):
+    """Inicio (en segundos epoch) del intervalo de N segundos que contiene la columna
+
+    Uso: epoch_bucket(Measurement.fecha_hora, 300). N se escribe como literal (forma parte
+    de la clave de caché) para que la misma expresión pueda repetirse en GROUP BY.
+    """
+    type = BigInteger()
+    inherit_cache = True
+
+    def __init__(self, column, seconds):
+        seconds = int(seconds)
+        if seconds <= 0:
+            raise ValueError(f'Intervalo inválido: {seconds}')
+        super().__init__(column, literal_column(str(seconds)))
+
+def _bucket_arguments(element, compiler, **kw):
+    column, seconds = element.clauses.clauses
+    return compiler.process(column, **kw), compiler.process(seconds, **kw)
+
+@compiles(epoch_seconds)
+def _epoch_seconds_default(element, compiler, **kw):
+    # PostgreSQL: EXTRACT(EPOCH) de un timestamp sin zona lo toma como UTC
+    return 'CAST(EXTRACT(EPOCH FROM %s) AS BIGINT)' % compiler.process(element.clauses, **kw)
+
+@compiles(epoch_seconds, 'sqlite')
+def _epoch_seconds_sqlite(element, compiler, **kw):
+    return "CAST(strftime('%%s', %s) AS INTEGER)" % compiler.process(element.clauses, **kw)
+
+@compiles(epoch_seconds, 'mysql')
+@compiles(epoch_seconds, 'mariadb')
+def _epoch_seconds_mysql(element, compiler, **kw):
+    # Sin UNIX_TIMESTAMP: aplicaría la zona horaria de la sesión a columnas DATETIME
+    return "TIMESTAMPDIFF(SECOND, '1970-01-01 00:00:00', %s)" % compiler.process(element.clauses, **kw)
+
+@compiles(epoch_bucket)
+def _epoch_bucket_default(element, compiler, **kw):
+    column, seconds = _bucket_arguments(element, compiler, **kw)
+    return 'CAST(FLOOR(EXTRACT(EPOCH FROM %s) / %s) AS BIGINT) * %s' % (column, seconds, seconds)
+
+@compiles(epoch_bucket, 'sqlite')
+def _epoch_bucket_sqlite(element, compiler, **kw):
+    column, seconds = _bucket_arguments(element, compiler, **kw)
+    return "(CAST(strftime('%%s', %s) AS INTEGER) / %s) * %s" % (column, seconds, seconds)
+
+@compiles(epoch_bucket, 'mysql')
+@compiles(epoch_bucket, 'mariadb')
+def _epoch_bucket_mysql(element, compiler, **kw):
+    column, seconds = _bucket_arguments(element, compiler, **kw)
+    return "(TIMESTAMPDIFF(SECOND, '1970-01-01 00:00:00', %s) DIV %s) * %s" % (column, seconds, seconds)
@@ -0,0 +1,143 @@
+# backend/app/utils/topics.py
+import re
+import zlib
+import struct
+from app.utils.payload_codec import BINARY_MAGIC
+
+# nodo_id de un payload JSON sin decodificarlo completo (solo para elegir partición)
+_JSON_NODE_ID = re.compile(rb'"nodo_id"\s*:\s*(\d+)')
+_BINARY_NODE_ID = struct.Struct('<I')
+
+class TopicRouter:
+    """Tópicos de suscripción, nodo_id tomado del tópico y partición de mensajes por nodo
+
+    node_topic usa '+' en la posición del nodo (p. ej. environmental/+/measurements).
+    Con shared_group las suscripciones se hacen como $share/<grupo>/<tópico> y el
+    broker reparte los mensajes entre las instancias del grupo: los de un mismo nodo
+    pueden llegar a instancias distintas y el orden solo se conserva dentro de cada una.
+    Con instance_count > 1 cada instancia se suscribe explícitamente a los tópicos de
+    sus nodos (nodo_id % instance_count == instance_index) y el tópico común queda en la
+    instancia 0: un nodo siempre llega a la misma instancia.
+    """
+
+    def __init__(self, topic='environmental/measurements', node_topic=None, binary_suffix='/bin',
+                 shared_group=None, instance_index=0, instance_count=1):
+        self.topic = topic
+        self.node_topic = node_topic
+        self.binary_suffix = binary_suffix
+        self.shared_group = shared_group
+        self.instance_index = instance_index
+        self.instance_count = max(instance_count, 1)
+        self._node_levels = node_topic.split('/') if node_topic else None
+        self._node_index = self._node_levels.index('+') if node_topic and '+' in self._node_levels else None
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            topic=config.get('MQTT_TOPIC', 'environmental/measurements'),
+            node_topic=config.get('MQTT_NODE_TOPIC'),
+            binary_suffix=config.get('MQTT_BINARY_TOPIC_SUFFIX', '/bin'),
+            shared_group=config.get('MQTT_SHARED_GROUP'),
+            instance_index=config.get('MQTT_INSTANCE_INDEX', 0),
+            instance_count=config.get('MQTT_INSTANCE_COUNT', 1)
+        )
+
+    @property
+    def partitioned(self):
+        """Si los nodos se reparten entre instancias con suscripciones por nodo"""
+        return self.instance_count > 1 and self._node_index is not None
+
+    def owns(self, node_id):
+        """Si el nodo corresponde a esta instancia"""
+        return node_id % self.instance_count == self.instance_index
+
+    def subscriptions(self):
+        """Filtros a suscribir (tópico común, tópico por nodo y sus variantes binarias)
+
+        Con reparto por instancia no incluye los tópicos por nodo (ver node_subscriptions).
+        """
+        if self.partitioned:
+            return self._with_binary([self.topic] if self.instance_index == 0 else [])
+        filters = self._with_binary([self.topic, self.node_topic])
+        if self.shared_group:
+            filters = [f'$share/{self.shared_group}/{f}' for f in filters]
+        return filters
+
+    def node_subscriptions(self, node_ids):
+        """Tópicos explícitos de los nodos de esta instancia (vacío sin reparto por instancia)"""
+        if not self.partitioned:
+            return []
+        topics = []
+        for node_id in sorted(node_ids):
+            if self.owns(node_id):
+                levels = list(self._node_levels)
+                levels[self._node_index] = str(node_id)
+                topics.append('/'.join(levels))
+        return self._with_binary(topics)
+
+    def _with_binary(self, topics):
+        filters = []
+        for topic in topics:
+            if not topic:
+                continue
+            filters.append(topic)
+            if self.binary_suffix:
+                filters.append(topic + self.binary_suffix)
+        return filters
+
+    def node_id(self, topic):
+        """nodo_id del tópico si coincide con node_topic (None en otro caso)"""
+        if self._node_index is None or not topic:
+            return None
+        if self.binary_suffix and topic.endswith(self.binary_suffix):
+            topic = topic[:-len(self.binary_suffix)]
+
+        levels = topic.split('/')
+        if len(levels) != len(self._node_levels):
+            return None
+        for index, (level, pattern) in enumerate(zip(levels, self._node_levels)):
+            if index != self._node_index and pattern != '+' and level != pattern:
+                return None
+        try:
+            return int(levels[self._node_index])
+        except ValueError:
+            return None
+
+    def routing_key(self, topic, payload):
+        """nodo_id para particionar: del tópico, del encabezado binario o del JSON"""
+        node_id = self.node_id(topic)
+        if node_id is not None:
+            return node_id
+        if len(payload) >= 6 and payload[0] == BINARY_MAGIC:
+            return _BINARY_NODE_ID.unpack_from(payload, 2)[0]
+        match = _JSON_NODE_ID.search(payload)
+        if match:
+            return int(match.group(1))
+        return None
+
+    def shard(self, topic, payload, shards):
+        """Partición de un mensaje: un mismo nodo siempre va a la misma partición"""
+        if shards <= 1:
+            return 0
+        key = self.routing_key(topic, payload)
+        if key is None:
+            return zlib.crc32(payload) % shards
+        return key % shards
+
+class NodeSubscriptions:
+    """Tópicos por nodo ya suscritos en la conexión actual (reparto por instancia)"""
+
+    def __init__(self, router, chunk_size=100):
+        self.router = router
+        self.chunk_size = chunk_size
+        self._subscribed = set()
+
+    def reset(self):
+        """Olvida las suscripciones (nueva conexión al broker)"""
+        self._subscribed.clear()
+
+    def pending(self, node_ids):
+        """Grupos de filtros aún no suscritos (se marcan como suscritos)"""
+        filters = [f for f in self.router.node_subscriptions(node_ids) if f not in self._subscribed]
+        self._subscribed.update(filters)
+        return [filters[i:i + self.chunk_size] for i in range(0, len(filters), self.chunk_size)]
@@ -1,5 +1,7 @@
 # backend/app/utils/validators.py
 import re
+from datetime import datetime
+from app.utils.metrics import metrics
 
 def validate_email(email):
     """Valida formato de email"""
@@ -22,3 +24,142 @@ def validate_password(password):
     
     return True, "Contraseña válida"
 
+MEASUREMENT_REQUIRED_FIELDS = ('nodo_id', 'temperatura', 'humedad', 'co2')
+
+# Rangos físicos aceptados (rango de operación de los sensores de los nodos)
+PHYSICAL_RANGES = {
+    'temperatura': (-40.0, 85.0),
+    'humedad': (0.0, 100.0),
+    'co2': (0.0, 10000.0)
+}
+
+REJECT_MESSAGES = {
+    'not_object': 'La medición debe ser un objeto',
+    'missing': 'Campo faltante',
+    'type': 'Tipo inválido',
+    'range': 'Fuera de rango físico o no finito',
+    'unknown': 'Campo desconocido'
+}
+
+_NUMBER_TYPES = (int, float)
+
+def _number_rule(minimum, maximum):
+    def check(value):
+        if type(value) not in _NUMBER_TYPES:
+            return 'type'
+        # NaN e infinito no cumplen la comparación encadenada
+        if not minimum <= value <= maximum:
+            return 'range'
+        return None
+    return check
+
+def _integer_rule(minimum, maximum):
+    def check(value):
+        if type(value) is not int:
+            return 'type'
+        if not minimum <= value <= maximum:
+            return 'range'
+        return None
+    return check
+
+def _timestamp_rule(value):
+    # Se interpreta después (parse_timestamp); aquí solo se descartan tipos imposibles
+    if type(value) in (str, int, float, datetime):
+        return None
+    return 'type'
+
+def _message_id_rule(value):
+    if type(value) is int or (type(value) is str and 0 < len(value) <= 128):
+        return None
+    return 'type'
+
+class MeasurementSchema:
+    """Esquema precompilado de mediciones: tipos, rangos y campos desconocidos en una sola pasada"""
+
+    def __init__(self, rules, required, allow_unknown=False):
+        self._rules = dict(rules)
+        self._required = tuple(required)
+        self.allow_unknown = allow_unknown
+
+    def validate(self, item):
+        """Retorna None si la medición es válida o la lista de errores {field, code, message}"""
+        if type(item) is not dict:
+            return [_error(None, 'not_object')]
+
+        errors = None
+        rules = self._rules
+        for field, value in item.items():
+            rule = rules.get(field)
+            if rule is None:
+                if self.allow_unknown:
+                    continue
+                code = 'unknown'
+            else:
+                code = rule(value)
+                if code is None:
+                    continue
+            errors = errors or []
+            errors.append(_error(field, code))
+
+        for field in self._required:
+            if field not in item:
+                errors = errors or []
+                errors.append(_error(field, 'missing'))
+
+        return errors
+
+def _error(field, code):
+    message = REJECT_MESSAGES[code]
+    if code == 'range' and field in PHYSICAL_RANGES:
+        minimum, maximum = PHYSICAL_RANGES[field]
+        message = f'{message} ({minimum:g} a {maximum:g})'
+    return {'field': field, 'code': code, 'message': message}
+
+measurement_schema = MeasurementSchema(
+    {
+        'nodo_id': _integer_rule(1, 2 ** 31 - 1),
+        'temperatura': _number_rule(*PHYSICAL_RANGES['temperatura']),
+        'humedad': _number_rule(*PHYSICAL_RANGES['humedad']),
+        'co2': _number_rule(*PHYSICAL_RANGES['co2']),
+        'fecha_hora': _timestamp_rule,
+        # Hora del dispositivo con el nombre del payload compacto (equivale a fecha_hora)
+        'ts': _timestamp_rule,
+        'seq': _integer_rule(0, 2 ** 63 - 1),
+        'msg_id': _message_id_rule
+    },
+    required=MEASUREMENT_REQUIRED_FIELDS
+)
+
+def format_validation_errors(errors):
+    """Resume los errores de validación en un texto"""
+    return '; '.join(
+        f"{e['field']}: {e['message']}" if e['field'] else e['message'] for e in errors
+    )
+
+def validate_measurement(item, schema=measurement_schema):
+    """Valida una medición; retorna None o la lista de errores (con contadores por código)"""
+    errors = schema.validate(item)
+    if errors:
+        metrics.inc('ingest.rejected')
+        for code in {e['code'] for e in errors}:
+            metrics.inc(f'ingest.rejected.{code}')
+    return errors
+
+def validate_measurement_batch(items, schema=measurement_schema):
+    """Valida un lote de mediciones en una pasada; retorna (válidas, rechazos)"""
+    valid = []
+    rejected = []
+    
+    for index, item in enumerate(items):
+        errors = validate_measurement(item, schema)
+        if errors:
+            rejected.append({
+                'index': index,
+                'status': 'error',
+                'error': format_validation_errors(errors),
+                'errors': errors
+            })
+            continue
+        valid.append((index, item))
+    
+    return valid, rejected
@@ -0,0 +1,57 @@
+# ==============================================
+# scripts/apply_retention.py - Retención por niveles de mediciones
+# ==============================================
+#!/usr/bin/env python3
+#"""
+#Aplica RETENTION_TIERS / RETENTION_NODE_TIERS: asegura los rollups de los días
+#crudos que vencen, elimina las mediciones crudas (particiones completas y luego
+#por lotes) y los rollups más antiguos que su retención. Programar en cron (diario).
+#Con --dry-run solo muestra los cortes que se aplicarían.
+#Uso: python scripts/apply_retention.py
+#     python scripts/apply_retention.py --dry-run
+#"""
+import sys
+import time
+import argparse
+from datetime import datetime
+sys.path.insert(0, '.')
+
+from app import create_app, db
+from app.models import Node
+from app.services.retention_service import RetentionPolicy, RetentionService, TIER_MODELS
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Aplica la retención por niveles de mediciones')
+    parser.add_argument('--dry-run', action='store_true', help='Muestra los cortes sin borrar nada')
+    parser.add_argument('--batch', type=int, help='Filas por lote del borrado de crudas')
+    parser.add_argument('--pause', type=float, help='Segundos entre lotes del borrado de crudas')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    app = create_app('development')
+    app.config['SQLALCHEMY_ECHO'] = False
+    now = datetime.utcnow()
+
+    with app.app_context():
+        if args.dry_run:
+            policy = RetentionPolicy.from_config(app.config)
+            for node in db.session.query(Node).order_by(Node.id).all():
+                cutoffs = []
+                for level in TIER_MODELS:
+                    cutoff = policy.cutoff(node.id, level, now)
+                    cutoffs.append(f"{level}<{cutoff:%Y-%m-%d}" if cutoff else f"{level}=∞")
+                print(f"  nodo {node.id:<6} {'  '.join(cutoffs)}")
+            return
+
+        started = time.perf_counter()
+        summary = RetentionService.apply_retention(now, batch_size=args.batch, pause=args.pause)
+        print(f"✓ Rollups recalculados antes de borrar: {summary['rebuilt_minutes']:,} minutos")
+        print(f"✓ Particiones eliminadas: {', '.join(summary['partitions_dropped']) or 'ninguna'}")
+        print(f"✓ {summary['raw_deleted']:,} mediciones crudas borradas")
+        for level, deleted in summary['rollups_deleted'].items():
+            print(f"✓ {deleted:,} filas del rollup {level} borradas")
+        print(f"  Total: {time.perf_counter() - started:.1f}s")
+
+if __name__ == '__main__':
+    main()
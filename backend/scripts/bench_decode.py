@@ -0,0 +1,64 @@
+# ==============================================
+# scripts/bench_decode.py - Benchmark de decodificación de payloads MQTT
+# ==============================================
+#!/usr/bin/env python3
+#"""
+#Compara el rendimiento y tamaño de la trama binaria v1 contra JSON.
+#Uso: python scripts/bench_decode.py [--messages N]
+#"""
+import sys
+import json
+import time
+import random
+import argparse
+sys.path.insert(0, '.')
+
+from app.utils.payload_codec import decode_payload, encode_binary
+
+def build_payloads(count):
+    """Genera los mismos mensajes en JSON y en binario"""
+    random.seed(7)
+    json_payloads = []
+    binary_payloads = []
+    for _ in range(count):
+        reading = {
+            'nodo_id': random.randint(1, 500),
+            'temperatura': round(random.uniform(15, 35), 2),
+            'humedad': round(random.uniform(20, 90), 2),
+            'co2': float(random.randint(350, 2000))
+        }
+        json_payloads.append(json.dumps(reading).encode())
+        binary_payloads.append(encode_binary(**reading, timestamp=int(time.time())))
+    return json_payloads, binary_payloads
+
+def bench(name, topic, payloads, rounds):
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for payload in payloads:
+            decode_payload(topic, payload)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    avg_size = sum(len(p) for p in payloads) / len(payloads)
+    rate = len(payloads) / best
+    print(f"{name:<10} {avg_size:>12.1f} {rate:>14,.0f} {best / len(payloads) * 1e6:>12.2f}")
+    return rate
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de decodificación de payloads')
+    parser.add_argument('--messages', type=int, default=200000)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    json_payloads, binary_payloads = build_payloads(args.messages)
+
+    print(f"Mensajes: {args.messages} (mejor de {args.rounds} rondas)")
+    print(f"{'formato':<10} {'bytes/msg':>12} {'msg/s':>14} {'us/msg':>12}")
+    json_rate = bench('json', 'environmental/measurements', json_payloads, args.rounds)
+    binary_rate = bench('binario', 'environmental/measurements/bin', binary_payloads, args.rounds)
+    print(f"\nBinario: {binary_rate / json_rate:.1f}x más rápido, "
+          f"{sum(map(len, json_payloads)) / sum(map(len, binary_payloads)):.1f}x menos bytes")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+# ==============================================
+# scripts/bench_ingest.py - Benchmark de commits y latencia de ingesta
+# ==============================================
+#!/usr/bin/env python3
+#"""
+#Compara la ruta de ingesta anterior (un commit por repositorio) con la
+#unidad de trabajo actual (un commit por medición o por lote).
+#Uso: python scripts/bench_ingest.py [--database-url URL] [--readings N]
+#     python scripts/bench_ingest.py --database-url mysql+pymysql://root:@localhost:3306/bench_db
+#"""
+import os
+import sys
+import math
+import time
+import random
+import argparse
+sys.path.insert(0, '.')
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark de ingesta de mediciones')
+    parser.add_argument('--database-url', default='sqlite:////tmp/bench_ingest.db')
+    parser.add_argument('--readings', type=int, default=2000)
+    parser.add_argument('--nodes', type=int, default=20)
+    parser.add_argument('--breach-ratio', type=float, default=0.2,
+                        help='Fracción de mediciones que superan algún umbral')
+    parser.add_argument('--batch-size', type=int, default=100)
+    return parser.parse_args()
+
+def percentile(values, percent):
+    values = sorted(values)
+    if not values:
+        return 0
+    index = max(0, math.ceil(len(values) * percent / 100) - 1)
+    return values[index]
+
+def make_reading(node_ids, breach_ratio):
+    breach = random.random() < breach_ratio
+    return {
+        'nodo_id': random.choice(node_ids),
+        'temperatura': random.uniform(30, 35) if breach else random.uniform(20, 25),
+        'humedad': random.uniform(40, 60),
+        'co2': random.uniform(1100, 1500) if breach else random.uniform(400, 800)
+    }
+
+def legacy_save(data):
+    """Ruta previa: commit de última conexión, de la medición y de cada alerta"""
+    from datetime import datetime
+    from app.extensions import db
+    from app.models import Node
+    from app.repositories import MeasurementRepository, AlertRepository, NodeRepository
+    from app.services.alert_service import AlertService
+
+    node = Node.query.get(data['nodo_id'])
+    node.ultima_conexion = datetime.utcnow()
+    db.session.commit()
+
+    measurement = MeasurementRepository.create(data)
+    for alert_data in AlertService._evaluate_thresholds(measurement, NodeRepository._load_metadata(node.id)):
+        AlertRepository.create(alert_data)
+    return measurement.to_dict()
+
+def run_mode(name, fn, readings, commit_counter):
+    from app.extensions import db
+    latencies = []
+    commit_counter['n'] = 0
+    start = time.perf_counter()
+    for item in readings:
+        t0 = time.perf_counter()
+        fn(item)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - start
+    db.session.remove()
+
+    total = sum(len(item) if isinstance(item, list) else 1 for item in readings)
+    print(f"{name:<28} {commit_counter['n'] / total:>10.2f} "
+          f"{percentile(latencies, 50):>10.2f} {percentile(latencies, 99):>10.2f} "
+          f"{total / elapsed:>12.1f}")
+
+def main():
+    args = parse_args()
+    os.environ['DATABASE_URL'] = args.database_url
+    if args.database_url.startswith('sqlite:////') and os.path.exists(args.database_url[10:]):
+        os.remove(args.database_url[10:])
+
+    from sqlalchemy import event
+    from app import create_app
+    from app.extensions import db
+    from app.models import Node, Sensor
+    from app.services import MeasurementService
+    from app.utils.last_seen import last_seen
+
+    app = create_app('production')
+    app.config['SQLALCHEMY_ECHO'] = False
+
+    with app.app_context():
+        db.create_all()
+        nodes = []
+        for i in range(args.nodes):
+            node = Node(ubicacion=f'Benchmark {i}')
+            db.session.add(node)
+            nodes.append(node)
+        db.session.flush()
+        for node in nodes:
+            db.session.add(Sensor(nodo_id=node.id, sensor='DHT22', variable='temp', umbral_min=18, umbral_max=26))
+            db.session.add(Sensor(nodo_id=node.id, sensor='MQ-135', variable='CO2', umbral_min=300, umbral_max=1000))
+        db.session.commit()
+        node_ids = [n.id for n in nodes]
+
+        commit_counter = {'n': 0}
+
+        @event.listens_for(db.engine, 'commit')
+        def count_commit(conn):
+            commit_counter['n'] += 1
+
+        random.seed(42)
+        readings = [make_reading(node_ids, args.breach_ratio) for _ in range(args.readings)]
+        batches = [readings[i:i + args.batch_size] for i in range(0, len(readings), args.batch_size)]
+
+        print(f"Base de datos: {db.engine.url.get_backend_name()} | mediciones: {args.readings} "
+              f"| nodos: {args.nodes} | umbral superado: {args.breach_ratio:.0%}")
+        print(f"{'modo':<28} {'commits/med':>10} {'p50 ms':>10} {'p99 ms':>10} {'med/s':>12}")
+        run_mode('legacy (commit por repo)', legacy_save, readings, commit_counter)
+        run_mode('unit of work (por medición)', MeasurementService.save_measurement, readings, commit_counter)
+        run_mode(f'save_batch (lote {args.batch_size})', MeasurementService.save_batch, batches, commit_counter)
+
+        # Las últimas conexiones se escriben diferidas: un commit por intervalo, no por medición
+        commit_counter['n'] = 0
+        last_seen.flush()
+        print(f"\nCommits del vaciado diferido de ultima_conexion: {commit_counter['n']}")
+        last_seen.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,335 @@
+# ==============================================
+# scripts/generate_history.py - Histórico sintético de alto volumen
+# ==============================================
+#!/usr/bin/env python3
+#"""
+#Genera meses de mediciones a intervalo fijo para cientos de nodos (cientos de
+#millones de filas si se pide) con executemany en fragmentos paralelos. Con la
+#misma semilla y parámetros el dataset es idéntico, sin importar la cantidad de
+#procesos.
+#Uso: python scripts/generate_history.py [--nodes N] [--days D] [--interval S]
+#     python scripts/generate_history.py --nodes 300 --days 90 --workers 8 \
+#         --database-url mysql+pymysql://root:@localhost:3306/bench_db --load-data
+#     python scripts/generate_history.py --manifest /tmp/history.json
+#Al terminar se calculan los rollups del rango generado (--skip-rollups para omitirlos).
+#"""
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import tempfile
+import multiprocessing
+from datetime import datetime, timedelta
+sys.path.insert(0, '.')
+
+import numpy as np
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Generador de histórico sintético de mediciones')
+    parser.add_argument('--database-url', default='sqlite:////tmp/history.db')
+    parser.add_argument('--nodes', type=int, default=300)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--interval', type=int, default=60, help='Segundos entre mediciones')
+    parser.add_argument('--start', default='2026-01-01', help='Fecha inicial (UTC, ISO 8601)')
+    parser.add_argument('--seed', type=int, default=2024)
+    parser.add_argument('--chunk-rows', type=int, default=100000,
+                        help='Filas aproximadas por fragmento (y por transacción)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--load-data', action='store_true',
+                        help='MySQL: carga cada fragmento con LOAD DATA LOCAL INFILE')
+    parser.add_argument('--manifest', help='Guarda la descripción del dataset en un archivo JSON')
+    parser.add_argument('--keep', action='store_true', help='No borrar una base SQLite existente')
+    parser.add_argument('--keep-indexes', action='store_true',
+                        help='No eliminar los índices secundarios durante la carga')
+    parser.add_argument('--skip-rollups', action='store_true',
+                        help='No calcular los rollups minuto/5 min/hora/día del rango generado')
+    return parser.parse_args()
+
+class ChunkSpec:
+    """Fragmento de trabajo: un nodo y un rango de posiciones de su serie temporal
+
+    Los fragmentos se alinean a bloques de un día y el ruido se siembra por bloque,
+    de modo que el dataset no depende del tamaño de fragmento ni de los procesos.
+    """
+
+    def __init__(self, ordinal, node_id, first, count):
+        self.ordinal = ordinal
+        self.node_id = node_id
+        self.first = first
+        self.count = count
+
+def block_points(interval):
+    return max(1, 86400 // interval)
+
+def build_specs(node_ids, total_points, chunk_rows, block):
+    points_per_chunk = max(block, chunk_rows // block * block)
+    specs = []
+    for ordinal, node_id in enumerate(node_ids):
+        for first in range(0, total_points, points_per_chunk):
+            specs.append(ChunkSpec(ordinal, node_id, first, min(points_per_chunk, total_points - first)))
+    return specs
+
+# Parámetros compartidos con los procesos (se fijan en init_worker)
+_settings = {}
+
+def init_worker(settings):
+    _settings.update(settings)
+    _settings['engine'] = None
+
+def node_profile(seed, ordinal):
+    """Perfil estable de un nodo: depende solo de la semilla y su posición"""
+    rng = np.random.default_rng([seed, ordinal])
+    return {
+        'temp': rng.uniform(19, 25),
+        'hum': rng.uniform(35, 65),
+        'co2': rng.uniform(420, 700),
+        'phase': rng.uniform(0, 2 * np.pi),
+        'weekly': rng.uniform(0.2, 1.0),
+        'occupancy': rng.uniform(100, 400)
+    }
+
+def generate_chunk(spec):
+    """Genera las filas de un fragmento con numpy (deterministas por nodo y fragmento)"""
+    seed = _settings['seed']
+    interval = _settings['interval']
+    start_epoch = _settings['start_epoch']
+    profile = node_profile(seed, spec.ordinal)
+    noise = block_noise(seed, spec, block_points(interval))
+
+    index = np.arange(spec.first, spec.first + spec.count, dtype=np.int64)
+    epoch = start_epoch + index * interval
+    day = 2 * np.pi * (epoch % 86400) / 86400
+    week = 2 * np.pi * (epoch % (7 * 86400)) / (7 * 86400)
+    hour = (epoch % 86400) // 3600
+    working = ((hour >= 8) & (hour < 19)).astype(np.float64)
+
+    temperatura = (profile['temp'] + 2.0 * np.sin(day - profile['phase'])
+                   + profile['weekly'] * np.sin(week) + 0.15 * noise[0])
+    humedad = (profile['hum'] - 6.0 * np.sin(day - profile['phase']) + 0.8 * noise[1])
+    co2 = (profile['co2'] + profile['occupancy'] * working * (0.6 + 0.4 * np.sin(day))
+           + 15 * noise[2])
+
+    # Picos ocasionales (puertas, equipos, salas llenas) para que haya alertas
+    spikes = noise[3] < 0.002
+    temperatura[spikes] += 5 + 5 * noise[4][spikes]
+    co2_spikes = (noise[3] > 0.997)
+    co2[co2_spikes] += 400 + 500 * noise[4][co2_spikes]
+
+    # Formato de texto de DateTime de SQLAlchemy (también válido para MySQL)
+    fechas = np.datetime_as_string(epoch.astype('datetime64[s]').astype('datetime64[us]'), unit='us')
+    fechas = np.char.replace(fechas, 'T', ' ')
+
+    return list(zip(
+        [spec.node_id] * spec.count,
+        fechas.tolist(),
+        np.round(temperatura, 2).tolist(),
+        np.round(np.clip(humedad, 0, 100), 2).tolist(),
+        np.round(np.clip(co2, 0, None), 1).tolist()
+    ))
+
+def block_noise(seed, spec, block):
+    """Ruido del fragmento: normal (3 series) y uniforme (2 series), sembrado por bloque"""
+    parts = []
+    position = spec.first
+    end = spec.first + spec.count
+    while position < end:
+        number = position // block
+        size = min(end, (number + 1) * block) - position
+        rng = np.random.default_rng([seed, spec.ordinal, number])
+        parts.append(np.vstack([rng.standard_normal((3, size)), rng.random((2, size))]))
+        position += size
+    return np.hstack(parts)
+
+def insert_sql(dialect_paramstyle, table):
+    marker = '?' if dialect_paramstyle == 'qmark' else '%s'
+    return (f'INSERT INTO {table} (nodo_id, fecha_hora, temperatura, humedad, co2) '
+            f'VALUES ({", ".join([marker] * 5)})')
+
+def write_rows(raw_connection, sql, rows):
+    cursor = raw_connection.cursor()
+    cursor.executemany(sql, rows)
+    cursor.close()
+    raw_connection.commit()
+
+def load_data_rows(raw_connection, table, rows):
+    """MySQL: vuelca el fragmento a CSV y lo carga con LOAD DATA LOCAL INFILE"""
+    with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, newline='') as f:
+        csv.writer(f).writerows(rows)
+        path = f.name
+    try:
+        cursor = raw_connection.cursor()
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE '{path}' INTO TABLE {table} "
+            f"FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' LINES TERMINATED BY '\\r\\n' "
+            f"(nodo_id, fecha_hora, temperatura, humedad, co2)"
+        )
+        cursor.close()
+        raw_connection.commit()
+    finally:
+        os.remove(path)
+
+def write_chunk(spec):
+    """Genera y escribe un fragmento desde un proceso con su propia conexión"""
+    from sqlalchemy import create_engine
+
+    if _settings['engine'] is None:
+        connect_args = {'local_infile': True} if _settings['load_data'] else {}
+        _settings['engine'] = create_engine(_settings['database_url'], connect_args=connect_args)
+        _settings['raw'] = _settings['engine'].raw_connection()
+
+    rows = generate_chunk(spec)
+    if _settings['load_data']:
+        load_data_rows(_settings['raw'], _settings['table'], rows)
+    else:
+        write_rows(_settings['raw'], _settings['sql'], rows)
+    return len(rows)
+
+def ensure_nodes(db, count):
+    """Crea los nodos del dataset con sensores y umbrales; retorna sus ids en orden"""
+    from app.models import Node, Sensor
+
+    nodes = Node.query.filter(Node.ubicacion.like('Histórico %')).order_by(Node.id).all()
+    for i in range(len(nodes), count):
+        node = Node(ubicacion=f'Histórico {i}', velocidad_datos=60)
+        db.session.add(node)
+        nodes.append(node)
+    db.session.flush()
+    for node in nodes[:count]:
+        if node.sensores.count() == 0:
+            db.session.add(Sensor(nodo_id=node.id, sensor='DHT22', variable='temp', umbral_min=18, umbral_max=26))
+            db.session.add(Sensor(nodo_id=node.id, sensor='DHT22', variable='hum', umbral_min=30, umbral_max=70))
+            db.session.add(Sensor(nodo_id=node.id, sensor='MQ-135', variable='CO2', umbral_min=300, umbral_max=1000))
+    db.session.commit()
+    return [node.id for node in nodes[:count]]
+
+def drop_indexes(engine, table):
+    """Elimina los índices secundarios antes de la carga; retorna los que se eliminaron"""
+    dropped = []
+    for index in sorted(table.indexes, key=lambda i: i.name):
+        try:
+            index.drop(bind=engine)
+            dropped.append(index)
+        except Exception as e:
+            # MySQL conserva los índices que necesita una clave foránea
+            print(f"Se conserva el índice {index.name}: {e.__class__.__name__}")
+    return dropped
+
+def create_indexes(engine, indexes):
+    for index in indexes:
+        started = time.perf_counter()
+        index.create(bind=engine)
+        print(f"  índice {index.name} recreado en {time.perf_counter() - started:.1f}s")
+
+def report_progress(done, total, started):
+    elapsed = time.perf_counter() - started
+    rate = done / elapsed if elapsed else 0
+    print(f"\r  {done:>13,} / {total:,} filas | {rate:>11,.0f} filas/s | {elapsed:>7.1f}s", end='', flush=True)
+
+def main():
+    args = parse_args()
+    os.environ['DATABASE_URL'] = args.database_url
+    is_sqlite = args.database_url.startswith('sqlite')
+    if is_sqlite and not args.keep and args.database_url.startswith('sqlite:////') \
+            and os.path.exists(args.database_url[10:]):
+        os.remove(args.database_url[10:])
+
+    from app import create_app
+    from app.extensions import db
+    from app.models import Measurement
+
+    app = create_app('production')
+    app.config['SQLALCHEMY_ECHO'] = False
+
+    start = datetime.fromisoformat(args.start)
+    total_points = args.days * 86400 // args.interval
+    table = Measurement.__tablename__
+
+    with app.app_context():
+        node_ids = ensure_nodes(db, args.nodes)
+        paramstyle = db.engine.dialect.paramstyle
+        backend = db.engine.url.get_backend_name()
+        # Mantener los índices fila a fila es lo más costoso: se reconstruyen al final
+        dropped = [] if args.keep_indexes else drop_indexes(db.engine, Measurement.__table__)
+        # Los procesos hijos abren sus propias conexiones
+        db.engine.dispose()
+
+    if args.load_data and backend not in ('mysql', 'mariadb'):
+        print(f"LOAD DATA solo está disponible en MySQL; se usará executemany en {backend}")
+        args.load_data = False
+
+    specs = build_specs(node_ids, total_points, args.chunk_rows, block_points(args.interval))
+    total_rows = total_points * len(node_ids)
+    settings = {
+        'seed': args.seed,
+        'interval': args.interval,
+        'start_epoch': int((start - datetime(1970, 1, 1)).total_seconds()),
+        'database_url': args.database_url,
+        'table': table,
+        'sql': insert_sql(paramstyle, table),
+        'load_data': args.load_data
+    }
+
+    print(f"Base de datos: {backend} | nodos: {len(node_ids)} | días: {args.days} "
+          f"| intervalo: {args.interval}s | filas: {total_rows:,} | fragmentos: {len(specs)} "
+          f"| procesos: {args.workers}")
+
+    started = time.perf_counter()
+    done = 0
+    context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn')
+
+    with context.Pool(args.workers, initializer=init_worker, initargs=(settings,)) as pool:
+        if is_sqlite:
+            # SQLite admite un solo escritor: los procesos generan y el principal inserta
+            with app.app_context():
+                raw = db.engine.raw_connection()
+                cursor = raw.cursor()
+                cursor.execute('PRAGMA synchronous=OFF')
+                cursor.execute('PRAGMA journal_mode=MEMORY')
+                cursor.close()
+                for rows in pool.imap(generate_chunk, specs, chunksize=1):
+                    write_rows(raw, settings['sql'], rows)
+                    done += len(rows)
+                    report_progress(done, total_rows, started)
+                raw.close()
+        else:
+            for count in pool.imap_unordered(write_chunk, specs, chunksize=1):
+                done += count
+                report_progress(done, total_rows, started)
+
+    print()
+    if dropped:
+        with app.app_context():
+            create_indexes(db.engine, dropped)
+            db.engine.dispose()
+
+    elapsed = time.perf_counter() - started
+    print(f"\n{done:,} filas en {elapsed:.1f}s ({done / elapsed:,.0f} filas/s)")
+
+    if not args.skip_rollups:
+        from app.repositories import RollupRepository
+
+        rollup_started = time.perf_counter()
+        end = start + timedelta(seconds=total_points * args.interval)
+        with app.app_context():
+            minutes = RollupRepository.rebuild(start, end, node_ids)
+        print(f"Rollups: {minutes:,} minutos en {time.perf_counter() - rollup_started:.1f}s")
+
+    if args.manifest:
+        manifest = {
+            'database': backend,
+            'seed': args.seed,
+            'nodes': node_ids,
+            'start': start.isoformat(),
+            'end': (start + timedelta(seconds=total_points * args.interval)).isoformat(),
+            'interval_s': args.interval,
+            'rows': done,
+            'generated_in_s': round(elapsed, 1)
+        }
+        with open(args.manifest, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        print(f"Manifiesto guardado en {args.manifest}")
+
+if __name__ == '__main__':
+    main()
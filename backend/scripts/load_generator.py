@@ -0,0 +1,369 @@
+# ==============================================
+# scripts/load_generator.py - Generador de carga con una flota de nodos simulados
+# ==============================================
+#!/usr/bin/env python3
+#"""
+#Simula N nodos ESP32 que publican a su velocidad_datos (con deriva, ciclo diario
+#y picos) y mide cuánto sostiene la ingesta: msg/s, latencia extremo a extremo,
+#commits en la base de datos y alertas creadas.
+#Uso: python scripts/load_generator.py [--nodes N] [--duration S] [--speedup X]
+#     python scripts/load_generator.py --transport http --concurrency 8
+#     python scripts/load_generator.py --transport http --url http://localhost:5000
+#     python scripts/load_generator.py --database-url mysql+pymysql://root:@localhost:3306/bench_db
+#"""
+import os
+import sys
+import json
+import math
+import time
+import heapq
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+sys.path.insert(0, '.')
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Generador de carga de nodos IoT simulados')
+    parser.add_argument('--database-url', default='sqlite:////tmp/load_generator.db')
+    parser.add_argument('--transport', choices=('mqtt', 'http'), default='mqtt',
+                        help='mqtt: broker en proceso hacia la cola y los workers; http: /api/iot/measurement')
+    parser.add_argument('--url', help='URL base de un servidor en ejecución (solo http; por defecto en proceso)')
+    parser.add_argument('--nodes', type=int, default=200)
+    parser.add_argument('--intervals', default='5,10,30,60',
+                        help='Valores de velocidad_datos (segundos) asignados a los nodos')
+    parser.add_argument('--speedup', type=float, default=10.0,
+                        help='Factor de aceleración del reloj de los nodos')
+    parser.add_argument('--duration', type=float, default=30.0, help='Segundos de publicación')
+    parser.add_argument('--spike-rate', type=float, default=0.01,
+                        help='Probabilidad de pico por muestra')
+    parser.add_argument('--concurrency', type=int, default=8, help='Clientes HTTP concurrentes')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', dest='json_path', help='Guarda el resultado en un archivo JSON')
+    return parser.parse_args()
+
+def percentile(values, percent):
+    values = sorted(values)
+    if not values:
+        return 0
+    index = max(0, math.ceil(len(values) * percent / 100) - 1)
+    return values[index]
+
+class VirtualNode:
+    """Nodo ESP32 simulado: deriva lenta con reversión a la media, ciclo diario y picos"""
+
+    def __init__(self, node_id, interval, rng, spike_rate, seq_base):
+        self.node_id = node_id
+        self.interval = interval
+        self.rng = rng
+        self.spike_rate = spike_rate
+        self.seq = seq_base
+        self.temp_base = rng.uniform(19, 24)
+        self.hum_base = rng.uniform(40, 60)
+        self.co2_base = rng.uniform(420, 650)
+        self.temp = self.temp_base
+        self.hum = self.hum_base
+        self.co2 = self.co2_base
+
+    def sample(self, now):
+        rng = self.rng
+        self.temp += rng.gauss(0, 0.05) + 0.02 * (self.temp_base - self.temp)
+        self.hum += rng.gauss(0, 0.2) + 0.02 * (self.hum_base - self.hum)
+        self.co2 += rng.gauss(0, 4) + 0.05 * (self.co2_base - self.co2)
+
+        diurnal = math.sin(2 * math.pi * (now % 86400) / 86400)
+        temperatura = self.temp + 1.5 * diurnal
+        humedad = self.hum - 4 * diurnal
+        co2 = self.co2
+
+        # Picos: puerta abierta, equipo encendido, sala llena
+        if rng.random() < self.spike_rate:
+            kind = rng.choice(('temp', 'co2'))
+            if kind == 'temp':
+                temperatura += rng.uniform(6, 10)
+            else:
+                co2 += rng.uniform(500, 900)
+
+        self.seq += 1
+        return {
+            'temperatura': round(temperatura, 2),
+            'humedad': round(min(max(humedad, 0), 100), 2),
+            'co2': round(max(co2, 0), 1),
+            'seq': self.seq
+        }
+
+class InProcessBroker:
+    """Sustituto del broker MQTT: entrega lo publicado por la misma ruta que MQTTService.on_message"""
+
+    def __init__(self, app):
+        from app.services.ingest_queue import IngestQueue
+        from app.services.ingest_workers import IngestWorkerPool
+        from app.utils.topics import TopicRouter
+
+        workers = app.config.get('INGEST_WORKERS', 4)
+        self.router = TopicRouter.from_config(app.config)
+        self.topic_pattern = app.config.get('MQTT_NODE_TOPIC', 'environmental/+/measurements')
+        self.queue = IngestQueue(
+            maxsize=app.config.get('INGEST_QUEUE_SIZE', 10000),
+            policy='block',
+            block_timeout=app.config.get('INGEST_QUEUE_BLOCK_TIMEOUT', 5.0),
+            shards=workers
+        )
+        self.workers = IngestWorkerPool(
+            app,
+            self.queue,
+            size=workers,
+            batch_size=app.config.get('INGEST_BATCH_SIZE', 100),
+            batch_interval=app.config.get('INGEST_BATCH_INTERVAL', 1.0)
+        )
+
+    def start(self):
+        self.workers.start()
+
+    def send(self, node_id, reading):
+        from app.services.ingest_queue import make_message
+
+        topic = self.topic_pattern.replace('+', str(node_id))
+        payload = json.dumps(reading).encode()
+        shard = self.router.shard(topic, payload, self.queue.shards)
+        self.queue.put(make_message(topic, payload), shard=shard)
+
+    def drain(self, timeout):
+        """Espera a que la cola se vacíe y detiene los workers (vacían sus lotes)"""
+        deadline = time.monotonic() + timeout
+        while len(self.queue) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.workers.stop()
+
+class HttpTransport:
+    """POST /api/iot/measurement con clientes concurrentes (en proceso o contra --url)"""
+
+    def __init__(self, app, url, concurrency, stats):
+        self.app = app
+        self.url = url.rstrip('/') if url else None
+        self.stats = stats
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.in_flight = threading.Semaphore(concurrency * 4)
+        self.local = threading.local()
+
+    def start(self):
+        pass
+
+    def _client(self):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            if self.url:
+                import requests
+                client = requests.Session()
+            else:
+                client = self.app.test_client()
+            self.local.client = client
+        return client
+
+    def send(self, node_id, reading):
+        reading = dict(reading, nodo_id=node_id)
+        self.in_flight.acquire()
+        self.executor.submit(self._post, reading, time.perf_counter())
+
+    def _post(self, reading, sent_at):
+        try:
+            client = self._client()
+            if self.url:
+                status = client.post(f'{self.url}/api/iot/measurement', json=reading, timeout=30).status_code
+            else:
+                status = client.post('/api/iot/measurement', json=reading).status_code
+            self.stats.record(sent_at, status in (200, 201), time.perf_counter())
+        except Exception as e:
+            self.stats.record(sent_at, False, time.perf_counter())
+            print(f"Error HTTP: {e}")
+        finally:
+            self.in_flight.release()
+
+    def drain(self, timeout):
+        self.executor.shutdown(wait=True)
+
+class Stats:
+    """Acumula latencias extremo a extremo y mediciones aceptadas"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.accepted = 0
+        self.rejected = 0
+        self.last_ack = None
+
+    def record(self, sent_at, ok, acked_at):
+        with self.lock:
+            if ok:
+                self.accepted += 1
+                self.latencies.append((acked_at - sent_at) * 1000)
+            else:
+                self.rejected += 1
+            self.last_ack = acked_at
+
+def track_batches(stats, sent_times):
+    """Mide la latencia de la ruta MQTT en el commit de cada lote (hora de envío por (nodo, seq))"""
+    from app.services.measurement_service import MeasurementService
+
+    original = MeasurementService.save_batch
+
+    def save_batch(payloads):
+        results = original(payloads)
+        acked_at = time.perf_counter()
+        for data, result in zip(payloads, results):
+            sent_at = sent_times.pop((data.get('nodo_id'), data.get('seq')), acked_at)
+            stats.record(sent_at, result['status'] in ('ok', 'duplicate'), acked_at)
+        return results
+
+    MeasurementService.save_batch = staticmethod(save_batch)
+
+def create_fleet(args, db):
+    """Crea los nodos simulados con sensores y umbrales"""
+    from app.models import Node, Sensor
+
+    rng = random.Random(args.seed)
+    intervals = [int(v) for v in args.intervals.split(',')]
+    nodes = []
+    for i in range(args.nodes):
+        node = Node(ubicacion=f'Carga {i}', velocidad_datos=rng.choice(intervals))
+        db.session.add(node)
+        nodes.append(node)
+    db.session.flush()
+    for node in nodes:
+        db.session.add(Sensor(nodo_id=node.id, sensor='DHT22', variable='temp', umbral_min=18, umbral_max=26))
+        db.session.add(Sensor(nodo_id=node.id, sensor='DHT22', variable='hum', umbral_min=30, umbral_max=70))
+        db.session.add(Sensor(nodo_id=node.id, sensor='MQ-135', variable='CO2', umbral_min=300, umbral_max=1000))
+    db.session.commit()
+
+    seq_base = int(time.time()) << 20
+    return [
+        VirtualNode(node.id, node.velocidad_datos / args.speedup, random.Random(args.seed + node.id),
+                    args.spike_rate, seq_base)
+        for node in nodes
+    ]
+
+def publish(fleet, transport, duration, sent_times=None):
+    """Publica cada nodo a su intervalo hasta agotar la duración; retorna (publicados, atraso máx.)"""
+    rng = random.Random(0)
+    start = time.perf_counter()
+    schedule = [(start + rng.uniform(0, node.interval), index) for index, node in enumerate(fleet)]
+    heapq.heapify(schedule)
+    published = 0
+    max_lag = 0.0
+    end = start + duration
+
+    while schedule:
+        due, index = heapq.heappop(schedule)
+        if due >= end:
+            break
+        now = time.perf_counter()
+        if due > now:
+            time.sleep(due - now)
+        else:
+            max_lag = max(max_lag, now - due)
+
+        node = fleet[index]
+        reading = node.sample(time.time())
+        if sent_times is not None:
+            sent_times[(node.node_id, reading['seq'])] = time.perf_counter()
+        transport.send(node.node_id, reading)
+        published += 1
+        heapq.heappush(schedule, (due + node.interval, index))
+
+    return published, max_lag
+
+def main():
+    args = parse_args()
+    os.environ['DATABASE_URL'] = args.database_url
+    if args.database_url.startswith('sqlite:////') and os.path.exists(args.database_url[10:]):
+        os.remove(args.database_url[10:])
+
+    from sqlalchemy import event
+    from app import create_app
+    from app.extensions import db
+    from app.models import Alert
+    from app.utils.metrics import metrics
+    from app.utils.last_seen import last_seen
+
+    app = create_app('production')
+    app.config['SQLALCHEMY_ECHO'] = False
+
+    with app.app_context():
+        fleet = create_fleet(args, db)
+        alerts_before = Alert.query.count()
+
+        commits = {'n': 0}
+
+        @event.listens_for(db.engine, 'commit')
+        def count_commit(conn):
+            commits['n'] += 1
+
+        stats = Stats()
+        sent_times = None
+        if args.transport == 'mqtt':
+            sent_times = {}
+            track_batches(stats, sent_times)
+            transport = InProcessBroker(app)
+        else:
+            transport = HttpTransport(app, args.url, args.concurrency, stats)
+
+        target_rate = sum(1 / node.interval for node in fleet)
+        print(f"Base de datos: {db.engine.url.get_backend_name()} | transporte: {args.transport} "
+              f"| nodos: {args.nodes} | aceleración: {args.speedup}x "
+              f"| tasa objetivo: {target_rate:,.1f} msg/s | duración: {args.duration}s")
+
+        transport.start()
+        start = time.perf_counter()
+        published, max_lag = publish(fleet, transport, args.duration, sent_times)
+        publish_elapsed = time.perf_counter() - start
+        transport.drain(timeout=60)
+        last_seen.flush()
+        elapsed = (stats.last_ack or time.perf_counter()) - start
+
+        alerts = Alert.query.count() - alerts_before
+        result = {
+            'transport': args.transport,
+            'database': db.engine.url.get_backend_name(),
+            'nodes': args.nodes,
+            'duration_s': round(publish_elapsed, 2),
+            'target_rate': round(target_rate, 1),
+            'published': published,
+            'publish_rate': round(published / publish_elapsed, 1),
+            'max_schedule_lag_ms': round(max_lag * 1000, 1),
+            'accepted': stats.accepted,
+            'rejected': stats.rejected,
+            'sustained_rate': round(stats.accepted / elapsed, 1) if elapsed > 0 else 0,
+            'latency_ms': {
+                'p50': round(percentile(stats.latencies, 50), 2),
+                'p95': round(percentile(stats.latencies, 95), 2),
+                'p99': round(percentile(stats.latencies, 99), 2),
+                'max': round(max(stats.latencies, default=0), 2)
+            },
+            'db_commits': commits['n'],
+            'commits_per_message': round(commits['n'] / max(stats.accepted, 1), 3),
+            'alerts': alerts,
+            'alerts_per_s': round(alerts / elapsed, 2) if elapsed > 0 else 0,
+            'queue_full': metrics.get_counter('ingest.queue_full'),
+            'queue_dropped': metrics.get_counter('ingest.queue_dropped')
+        }
+        last_seen.stop()
+
+    latency = result['latency_ms']
+    print(f"\nPublicados:            {published} ({result['publish_rate']:,.1f} msg/s, "
+          f"atraso máx. {result['max_schedule_lag_ms']} ms)")
+    print(f"Aceptados:             {stats.accepted} (rechazados: {stats.rejected})")
+    print(f"Sostenido:             {result['sustained_rate']:,.1f} msg/s")
+    print(f"Latencia extremo a extremo (ms): p50 {latency['p50']} | p95 {latency['p95']} "
+          f"| p99 {latency['p99']} | máx {latency['max']}")
+    print(f"Commits:               {result['db_commits']} ({result['commits_per_message']} por mensaje)")
+    print(f"Alertas creadas:       {alerts} ({result['alerts_per_s']}/s)")
+    if args.transport == 'mqtt':
+        print(f"Cola llena / descartados: {result['queue_full']} / {result['queue_dropped']}")
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResultado guardado en {args.json_path}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+# ==============================================
+# scripts/manage_partitions.py - Particiones y retención de mediciones
+# ==============================================
+#!/usr/bin/env python3
+#"""
+#Administra el particionado por rango de fecha_hora de la tabla mediciones
+#(MySQL/PostgreSQL; mensual o semanal según MEASUREMENT_PARTITION_INTERVAL).
+#  status   lista las particiones
+#  convert  particiona la tabla existente (una vez, en ventana de mantenimiento)
+#  create   crea las particiones de los próximos N intervalos (programar en cron)
+#  purge    aplica la retención: elimina particiones completas y borra el resto
+#           en lotes (en SQLite o sin particiones, solo borrado por lotes)
+#Con la tabla particionada la clave única pasa a ser (nodo_id, secuencia, fecha_hora):
+#la base ya no rechaza una secuencia repetida con otra fecha (p. ej. una retransmisión sin
+#'ts' que recibe la hora del servidor). Esas repeticiones las descarta la ingesta con una
+#consulta previa de claves (nodo_id, secuencia) existentes, en todos los motores y tanto
+#por lotes como por lectura individual.
+#Uso: python scripts/manage_partitions.py status
+#     python scripts/manage_partitions.py convert
+#     python scripts/manage_partitions.py create [--ahead 3]
+#     python scripts/manage_partitions.py purge [--days 90] [--detach]
+#"""
+import sys
+import time
+import argparse
+from datetime import datetime, timedelta
+sys.path.insert(0, '.')
+
+from app import create_app, db
+from app.repositories import MeasurementRepository, get_partition_manager
+from app.repositories.partition_manager import next_partition_start, partition_start
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Particiones y retención de la tabla mediciones')
+    parser.add_argument('command', choices=('status', 'convert', 'create', 'purge'))
+    parser.add_argument('--ahead', type=int, help='Intervalos futuros a crear (create/convert)')
+    parser.add_argument('--days', type=int, help='Días de mediciones crudas a conservar (purge)')
+    parser.add_argument('--detach', action='store_true',
+                        help='purge: conserva las particiones vencidas como tablas independientes')
+    parser.add_argument('--batch', type=int, help='Filas por lote del borrado (purge)')
+    parser.add_argument('--pause', type=float, help='Segundos entre lotes del borrado (purge)')
+    return parser.parse_args()
+
+def horizon(interval, ahead):
+    """Fecha que deben cubrir las particiones: ahead intervalos después del actual"""
+    until = partition_start(datetime.utcnow(), interval)
+    for _ in range(ahead):
+        until = next_partition_start(until, interval)
+    return until
+
+def main():
+    args = parse_args()
+    app = create_app('development')
+    app.config['SQLALCHEMY_ECHO'] = False
+    interval = app.config['MEASUREMENT_PARTITION_INTERVAL']
+    ahead = args.ahead if args.ahead is not None else app.config['MEASUREMENT_PARTITIONS_AHEAD']
+
+    with app.app_context():
+        manager = get_partition_manager(db.engine, interval)
+        partitioned = manager.supported and manager.is_partitioned()
+
+        if args.command == 'status':
+            if not partitioned:
+                print(f"mediciones no está particionada ({db.engine.dialect.name})")
+                return
+            for name, upper in manager.partitions():
+                print(f"  {name:<24} < {upper if upper else 'MAXVALUE/DEFAULT'}")
+
+        elif args.command == 'convert':
+            if not manager.supported:
+                sys.exit(f"{db.engine.dialect.name} no admite particionado; purge usa borrado por lotes")
+            started = time.perf_counter()
+            if manager.convert(horizon(interval, ahead)):
+                print(f"✓ mediciones particionada por {interval} en {time.perf_counter() - started:.1f}s")
+            else:
+                print("✓ mediciones ya estaba particionada")
+
+        elif args.command == 'create':
+            if not partitioned:
+                sys.exit("mediciones no está particionada (ejecutar convert)")
+            created = manager.ensure_partitions(horizon(interval, ahead))
+            print(f"✓ Particiones creadas: {', '.join(created) if created else 'ninguna (ya existen)'}")
+
+        elif args.command == 'purge':
+            days = args.days if args.days is not None else app.config['MEASUREMENT_RETENTION_DAYS']
+            cutoff = datetime.utcnow() - timedelta(days=days)
+            started = time.perf_counter()
+            if partitioned:
+                dropped = manager.drop_partitions(cutoff, detach=args.detach)
+                action = 'desvinculadas' if args.detach else 'eliminadas'
+                print(f"✓ Particiones {action}: {', '.join(dropped) if dropped else 'ninguna'}")
+            deleted = MeasurementRepository.delete_before(
+                cutoff,
+                batch_size=args.batch or app.config['RETENTION_DELETE_BATCH'],
+                pause=args.pause if args.pause is not None else app.config['RETENTION_DELETE_PAUSE']
+            )
+            print(f"✓ {deleted:,} mediciones anteriores a {cutoff:%Y-%m-%d %H:%M} borradas por lotes "
+                  f"en {time.perf_counter() - started:.1f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+# ==============================================
+# scripts/rebuild_rollups.py - Rollups minuto/5 min/hora/día de mediciones
+# ==============================================
+#!/usr/bin/env python3
+#"""
+#Sin opciones incorpora los minutos pendientes a los rollups (lo que hace el
+#compactador del proceso de ingesta, útil desde cron cuando no corre el gateway:
+#  * * * * * cd /app && python scripts/rebuild_rollups.py
+#). Con --watch queda compactando cada ROLLUP_COMPACT_INTERVAL segundos como
+#proceso independiente. Con --days o --start/--end
+#recalcula los rollups desde las mediciones crudas: necesario una vez sobre bases
+#con histórico previo a los rollups o cargado fuera de la ruta de ingesta.
+#Uso: python scripts/rebuild_rollups.py
+#     python scripts/rebuild_rollups.py --watch
+#     python scripts/rebuild_rollups.py --days 90 [--node 1 --node 2]
+#     python scripts/rebuild_rollups.py --start 2026-01-01 --end 2026-02-01
+#"""
+import sys
+import time
+import argparse
+from datetime import datetime, timedelta
+sys.path.insert(0, '.')
+
+from app import create_app
+from app.repositories import RollupRepository
+from app.services.rollup_compactor import RollupCompactor
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Compacta o recalcula los rollups de mediciones')
+    parser.add_argument('--days', type=int, help='Recalcula los últimos N días')
+    parser.add_argument('--start', help='Inicio del recálculo (UTC, ISO 8601)')
+    parser.add_argument('--end', help='Fin del recálculo (UTC, ISO 8601; por defecto ahora)')
+    parser.add_argument('--node', type=int, action='append', dest='nodes', help='Limita a un nodo (repetible)')
+    parser.add_argument('--batch', type=int, default=5000, help='Minutos pendientes por transacción')
+    parser.add_argument('--watch', action='store_true', help='Compacta periódicamente hasta Ctrl+C')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    app = create_app('development')
+    app.config['SQLALCHEMY_ECHO'] = False
+    started = time.perf_counter()
+
+    with app.app_context():
+        if args.days or args.start:
+            end = datetime.fromisoformat(args.end) if args.end else datetime.utcnow()
+            start = datetime.fromisoformat(args.start) if args.start else end - timedelta(days=args.days)
+            minutes = RollupRepository.rebuild(start, end, args.nodes)
+            print(f"✓ Rollups recalculados {start.date()} - {end.date()}: {minutes:,} minutos "
+                  f"en {time.perf_counter() - started:.1f}s")
+        elif args.watch:
+            interval = app.config.get('ROLLUP_COMPACT_INTERVAL') or 30
+            compactor = RollupCompactor(app, interval=interval, batch=args.batch)
+            print(f"Compactando rollups cada {interval:g}s (Ctrl+C para detener)")
+            compactor.start()
+            try:
+                while compactor._thread.is_alive():
+                    compactor._thread.join(1)
+            except KeyboardInterrupt:
+                compactor.stop()
+        else:
+            processed = RollupCompactor(app, batch=args.batch).run_once()
+            print(f"✓ {processed:,} minutos pendientes compactados en {time.perf_counter() - started:.1f}s")
+
+if __name__ == '__main__':
+    main()
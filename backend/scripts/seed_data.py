@@ -14,6 +14,7 @@ from datetime import datetime, timedelta
 import random
 from app import create_app, db
 from app.models import User, Node, Sensor, Measurement
+from app.repositories import RollupRepository
 
 def seed_database():
     """Inserta datos de prueba"""
@@ -121,6 +122,7 @@ def seed_database():
                 db.session.add(measurement)
         
         db.session.commit()
+        RollupRepository.rebuild(datetime.utcnow() - timedelta(hours=24), datetime.utcnow())
         print("✓ Mediciones de prueba creadas")
         
         print("\n=== RESUMEN ===")
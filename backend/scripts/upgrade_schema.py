@@ -0,0 +1,55 @@
+# ==============================================
+# scripts/upgrade_schema.py - Actualiza columnas e índices de tablas existentes
+# ==============================================
+#!/usr/bin/env python3
+#"""
+#db.create_all() crea tablas nuevas pero no agrega columnas a tablas existentes.
+#Este script aplica de forma idempotente los cambios de esquema posteriores.
+#Uso: python scripts/upgrade_schema.py
+#"""
+import sys
+sys.path.insert(0, '.')
+
+from sqlalchemy import inspect, text
+from app import create_app, db
+
+# (tabla, columna, DDL de la columna)
+COLUMNS = [
+    ('mediciones', 'secuencia', 'BIGINT NULL'),
+]
+
+# (tabla, nombre, columnas) de restricciones únicas
+UNIQUE_CONSTRAINTS = [
+    ('mediciones', 'uq_nodo_secuencia', ('nodo_id', 'secuencia')),
+]
+
+def upgrade_schema():
+    """Agrega columnas y restricciones faltantes"""
+    app = create_app('development')
+
+    with app.app_context():
+        inspector = inspect(db.engine)
+
+        for table, column, ddl in COLUMNS:
+            existing = {c['name'] for c in inspector.get_columns(table)}
+            if column in existing:
+                print(f"✓ {table}.{column} ya existe")
+                continue
+            db.session.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+            db.session.commit()
+            print(f"✓ Columna {table}.{column} agregada")
+
+        for table, name, columns in UNIQUE_CONSTRAINTS:
+            existing = {u['name'] for u in inspector.get_unique_constraints(table)}
+            existing |= {i['name'] for i in inspector.get_indexes(table) if i.get('unique')}
+            if name in existing:
+                print(f"✓ Restricción {name} ya existe")
+                continue
+            db.session.execute(text(
+                f'CREATE UNIQUE INDEX {name} ON {table} ({", ".join(columns)})'
+            ))
+            db.session.commit()
+            print(f"✓ Restricción única {name} creada")
+
+if __name__ == '__main__':
+    upgrade_schema()
@@ -0,0 +1,86 @@
+//<!-- frontend/static/js/charts.js -->
+// Series históricas en formato columnar o binario para los gráficos
+
+// Cabecera del formato binario: 'MSR1', cantidad de puntos, cantidad de variables, reservado
+const SERIES_MAGIC = 'MSR1';
+const SERIES_HEADER_BYTES = 16;
+
+// Decodifica la respuesta binaria: tiempos Float64Array (ms epoch) y un Float32Array por variable
+function decodeSeriesBinary(buffer, columns) {
+    const view = new DataView(buffer);
+    const magic = String.fromCharCode(
+        view.getUint8(0), view.getUint8(1), view.getUint8(2), view.getUint8(3)
+    );
+    if (magic !== SERIES_MAGIC) {
+        throw new Error('Formato de serie desconocido');
+    }
+
+    const count = view.getUint32(4, true);
+    const variables = view.getUint32(8, true);
+    // Los arreglos tipados usan el orden de bytes de la plataforma (little-endian en la práctica)
+    const series = { t: new Float64Array(buffer, SERIES_HEADER_BYTES, count) };
+    let offset = SERIES_HEADER_BYTES + count * 8;
+    for (let i = 0; i < variables; i++) {
+        series[columns[i]] = new Float32Array(buffer, offset, count);
+        offset += count * 4;
+    }
+    return series;
+}
+
+// Obtiene la serie histórica de un nodo; format: 'binary' o 'columnar'
+async function fetchHistoricalSeries(nodeId, { period = 'day', maxPoints = null, method = 'lttb', format = 'binary' } = {}) {
+    const params = new URLSearchParams({ period, format });
+    if (maxPoints) {
+        params.set('max_points', maxPoints);
+        params.set('method', method);
+    }
+
+    const response = await fetchAPI(`/measurements/historical/${nodeId}?${params}`);
+    if (!response.ok) {
+        throw new Error(`Error ${response.status} obteniendo históricos`);
+    }
+
+    if (format === 'binary') {
+        const columns = response.headers.get('X-Series-Columns').split(',');
+        return {
+            series: decodeSeriesBinary(await response.arrayBuffer(), columns),
+            resolucion: response.headers.get('X-Series-Resolution')
+        };
+    }
+    const data = await response.json();
+    return { series: data.series, resolucion: data.resolucion, statistics: data.statistics };
+}
+
+// Puntos {x, y} para Chart.js; null en los huecos (NaN en el formato binario)
+function seriesToPoints(series, variable) {
+    const times = series.t;
+    const values = series[variable];
+    const points = new Array(times.length);
+    for (let i = 0; i < times.length; i++) {
+        const value = values[i];
+        points[i] = { x: times[i], y: value === null || Number.isNaN(value) ? null : value };
+    }
+    return points;
+}
+
+// Gráfico de una variable; el ancho del canvas limita los puntos pedidos al servidor
+async function renderHistoricalChart(canvasId, nodeId, variable, label, color, period = 'week') {
+    const canvas = document.getElementById(canvasId);
+    const { series } = await fetchHistoricalSeries(nodeId, { period, maxPoints: canvas.clientWidth || 1200 });
+    const points = seriesToPoints(series, variable);
+
+    return new Chart(canvas.getContext('2d'), {
+        type: 'line',
+        data: {
+            labels: points.map(p => new Date(p.x).toLocaleString()),
+            datasets: [{
+                label: label,
+                data: points.map(p => p.y),
+                borderColor: color,
+                pointRadius: 0,
+                spanGaps: false
+            }]
+        },
+        options: { responsive: true, maintainAspectRatio: false, animation: false }
+    });
+}